@@ -0,0 +1,83 @@
+"""
+Loon benchmarks.
+
+Each benchmark module has a `run` function returning machine-readable results
+and can be run on its own (`python -m benchmarks.<module>`); the whole suite
+is run with `python -m benchmarks`. Results are written as JSON so runs can be
+compared between versions.
+"""
+
+import sys
+import json
+import timeit
+
+
+def timed(func, number=1000, repeat=3):
+    """
+    Time calls to a function, returning throughput and latency statistics.
+
+    Each call is timed individually, so latencies should be treated as upper
+    bounds for very fast functions.
+    """
+
+    timer = timeit.default_timer
+    samples = []
+    best = None
+
+    for i in range(repeat):
+        total = 0.0
+        for j in range(number):
+            start = timer()
+            func()
+            elapsed = timer() - start
+            samples.append(elapsed)
+            total += elapsed
+        best = total if best is None else min(best, total)
+
+    samples.sort()
+
+    def percentile(p):
+        return samples[min(len(samples) - 1, int(p * len(samples)))] * 1e6
+
+    return {
+        'calls': number,
+        'ops_per_sec': number / best if best else None,
+        'mean_us': sum(samples) / len(samples) * 1e6,
+        'min_us': samples[0] * 1e6,
+        'p50_us': percentile(0.50),
+        'p99_us': percentile(0.99),
+    }
+
+
+def guarded(func, *args, **kwargs):
+    """Run a benchmark, recording failures rather than raising."""
+
+    try:
+        return func(*args, **kwargs)
+    except Exception as e:
+        return {'error': '{0}: {1}'.format(type(e).__name__, e)}
+
+
+def dump(results, output=None):
+    """Write results as JSON."""
+
+    output = output or sys.stdout
+
+    json.dump(results, output, indent=2, sort_keys=True)
+    output.write('\n')
+
+
+def options(argv=None):
+    """Parse common benchmark arguments."""
+
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--quick', action='store_true', help="fewer iterations"
+    )
+    parser.add_argument(
+        '-o', '--output', type=argparse.FileType('w'), help="JSON output"
+    )
+
+    return parser.parse_args(argv)
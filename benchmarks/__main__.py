@@ -0,0 +1,58 @@
+"""
+Run the benchmark suite, writing JSON results.
+
+Usage: python -m benchmarks [--quick] [-o results.json]
+"""
+
+import sys
+import time
+import platform
+import importlib
+
+from benchmarks import dump, options
+
+
+# benchmark modules, imported as they are run, so that one needing an
+# optional dependency (e.g. manager, on selectors34) is skipped without it
+SUITE = [
+    'framing',
+    'parsers',
+    'formatters',
+    'commands',
+    'records',
+    'manager',
+    'derived',
+    'database',
+]
+
+
+def main(argv=None):
+
+    args = options(argv)
+
+    results = {
+        'meta': {
+            'time': time.time(),
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'quick': args.quick,
+        },
+    }
+
+    for name in SUITE:
+        sys.stderr.write('{0}...\n'.format(name))
+
+        try:
+            module = importlib.import_module('benchmarks.' + name)
+        except ImportError as e:
+            results[name] = {'skipped': '{0}: {1}'.format(type(e).__name__, e)}
+            continue
+
+        results[name] = module.run(args.quick)
+
+    dump(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Command benchmark: building the XML for every command in `Loon.COMMANDS`.
+
+Compares the original ElementTree construction with encoding from the
+template and with reusing a prepared command.
+"""
+
+import random
+
+from xml.etree import cElementTree as ElementTree
+
+from loon import Loon
+from loon.command import Command
+from loon.formatter import indent
+from loon.synthetic import sample_value
+
+from benchmarks import timed, guarded, dump, options
+
+
+def arguments(command):
+    """Sample values for the required arguments of a command."""
+
+    rng = random.Random(0)
+
+    return {
+        formatter.name: sample_value(formatter, rng)
+        for formatter in command.ARGS if formatter.required
+    }
+
+
+def legacy(command, args):
+    """Build the command as the original `Command.__new__` did."""
+
+    element = ElementTree.Element('Command')
+
+    name = ElementTree.Element('Name')
+    name.text = command.__name__
+
+    args = {k.lower(): v for k, v in args.items()}
+
+    for formatter in reversed(command.ARGS):
+        try:
+            element.insert(0, formatter(args[formatter.name.lower()]))
+        except KeyError:
+            pass
+
+    element.insert(0, name)
+    indent(element)
+
+    return ElementTree.tostring(element)
+
+
+def run(quick=False, number=None):
+    """Run the command benchmarks."""
+
+    number = number or (500 if quick else 5000)
+
+    results = {}
+
+    for command in Loon.COMMANDS:
+        args = arguments(command)
+        lower = {k.lower(): v for k, v in args.items()}
+
+        if command.prepare.__func__ is Command.prepare.__func__:
+            result = {
+                'legacy': guarded(
+                    timed, lambda: legacy(command, args), number=number
+                ),
+                'encode': guarded(
+                    timed, lambda: command._encode(lower), number=number
+                ),
+                'identical': legacy(command, args) == command(**args),
+            }
+        else:
+            result = {}
+
+        result['prepared'] = guarded(
+            timed, lambda: command(**args), number=number
+        )
+
+        results[command.__name__] = result
+
+    return results
+
+
+if __name__ == '__main__':
+    args = options()
+    dump(run(args.quick), args.output)
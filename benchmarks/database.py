@@ -0,0 +1,92 @@
+"""
+Database benchmark: parsed InstantaneousDemand responses written to SQLite
+with a commit per response, versus queued on the Database writer (the append
+cost on the capture path, and the sustained rate including batched commits).
+"""
+
+import os
+import time
+import shutil
+import tempfile
+import sqlite3
+
+from loon.database import Database, Table
+from loon.parser import InstantaneousDemand
+from benchmarks import timed, guarded, dump, options
+from benchmarks.parsers import sample_element
+
+
+def per_row(path, response, number):
+    """Write responses with a commit for each."""
+
+    table = Table(InstantaneousDemand)
+
+    connection = sqlite3.connect(path)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    table.create(connection)
+
+    start = time.time()
+    for i in range(number):
+        with connection:
+            connection.execute(
+                table.insert, table.row(time.time(), response, 'datetime')
+            )
+    elapsed = time.time() - start
+
+    connection.close()
+
+    return {'rows': number, 'rows_per_sec': number / elapsed}
+
+
+def batched(path, response, number):
+    """Queue responses on the writer and wait for them to be committed."""
+
+    database = Database(path)
+
+    start = time.time()
+    for i in range(number):
+        database.append(response)
+    database.flush()
+    elapsed = time.time() - start
+
+    database.close()
+
+    return {'rows': number, 'rows_per_sec': number / elapsed}
+
+
+def run(quick=False, number=None):
+    """Run the database benchmarks."""
+
+    number = number or (2000 if quick else 20000)
+
+    response = InstantaneousDemand(sample_element(InstantaneousDemand))
+
+    directory = tempfile.mkdtemp()
+
+    try:
+        results = {
+            'per_row': guarded(
+                per_row, os.path.join(directory, 'per_row.db'), response,
+                number
+            ),
+            'batched': guarded(
+                batched, os.path.join(directory, 'batched.db'), response,
+                number
+            ),
+        }
+
+        database = Database(os.path.join(directory, 'append.db'))
+        results['append'] = guarded(
+            timed, lambda: database.append(response), number=number
+        )
+        database.close()
+    finally:
+        shutil.rmtree(directory)
+
+    return results
+
+
+if __name__ == '__main__':
+    args = options()
+    dump(run(args.quick), args.output)
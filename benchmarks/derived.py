@@ -0,0 +1,62 @@
+"""
+Derived field benchmark: expressions compiled once (as DerivedFields does)
+versus evaluating the expression source for each response, on parsed
+InstantaneousDemand responses with the latest PriceCluster in scope.
+"""
+
+from loon.derived import DerivedFields
+from loon.node import Node
+from loon.parser import InstantaneousDemand, PriceCluster
+from benchmarks import timed, guarded, dump, options
+from benchmarks.parsers import sample_element
+
+
+FIELDS = {
+    'InstantaneousDemand': {
+        'kW': 'Demand',
+        'cost_rate': 'Demand * price.Price / 10**price.TrailingDigits',
+    },
+}
+
+
+def source(fields):
+    """Derive fields by evaluating the expression source each time."""
+
+    price = [None]
+
+    def derive(response):
+        response_type = response['response_type']
+        if response_type == 'PriceCluster':
+            price[0] = Node(response)
+        for name, expression in fields.get(response_type, {}).items():
+            response[name] = eval(expression, {'price': price[0]}, response)
+        return response
+
+    return derive
+
+
+def run(quick=False, number=None):
+    """Run the derived field benchmarks."""
+
+    number = number or (1000 if quick else 10000)
+
+    demand = InstantaneousDemand(sample_element(InstantaneousDemand))
+    price = PriceCluster(sample_element(PriceCluster))
+
+    results = {}
+
+    for name, derive in [
+        ('compiled', DerivedFields(FIELDS)),
+        ('source', source(FIELDS)),
+    ]:
+        derive(price)
+        results[name] = guarded(
+            timed, lambda: derive(demand), number=number
+        )
+
+    return results
+
+
+if __name__ == '__main__':
+    args = options()
+    dump(run(args.quick), args.output)
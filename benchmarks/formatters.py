@@ -0,0 +1,86 @@
+"""
+Formatter benchmark: `_parse` and `encode` for every Formatter class, and
+each timestamp mode of Date (with datetimes from the cache and uncached).
+
+The lookup tables of the enumerated formatters are checked by round trips
+over every value (from tests/test_formatter.py), recorded as the number of
+failures.
+"""
+
+import sys
+import random
+
+from itertools import cycle
+
+from loon.formatter import *
+from loon.synthetic import sample_value, sample_text
+
+from benchmarks import timed, guarded, dump, options
+from tests.test_formatter import roundtrips
+
+
+FORMATTERS = [
+    String('String'),
+    Base64String('Base64String'),
+    Integer('Integer'),
+    Decimal('Decimal'),
+    Hex('Hex'),
+    Date('Date'),
+    Date('DateEpoch', timestamps='epoch'),
+    Date('DateRaw', timestamps='raw'),
+    Currency('Currency'),
+    Boolean('Boolean'),
+    Event('Event'),
+    Status('Status'),
+    MeterType('MeterType'),
+    Queue('Queue'),
+    IntervalChannel('IntervalChannel'),
+    IntervalPeriod('IntervalPeriod'),
+]
+
+
+def run(quick=False, number=None):
+    """Run the formatter benchmarks."""
+
+    number = number or (1000 if quick else 10000)
+
+    results = {}
+
+    for formatter in FORMATTERS:
+        rng = random.Random(0)
+        value = sample_value(formatter, rng)
+        text = sample_text(formatter, rng)
+
+        results[formatter.name] = {
+            'parse': guarded(
+                timed, lambda: formatter._parse(text), number=number
+            ),
+            'encode': guarded(
+                timed, lambda: formatter.encode(value), number=number
+            ),
+        }
+
+    # distinct timestamps, more than are cached
+    texts = cycle(
+        hex(i) for i in range(0x10000000, 0x10000000 + 4 * Date.CACHE_SIZE)
+    )
+    formatter = Date('Date')
+    results['Date']['parse_uncached'] = guarded(
+        timed, lambda: formatter._parse(next(texts)), number=number
+    )
+
+    results['roundtrip'] = roundtrips()
+
+    return results
+
+
+if __name__ == '__main__':
+    args = options()
+    results = run(args.quick)
+    dump(results, args.output)
+
+    # fail if any lookup table does not round trip
+    if any(
+        result['failures'] for result in results['roundtrip'].values()
+    ):
+        sys.exit(1)
@@ -0,0 +1,111 @@
+"""
+Framing benchmark: legacy line/regex loop versus the incremental framer.
+"""
+
+import re
+
+from xml.etree import cElementTree as ElementTree
+
+from loon.framer import Framer
+from loon.synthetic import FrameGenerator
+
+from benchmarks import timed, dump, options
+
+
+start_re = re.compile(r'^<([a-zA-Z]+)>$')
+end_re = re.compile(r'^</([a-zA-Z]+)>$')
+
+
+def legacy(lines):
+    """Frame lines as the original `Loon._get_responses` loop did."""
+
+    frames = []
+
+    start_found = False
+    response = []
+
+    for line in lines:
+
+        line = line.lstrip('\0').rstrip()
+
+        n = line.rfind('<')
+        head, tail = line[:n], line[n:]
+
+        start = start_re.match(tail)
+        end = end_re.match(head or tail)
+
+        if start:
+            if head:
+                response.append(head)
+        else:
+            response.append(line)
+
+        if end:
+            if start_found:
+                try:
+                    frames.append(ElementTree.fromstringlist(response))
+                except SyntaxError:
+                    pass
+
+            start_found = False
+            response = []
+
+        if start:
+            start_found = True
+            response = [tail]
+
+    return frames
+
+
+def framer(chunks):
+    """Frame chunks with the incremental framer."""
+
+    f = Framer()
+
+    return [frame for chunk in chunks for frame in f.feed(chunk)]
+
+
+def run(quick=False, count=None, truncation=0.01, padding=0.05):
+    """Run the framing benchmarks."""
+
+    import logging
+    logging.disable(logging.WARNING)
+
+    count = count or (1000 if quick else 10000)
+
+    stream = FrameGenerator(
+        truncation=truncation, padding=padding, seed=0
+    ).stream(count)
+
+    inputs = {
+        'lines': stream.splitlines(True),
+        'chunks_4k': [
+            stream[i:i + 4096] for i in range(0, len(stream), 4096)
+        ],
+    }
+
+    cases = [
+        ('legacy_lines', legacy, 'lines'),
+        ('framer_lines', framer, 'lines'),
+        ('framer_chunks_4k', framer, 'chunks_4k'),
+    ]
+
+    results = {
+        'frames': count, 'bytes': len(stream),
+        'truncation': truncation, 'padding': padding,
+    }
+
+    for name, func, data in cases:
+        data = inputs[data]
+        frames = len(func(data))
+        result = timed(lambda: func(data), number=1, repeat=3)
+        result['frames_out'] = frames
+        result['frames_per_sec'] = count * result['ops_per_sec']
+        results[name] = result
+
+    return results
+
+
+if __name__ == '__main__':
+    args = options()
+    dump(run(args.quick), args.output)
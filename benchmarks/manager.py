@@ -0,0 +1,120 @@
+"""
+Multi-device capture benchmark: a thread per device versus LoonManager.
+
+Simulated devices run in a child process, so only the CPU time spent
+capturing, framing and parsing is charged to the process being measured.
+"""
+
+import os
+import time
+import logging
+import multiprocessing
+
+from loon.loon import Loon
+from loon.manager import LoonManager
+from loon.simulator import Simulator
+from benchmarks import dump, options
+
+
+def simulate(count, rate, queue, stop):
+    """Run simulated devices until stopped."""
+
+    simulators = [Simulator(rate=rate, seed=i) for i in range(count)]
+
+    for simulator in simulators:
+        simulator.start()
+
+    queue.put([simulator.device for simulator in simulators])
+
+    stop.wait()
+
+    for simulator in simulators:
+        simulator.close()
+
+
+def cpu():
+    """Return CPU time used by this process, in seconds."""
+
+    times = os.times()
+
+    return times[0] + times[1]
+
+
+def threads(devices, duration):
+    """Capture with a Loon (and thread) per device."""
+
+    loons = [Loon(device=device) for device in devices]
+
+    start = cpu()
+    time.sleep(duration)
+    used = cpu() - start
+
+    count = 0
+    for loon in loons:
+        count += len(loon.responses)
+        loon.close()
+
+    return used, count
+
+
+def manager(devices, duration):
+    """Capture with a single LoonManager."""
+
+    manager = LoonManager()
+    for device in devices:
+        manager.add(device)
+    manager.start()
+
+    start = cpu()
+    time.sleep(duration)
+    used = cpu() - start
+
+    count = sum(len(loon.responses) for loon in manager.devices.values())
+    manager.close()
+
+    return used, count
+
+
+def run(quick=False, count=None, rate=10.0, duration=None):
+    """Run the multi-device capture benchmarks."""
+
+    count = count or 30
+    duration = duration or (5.0 if quick else 30.0)
+
+    queue = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    process = multiprocessing.Process(
+        target=simulate, args=(count, rate, queue, stop)
+    )
+    process.start()
+
+    # MessageCluster frames are reported as invalid
+    logging.disable(logging.CRITICAL)
+
+    try:
+        devices = queue.get()
+
+        results = {
+            'devices': count,
+            'rate': rate,
+            'duration': duration,
+        }
+
+        for name, func in [('threads', threads), ('manager', manager)]:
+            used, responses = func(devices, duration)
+            results[name] = {
+                'cpu': used,
+                'cpu_per_device': used / duration / count,
+                'responses': responses,
+            }
+    finally:
+        logging.disable(logging.NOTSET)
+        stop.set()
+        process.join()
+
+    return results
+
+
+if __name__ == '__main__':
+    args = options()
+    dump(run(args.quick), args.output)
@@ -0,0 +1,129 @@
+"""
+Parser benchmark: each Parser subclass, plus the legacy sort/groupby parse
+for comparison with the compiled parse plans, and lazy records (parsed, then
+reading the time stamp as most consumers do).
+"""
+
+import random
+
+from collections import OrderedDict
+from itertools import groupby
+
+from loon import Loon
+from loon.parser import Parser
+from loon.formatter import SkipSignal
+from loon.synthetic import element
+from loon.exception import LoonError
+
+from benchmarks import timed, guarded, dump, options
+
+
+def sample_element(cls):
+    """Build a reproducible response element for a parser class."""
+
+    return element(cls, random.Random(0))
+
+
+def legacy(cls, response):
+    """Parse an element as the original `Parser.__new__` did."""
+
+    def fix_text(text):
+        return text.strip() if text is not None else ''
+
+    data = {
+        k: [fix_text(e.text) for e in v]
+        for k, v in groupby(
+            sorted(response, key=lambda x: x.tag),
+            key=lambda x: x.tag
+        )
+    }
+
+    result = OrderedDict(response_type=response.tag)
+
+    for formatter in cls.TAGS:
+        try:
+            value = formatter.parse(data.pop(formatter.name))
+        except KeyError:
+            if formatter.required:
+                raise LoonError(
+                    "Missing value: {0}".format(formatter.name)
+                )
+        else:
+            if value is not None:
+                result[formatter.name] = value
+
+    if data:
+        raise LoonError("Unparsed data: {0}".format(', '.join(data)))
+
+    return result
+
+
+def planned(cls, response):
+    """Parse an element with the compiled parse plan."""
+
+    return Parser.__new__(cls, response)
+
+
+def full(cls, response, options={'use_formatting': True}):
+    """Parse an element as `Loon` does."""
+
+    return cls(response, options)
+
+
+def lazy(cls, response, options={'use_formatting': True, 'records': 'lazy'}):
+    """Parse an element into a lazy record and read the time stamp."""
+
+    return cls(response, options).get('TimeStamp')
+
+
+def measure(func, cls, element, number):
+    """Time a parse function."""
+
+    def call():
+        try:
+            func(cls, element)
+        except (LoonError, SkipSignal):
+            pass
+
+    return timed(call, number=number)
+
+
+def run(quick=False, number=None):
+    """Run the parser benchmarks."""
+
+    number = number or (200 if quick else 2000)
+
+    results = {}
+
+    for name, cls in sorted(Loon.PARSERS.items()):
+        e = sample_element(cls)
+
+        results[name] = result = {
+            'legacy': guarded(measure, legacy, cls, e, number),
+            'plan': guarded(measure, planned, cls, e, number),
+            'full': guarded(measure, full, cls, e, number),
+            'lazy': guarded(measure, lazy, cls, e, number),
+        }
+
+        try:
+            result['plan_speedup'] = (
+                result['plan']['ops_per_sec'] /
+                result['legacy']['ops_per_sec']
+            )
+        except (KeyError, TypeError):
+            pass
+
+        try:
+            result['lazy_speedup'] = (
+                result['lazy']['ops_per_sec'] /
+                result['full']['ops_per_sec']
+            )
+        except (KeyError, TypeError):
+            pass
+
+    return results
+
+
+if __name__ == '__main__':
+    args = options()
+    dump(run(args.quick), args.output)
@@ -0,0 +1,99 @@
+"""
+Record memory benchmark: OrderedDict results versus compact records, with and
+without a projection to the time stamp and demand.
+
+Memory is measured with tracemalloc where available, otherwise by the growth
+in peak resident set size of a child process for each representation.
+"""
+
+import multiprocessing
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+    import resource
+
+from loon.node import Node
+from loon.parser import InstantaneousDemand
+from benchmarks import dump, options
+from benchmarks.parsers import sample_element
+
+
+# projected variants
+PROJECTION = {'InstantaneousDemand': ['TimeStamp', 'Demand']}
+
+
+def build(records, count):
+    """Parse a number of synthetic InstantaneousDemand records."""
+
+    element = sample_element(InstantaneousDemand)
+
+    records, projected, suffix = records.partition('_projected')
+    options = Node({
+        'use_formatting': False, 'records': records,
+        'fields': PROJECTION if projected else {},
+    })
+
+    return [InstantaneousDemand(element, options) for i in range(count)]
+
+
+def measure(records, count, queue=None):
+    """Measure the memory used to retain parsed records, in bytes."""
+
+    if tracemalloc:
+        tracemalloc.start()
+        result = build(records, count)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    else:
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        result = build(records, count)
+        after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        size = (after - before) * 1024
+
+    if queue is None:
+        return size
+
+    queue.put(size)
+
+
+def isolated(records, count):
+    """Measure in a fresh process so peak RSS is not shared."""
+
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=measure, args=(records, count, queue)
+    )
+    process.start()
+    size = queue.get()
+    process.join()
+
+    return size
+
+
+def run(quick=False, count=None):
+    """Run the record memory benchmarks."""
+
+    count = count or (100000 if quick else 1000000)
+
+    measure_ = measure if tracemalloc else isolated
+
+    results = {
+        'records': count,
+        'method': 'tracemalloc' if tracemalloc else 'peak_rss',
+    }
+
+    for records in ['dict', 'compact', 'dict_projected']:
+        size = measure_(records, count)
+        results[records] = {
+            'bytes': size,
+            'bytes_per_record': float(size) / count,
+        }
+
+    return results
+
+
+if __name__ == '__main__':
+    args = options()
+    dump(run(args.quick), args.output)
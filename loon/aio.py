@@ -0,0 +1,265 @@
+"""
+Event loop native Loon client.
+
+Requires `asyncio` (or the `trollius` backport on Python 2).
+"""
+
+__all__ = ['AsyncLoon']
+
+import os
+import time
+import errno
+import fcntl
+import logging
+
+from functools import partial
+from collections import deque
+
+try:
+    import asyncio
+except ImportError:
+    import trollius as asyncio
+
+try:
+    StopAsyncIteration = StopAsyncIteration
+except NameError:
+    StopAsyncIteration = StopIteration
+
+from .loon import Loon
+from .writer import CommandWriter
+
+
+class AsyncLoon(Loon):
+    """
+    Loon client driven by an event loop.
+
+    The serial port is read and written through the event loop with
+    non-blocking I/O, without a capture thread. Responses are consumed with
+    `async for response in loon` (or `yield From(loon.next())` with trollius)
+    and every command method returns a future that completes with the response
+    to the command (or once it has been written to the device, for commands
+    without a response).
+
+    Commands are queued on a `CommandWriter` (in priority order, paced to the
+    write rate of the device) that is driven from the event loop, as for a
+    `LoonManager`, so no writer thread is started.
+    """
+
+    def __init__(self, device=None, start_capture=True, options=None,
+                 defaults=None, loop=None):
+        """Initialise the Loon."""
+
+        self._loop = loop or asyncio.get_event_loop()
+
+        self._reading = False
+        self._closed = False
+        self._waiters = deque()
+
+        # bytes of written commands not yet accepted by the device
+        self._outgoing = b''
+        self._writing = False
+        self._write_timer = None
+
+        super(AsyncLoon, self).__init__(
+            device=device, start_capture=start_capture,
+            options=options, defaults=defaults,
+            writer=partial(
+                CommandWriter, threaded=False, on_put=self._on_put
+            ),
+        )
+
+    def _open(self, device):
+        """Open the serial port for non-blocking I/O."""
+
+        port = super(AsyncLoon, self)._open(device)
+
+        fd = port.fileno()
+        fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) |
+                    os.O_NONBLOCK)
+
+        return port
+
+    def _future(self):
+        """Create a future on the loop."""
+
+        try:
+            return self._loop.create_future()
+        except AttributeError:
+            return asyncio.Future(loop=self._loop)
+
+    def start_capture(self):
+        """Start reading from the device through the event loop."""
+
+        if not self._reading:
+            self._loop.add_reader(self._serial.fileno(), self._on_readable)
+            self._reading = True
+            self._closed = False
+            self.initialize()
+
+    def stop_capture(self):
+        """Stop reading from the device."""
+
+        if self._reading:
+            self._loop.remove_reader(self._serial.fileno())
+            self._reading = False
+
+    @property
+    def capturing(self):
+        """Return True if reading from the device."""
+
+        return self._reading
+
+    def close(self):
+        """
+        Stop reading and writing, end any iteration over responses and close
+        the device, failing commands not yet written or answered.
+        """
+
+        self.stop_capture()
+
+        self._watch_writes(False)
+        self._outgoing = b''
+
+        self._closed = True
+        self._wake()
+
+        super(AsyncLoon, self).close()
+
+    def _on_readable(self):
+        """Read everything available from the device."""
+
+        try:
+            data = os.read(
+                self._serial.fileno(), self._options['read.chunk_size']
+            )
+        except OSError as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return
+            logging.error("Unable to read from device: {0}".format(e))
+            self.close()
+            return
+
+        if not data:
+            self.close()
+            return
+
+        self.read_counter.update(len(data))
+        self._receive(data, time.time())
+
+    def _store(self, response):
+        """Store a parsed response and wake waiting consumers."""
+
+        super(AsyncLoon, self)._store(response)
+        self._wake()
+
+    def _wake(self):
+        """Hand stored responses to waiting consumers."""
+
+        while self._waiters:
+            waiter = self._waiters[0]
+
+            if waiter.done():
+                self._waiters.popleft()
+            elif self.responses:
+                self._waiters.popleft()
+                waiter.set_result(self.responses.popleft())
+            elif self._closed:
+                self._waiters.popleft()
+                waiter.set_exception(StopAsyncIteration())
+            else:
+                break
+
+    def next(self):
+        """Return a future for the next response."""
+
+        future = self._future()
+
+        self._waiters.append(future)
+        self._wake()
+
+        return future
+
+    def __aiter__(self):
+
+        return self
+
+    __anext__ = next
+
+    def _on_put(self):
+        """Watch for writes once a command is queued (from any thread)."""
+
+        self._loop.call_soon_threadsafe(self._watch_writes)
+
+    def _watch_writes(self, watch=True):
+        """
+        Watch the device for writes while a command is due (or partly
+        written), otherwise wait until the next command is due.
+        """
+
+        if self._write_timer is not None:
+            self._write_timer.cancel()
+            self._write_timer = None
+
+        delay = self.writer.delay() if watch and not self._closed else None
+
+        if watch and (self._outgoing or delay == 0):
+            if not self._writing:
+                self._loop.add_writer(
+                    self._serial.fileno(), self._on_writable
+                )
+                self._writing = True
+            return
+
+        if self._writing:
+            self._loop.remove_writer(self._serial.fileno())
+            self._writing = False
+
+        if delay is not None:
+            self._write_timer = self._loop.call_later(
+                delay, self._watch_writes
+            )
+
+    def _write(self, data):
+        """Write a command without blocking, keeping what is not accepted."""
+
+        self._outgoing += data
+        self._flush()
+
+    def _flush(self):
+        """Write as much of the outgoing data as the device accepts."""
+
+        try:
+            n = os.write(self._serial.fileno(), self._outgoing)
+        except OSError as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return
+            self._outgoing = b''
+            raise
+
+        self._outgoing = self._outgoing[n:]
+
+    def _schedule(self, deadline):
+        """Expire pending commands from the event loop after a deadline."""
+
+        self._loop.call_later(max(deadline - time.time(), 0), self._expire)
+
+    def _on_writable(self):
+        """Write due commands as the device accepts them."""
+
+        if self._outgoing:
+            try:
+                self._flush()
+            except OSError as e:
+                logging.error("Unable to write to device: {0}".format(e))
+
+        while not self._outgoing and self.writer.write_next():
+            pass
+
+        self._watch_writes()
+
+    def __del__(self):
+
+        try:
+            self.close()
+        except Exception:
+            pass
@@ -0,0 +1,97 @@
+"""
+Buffers for chunked serial reads.
+"""
+
+__all__ = ['ReadBuffer', 'ReadCounter']
+
+import time
+
+
+class ReadBuffer(object):
+    """
+    Reusable serial read buffer.
+
+    Data is read into a single preallocated `bytearray` (using `readinto`), so
+    each read is one call to the port, however many bytes are waiting, and
+    no read buffers are allocated. The data read is returned as `bytes`, which
+    is the only copy made.
+    """
+
+    def __init__(self, size=4096):
+        """Initialise the buffer."""
+
+        self._buffer = bytearray(size)
+        self._view = memoryview(self._buffer)
+        self._size = size
+
+    @property
+    def size(self):
+        """Capacity of the buffer (the most read at once)."""
+
+        return self._size
+
+    def read(self, stream):
+        """
+        Read everything waiting on `stream` (up to the size of the buffer).
+
+        If nothing is waiting, wait (up to the timeout of the stream) for data
+        to arrive, then read everything that has arrived with it, rather than
+        a byte at a time.
+        """
+
+        view = self._view
+
+        waiting = stream.in_waiting
+        if waiting:
+            n = stream.readinto(view[:min(waiting, self._size)]) or 0
+        else:
+            n = stream.readinto(view[:1]) or 0
+            waiting = n and stream.in_waiting
+            if waiting:
+                n += stream.readinto(
+                    view[n:min(n + waiting, self._size)]
+                ) or 0
+
+        return view[:n].tobytes()
+
+
+class ReadCounter(object):
+    """Counters for bytes and reads from a device."""
+
+    def __init__(self):
+        """Initialise the counters."""
+
+        self.reset()
+
+    def reset(self):
+        """Reset the counters."""
+
+        self.bytes = 0
+        self.reads = 0
+        self.started = time.time()
+
+    def update(self, n):
+        """Record a read of `n` bytes."""
+
+        self.bytes += n
+        self.reads += 1
+
+    @property
+    def elapsed(self):
+        """Seconds since the counters were reset."""
+
+        return time.time() - self.started
+
+    @property
+    def average_bytes_per_second(self):
+        """Bytes read per second, on average since the counters were reset."""
+
+        elapsed = self.elapsed
+        return self.bytes / elapsed if elapsed else 0.0
+
+    @property
+    def average_reads_per_second(self):
+        """Reads per second, on average since the counters were reset."""
+
+        elapsed = self.elapsed
+        return self.reads / elapsed if elapsed else 0.0
@@ -30,53 +30,145 @@ __all__ = [
     'image_block_dump',
 ]
 
-from xml.etree import cElementTree as ElementTree
+from xml.sax.saxutils import escape as xml_escape
 
 from .formatter import *
-from .formatter import indent
 from .exception import LoonError
 
 
+# placeholder for an argument that was not given
+MISSING = object()
+
+
 class Command(object):
     """RAVEn API Command."""
 
     ARGS = []
 
+    # response type sent by the RAVEn(TM) in reply to the command
+    RESPONSE = None
+
+    # arguments identifying the reply, by the response field of the same name
+    # (which must be in `Parser.KEYS`)
+    MATCH = ['MeterMacId']
+
+    # write priority (lower is written first)
+    PRIORITY = 0
+
+    # maximum number of prepared commands kept
+    CACHE_SIZE = 1024
+
+    _cache = {}
+
     def __new__(cls, defaults=None, **args):
         """Generate XML API command."""
 
-        command = ElementTree.Element('Command')
-
-        name = ElementTree.Element('Name')
-        name.text = cls.__name__
+        return cls.prepare(defaults, **args)
+
+    @classmethod
+    def prepare(cls, defaults=None, **args):
+        """
+        Generate XML API command, reusing the encoded command for arguments
+        that have been seen before.
+        """
+
+        # commands without arguments are always the same
+        if not cls.ARGS:
+            key = (cls,)
+        else:
+            args = {k.lower(): v for k, v in args.items()}
+
+            # add in default arguments
+            if defaults:
+                args.update(
+                    (k.lower(), v) for k, v in defaults.items()
+                    if k.lower() not in args
+                )
+
+            # only arguments of the command distinguish it (along with their
+            # types, as e.g. 1, 1.0 and True are equal, but may not encode
+            # the same)
+            key = (cls,) + tuple(
+                (value, type(value)) for value in (
+                    args.get(formatter.name.lower(), MISSING)
+                    for formatter in cls.ARGS
+                )
+            )
+
+        try:
+            return cls._cache[key]
+        except KeyError:
+            pass
+        except TypeError:
+            # unhashable argument
+            return cls._encode(args)
+
+        command = cls._encode(args)
+
+        if len(cls._cache) >= cls.CACHE_SIZE:
+            cls._cache.clear()
+        cls._cache[key] = command
+
+        return command
+
+    @classmethod
+    def match(cls, defaults=None, **args):
+        """
+        Response fields (and values) identifying the reply to the command,
+        for the matching arguments given.
+        """
 
         args = {k.lower(): v for k, v in args.items()}
 
-        # add in default arguments
         if defaults:
-            args = args.update((
-                (k, v) for k, v in defaults.items()
+            args.update(
+                (k.lower(), v) for k, v in defaults.items()
                 if k.lower() not in args
-            ))
+            )
+
+        result = []
+
+        for formatter in cls.ARGS:
+            value = args.get(formatter.name.lower())
+            if formatter.name not in cls.MATCH or value is None:
+                continue
+
+            # compare with the value as it would be parsed in the response
+            result.append(
+                (formatter.name, formatter.parse([formatter.encode(value)]))
+            )
+
+        return tuple(result)
+
+    @classmethod
+    def _encode(cls, args):
+        """Encode XML API command from (lower-cased) arguments."""
+
+        lines = ['<Command>\n', '  <Name>', cls.__name__, '</Name>\n']
 
         # process and format arguements
-        for formatter in reversed(cls.ARGS):
+        for formatter in cls.ARGS:
             try:
-                command.insert(0, formatter(args[formatter.name.lower()]))
+                value = formatter.encode(args[formatter.name.lower()])
             except KeyError:
                 if formatter.required:
                     raise TypeError(
                         "Missing keyword argument: {0}".format(formatter.name)
                     )
+                continue
             except LoonError as e:
                 raise LoonError("Unable to process argument: {0}: {1}".format(
                     formatter.name, e
                 ))
 
-        command.insert(0, name)
-        indent(command)
+            lines.extend([
+                '  <', formatter.name, '>', xml_escape(value),
+                '</', formatter.name, '>\n',
+            ])
 
-        return ElementTree.tostring(command)
+        lines.append('</Command>\n')
+
+        return ''.join(lines)
 
 
 class initialize(Command):
@@ -87,7 +179,8 @@ class initialize(Command):
     speed up the initial connection.
     """
 
-    def __new__(cls, defaults=None, **args):
+    @classmethod
+    def prepare(cls, defaults=None, **args):
         """Generate XML API command."""
 
         # according to Rainforest, the initialize command is not implemented
@@ -102,7 +195,7 @@ class restart(Command):
     sent during the start-up sequence.
     """
 
-    pass
+    RESPONSE = 'ConnectionStatus'
 
 
 class factory_reset(Command):
@@ -112,7 +205,7 @@ class factory_reset(Command):
     On restart, the RAVEn(TM) will begin the commissioning cycle.
     """
 
-    pass
+    RESPONSE = 'ConnectionStatus'
 
 
 class get_connection_status(Command):
@@ -121,7 +214,7 @@ class get_connection_status(Command):
     information.
     """
 
-    pass
+    RESPONSE = 'ConnectionStatus'
 
 
 class get_device_info(Command):
@@ -130,7 +223,7 @@ class get_device_info(Command):
     information.
     """
 
-    pass
+    RESPONSE = 'DeviceInfo'
 
 
 class get_schedule(Command):
@@ -138,6 +231,9 @@ class get_schedule(Command):
     Send the GET_SCHEDULE command to get the RAVEn(TM) scheduler information.
     """
 
+    RESPONSE = 'ScheduleInfo'
+    MATCH = ['MeterMacId', 'Event']
+
     ARGS = [
         Hex('MeterMacId'),
         Event('Event'),
@@ -152,6 +248,9 @@ class set_schedule(Command):
     0xFFFFFFFF.
     """
 
+    RESPONSE = 'ScheduleInfo'
+    MATCH = ['MeterMacId', 'Event']
+
     ARGS = [
         Hex('MeterMacId'),
         Event('Event', required=True),
@@ -168,6 +267,9 @@ class set_schedule_default(Command):
     default values.
     """
 
+    RESPONSE = 'ScheduleInfo'
+    MATCH = ['MeterMacId', 'Event']
+
     ARGS = [
         Hex('MeterMacId'),
         Event('Event'),
@@ -180,7 +282,7 @@ class get_meter_list(Command):
     connected to.
     """
 
-    pass
+    RESPONSE = 'MeterList'
 
 
 class get_meter_info(Command):
@@ -188,6 +290,8 @@ class get_meter_info(Command):
     Send the GET_METER_INFO Command to get the meter information.
     """
 
+    RESPONSE = 'MeterInfo'
+
     ARGS = [
         Hex('MeterMacId'),
     ]
@@ -199,7 +303,7 @@ class get_network_info(Command):
     network.
     """
 
-    pass
+    RESPONSE = 'NetworkInfo'
 
 
 class set_meter_info(Command):
@@ -207,6 +311,8 @@ class set_meter_info(Command):
     Send the SET_METER_INFO Command to set the meter information.
     """
 
+    RESPONSE = 'MeterInfo'
+
     ARGS = [
         Hex('MeterMacId'),
         String('NickName'),
@@ -222,6 +328,8 @@ class get_time(Command):
     Send the GET_TIME command to get the current time.
     """
 
+    RESPONSE = 'TimeCluster'
+
     ARGS = [
         Hex('MeterMacId'),
         Boolean('Refresh'),
@@ -234,6 +342,8 @@ class get_message(Command):
     message.
     """
 
+    RESPONSE = 'MessageCluster'
+
     ARGS = [
         Hex('MeterMacId'),
         Boolean('Refresh'),
@@ -247,6 +357,8 @@ class confirm_message(Command):
     use a GET_MESSAGE command with Refresh=Y.
     """
 
+    RESPONSE = 'MessageCluster'
+
     ARGS = [
         Hex('MeterMacId'),
         Hex('Id', required=True, range=(0, 0xffffffff)),
@@ -260,6 +372,8 @@ class get_current_price(Command):
     from the meter, not from cache.
     """
 
+    RESPONSE = 'PriceCluster'
+
     ARGS = [
         Hex('MeterMacId'),
         Boolean('Refresh'),
@@ -276,6 +390,8 @@ class set_current_price(Command):
     meter price will be used, if available.
     """
 
+    RESPONSE = 'PriceCluster'
+
     ARGS = [
         Hex('MeterMacId'),
         Hex('Price', required=True, range=(0, 0xffffffff)),
@@ -290,6 +406,8 @@ class get_instantaneous_demand(Command):
     get the information from the meter, rather than its local cache.
     """
 
+    RESPONSE = 'InstantaneousDemand'
+
     ARGS = [
         Hex('MeterMacId'),
         Boolean('Refresh'),
@@ -303,6 +421,8 @@ class get_current_summation_delivered(Command):
     RAVEn(TM) to get the data from the meter, rather than its local cache.
     """
 
+    RESPONSE = 'CurrentSummationDelivered'
+
     ARGS = [
         Hex('MeterMacId'),
         Boolean('Refresh'),
@@ -317,6 +437,8 @@ class get_current_period_usage(Command):
     GET_CURRENT_SUMMATION_DELIVERED command with Refresh set to Y.
     """
 
+    RESPONSE = 'CurrentPeriodUsage'
+
     ARGS = [
         Hex('MeterMacId'),
     ]
@@ -328,6 +450,8 @@ class get_last_period_usage(Command):
     accumulation data from the RAVEn(TM).
     """
 
+    RESPONSE = 'LastPeriodUsage'
+
     ARGS = [
         Hex('MeterMacId'),
     ]
@@ -339,6 +463,8 @@ class close_current_period(Command):
     current period to the last period and to initialize the current period.
     """
 
+    RESPONSE = 'LastPeriodUsage'
+
     ARGS = [
         Hex('MeterMacId'),
     ]
@@ -370,6 +496,11 @@ class get_profile_data(Command):
     interval data information from the meter.
     """
 
+    RESPONSE = 'ProfileData'
+
+    # bulk transfer
+    PRIORITY = 10
+
     ARGS = [
         Hex('MeterMacId'),
         Hex('NumberOfPeriods', required=True, range=(0, 12)),
@@ -385,6 +516,12 @@ class image_block_dump(Command):
     block of the firmware image at the offest specified.
     """
 
+    RESPONSE = 'Firmware'
+    MATCH = ['Offset']
+
+    # bulk transfer
+    PRIORITY = 10
+
     ARGS = [
         Hex('Offset', required=True, range=(0, 0xffffffff)),
         Hex('BlkSize', required=True, range=(0, 0x40)),
@@ -0,0 +1,460 @@
+"""
+SQLite store for parsed responses.
+
+Each response type has a table, with a column for each tag of its parser and
+the time the response was stored (`received`). Tables are indexed by meter
+and time (the `TimeStamp` of the response, or `received` if it has none), for
+time-range reads.
+"""
+
+__all__ = ['Database', 'DatabaseReader']
+
+import json
+import time
+import logging
+import datetime
+import calendar
+import decimal
+import sqlite3
+
+from threading import Thread, Event
+from collections import deque, OrderedDict
+
+from .parser import Parser, ScaleParser
+from .formatter import (
+    String, Base64String, Hex, Decimal, Date, Currency, Boolean,
+    api_encoding,
+)
+from .exception import LoonError
+
+
+# largest integer SQLite can store
+MAX_INTEGER = 0x7fffffffffffffff
+
+
+def _signed(value):
+    """Store a 64-bit unsigned integer as a signed integer."""
+
+    return value - 0x10000000000000000 if value > MAX_INTEGER else value
+
+
+def _unsigned(value):
+    """Read a 64-bit unsigned integer stored as a signed integer."""
+
+    return value + 0x10000000000000000 if value < 0 else value
+
+
+def _text(value):
+    """Store a string as text."""
+
+    return value.decode(api_encoding) if isinstance(value, str) else value
+
+
+# column kind -> (SQL type, value to column, column to value)
+KINDS = {
+    'integer': ('INTEGER', int, int),
+    'unsigned': ('INTEGER', _signed, _unsigned),
+    'real': ('REAL', float, float),
+    'boolean': ('INTEGER', int, bool),
+    'decimal': ('TEXT', str, decimal.Decimal),
+    'text': ('TEXT', _text, lambda x: x),
+    'blob': ('BLOB', buffer, str),
+    'sequence': ('TEXT', json.dumps, json.loads),
+    # dates are converted using the timestamp mode
+    'date': ('INTEGER', None, None),
+}
+
+
+def _kind(cls, formatter):
+    """Column kind for a tag."""
+
+    if formatter.sequence:
+        return 'sequence'
+    elif issubclass(cls, ScaleParser) and formatter.name in cls.NUMBERS:
+        return 'real'
+    elif isinstance(formatter, Date):
+        return 'date'
+    elif isinstance(formatter, (String, Currency)):
+        return 'text'
+    elif isinstance(formatter, Base64String):
+        return 'blob'
+    elif isinstance(formatter, Decimal):
+        return 'decimal'
+    elif isinstance(formatter, Boolean):
+        return 'boolean'
+    elif isinstance(formatter, Hex) and formatter.max > MAX_INTEGER:
+        return 'unsigned'
+
+    return 'integer'
+
+
+def _epoch(value):
+    """Convert a time to epoch seconds."""
+
+    if isinstance(value, datetime.datetime):
+        return calendar.timegm(value.utctimetuple())
+
+    return value
+
+
+def parser_classes():
+    """Parser classes with tags, by response type."""
+
+    result = {}
+    classes = [Parser]
+
+    while classes:
+        cls = classes.pop()
+        classes.extend(cls.__subclasses__())
+        if cls.TAGS:
+            result[cls.__name__] = cls
+
+    return result
+
+
+class Table(object):
+    """Table for a response type."""
+
+    def __init__(self, cls):
+        """Initialise the table from the tags of the parser."""
+
+        self.name = cls.__name__
+
+        # tags removed by the parser are not stored
+        internal = cls.INTERNAL if issubclass(cls, ScaleParser) else []
+
+        kinds = OrderedDict()
+        for formatter in cls.TAGS:
+            if formatter.name not in kinds and formatter.name not in internal:
+                kinds[formatter.name] = _kind(cls, formatter)
+
+        self.kinds = kinds
+
+        self.time = 'TimeStamp' if 'TimeStamp' in kinds else 'received'
+        self.meter = 'MeterMacId' if 'MeterMacId' in kinds else None
+
+        self.insert = 'INSERT INTO "{0}" (received, {1}) VALUES ({2})'.format(
+            self.name,
+            ', '.join('"{0}"'.format(name) for name in kinds),
+            ', '.join('?' * (len(kinds) + 1)),
+        )
+
+    def create(self, connection):
+        """Create the table and its indexes (if they do not exist)."""
+
+        columns = ', '.join(
+            '"{0}" {1}'.format(name, KINDS[kind][0])
+            for name, kind in self.kinds.items()
+        )
+
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS "{0}" '
+            '(received REAL NOT NULL, {1})'.format(self.name, columns)
+        )
+
+        connection.execute(
+            'CREATE INDEX IF NOT EXISTS "{0}_time" '
+            'ON "{0}" ("{1}")'.format(self.name, self.time)
+        )
+
+        if self.meter:
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS "{0}_meter_time" '
+                'ON "{0}" ("{1}", "{2}")'.format(
+                    self.name, self.meter, self.time
+                )
+            )
+
+    def row(self, received, response, timestamps):
+        """Convert a response to a row."""
+
+        row = [received]
+
+        for name, kind in self.kinds.items():
+            value = response.get(name)
+
+            if value is None:
+                pass
+            elif kind == 'date':
+                value = Date.to_epoch(value, timestamps)
+            elif kind == 'sequence':
+                value = json.dumps(list(value))
+            else:
+                value = KINDS[kind][1](value)
+
+            row.append(value)
+
+        return row
+
+    def response(self, row, timestamps):
+        """Convert a row to a response."""
+
+        result = OrderedDict(response_type=self.name)
+
+        for (name, kind), value in zip(self.kinds.items(), row):
+            if value is None:
+                continue
+            elif kind == 'date':
+                if timestamps == 'datetime':
+                    value = datetime.datetime.utcfromtimestamp(value)
+                elif timestamps == 'raw':
+                    value -= Date.EPOCH
+            else:
+                value = KINDS[kind][2](value)
+
+            result[name] = value
+
+        return result
+
+
+class Database(object):
+    """
+    SQLite response store writer.
+
+    The database is opened in WAL mode, so it can be read while responses are
+    being written. Appends are queued in memory and written by a background
+    thread in batches, one transaction per batch, every `commit_interval`
+    seconds (or sooner, once `batch_size` responses are waiting), so appending
+    never waits on disk.
+    """
+
+    def __init__(self, path, commit_interval=1.0, batch_size=1000,
+                 parsers=None, timestamps='datetime'):
+        """Open the database for appending."""
+
+        self.path = path
+        self.commit_interval = commit_interval
+        self.batch_size = batch_size
+        self.timestamps = timestamps
+
+        self._tables = {
+            name: Table(cls)
+            for name, cls in (parsers or parser_classes()).items()
+        }
+
+        # only used by the writer thread once it is started
+        try:
+            self._connection = sqlite3.connect(path, check_same_thread=False)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+
+            with self._connection:
+                for table in self._tables.values():
+                    table.create(self._connection)
+        except sqlite3.Error as e:
+            raise LoonError("Unable to open database: {0}".format(e))
+
+        # counters (responses without a table are skipped)
+        self.written = 0
+        self.failed = 0
+        self.skipped = 0
+
+        self._pending = deque()
+        self._wake = Event()
+        self._idle = Event()
+        self._stop = Event()
+
+        self._thread = Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def append(self, response):
+        """Queue a response to be written."""
+
+        self._pending.append((time.time(), response, self.timestamps))
+
+        if len(self._pending) >= self.batch_size:
+            self._wake.set()
+
+    def _write(self):
+        """Write the queued responses in a single transaction."""
+
+        rows = {}
+        count = 0
+
+        while self._pending:
+            received, response, timestamps = self._pending.popleft()
+
+            table = self._tables.get(response['response_type'])
+            if table is None:
+                self.skipped += 1
+                continue
+
+            # a response that cannot be converted is dropped, not the writer
+            try:
+                row = table.row(received, response, timestamps)
+            except Exception as e:
+                logging.error("Unable to convert response: {0}: {1}".format(
+                    table.name, e
+                ))
+                self.failed += 1
+                continue
+
+            rows.setdefault(table, []).append(row)
+            count += 1
+
+        if rows:
+            try:
+                with self._connection:
+                    for table, values in rows.items():
+                        self._connection.executemany(table.insert, values)
+            except sqlite3.Error as e:
+                logging.error("Unable to write responses: {0}".format(e))
+                self.failed += count
+            else:
+                self.written += count
+
+        if not self._pending:
+            self._idle.set()
+
+    def _run(self):
+        """Background writer."""
+
+        while not self._stop.is_set():
+            self._wake.wait(self.commit_interval)
+            self._wake.clear()
+            self._write()
+
+        self._write()
+        self._connection.close()
+
+    def flush(self, timeout=None):
+        """Wait until the queued responses have been written."""
+
+        if not self._thread.is_alive():
+            return
+
+        self._idle.clear()
+        self._wake.set()
+        self._idle.wait(timeout)
+
+    def close(self):
+        """Write outstanding responses and close the database."""
+
+        if self._stop.is_set():
+            return
+
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+
+
+class DatabaseReader(object):
+    """
+    SQLite response store reader.
+
+    Responses are read back as they were parsed, with dates in the given
+    timestamp mode. Scaled readings are read as floats.
+    """
+
+    def __init__(self, path, parsers=None, timestamps='datetime'):
+        """Open the database for reading."""
+
+        self.path = path
+        self.timestamps = timestamps
+
+        self._tables = {
+            name: Table(cls)
+            for name, cls in (parsers or parser_classes()).items()
+        }
+
+        try:
+            self._connection = sqlite3.connect(path)
+        except sqlite3.Error as e:
+            raise LoonError("Unable to open database: {0}".format(e))
+
+    @property
+    def response_types(self):
+        """Response types in the database."""
+
+        names = set(
+            name for name, in self._connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'"
+            )
+        )
+
+        return sorted(names.intersection(self._tables))
+
+    def _table(self, response_type):
+
+        try:
+            return self._tables[response_type]
+        except KeyError:
+            raise LoonError(
+                "Unknown response type: {0}".format(response_type)
+            )
+
+    def _where(self, table, start, end, meter):
+        """Conditions for a time-range read."""
+
+        conditions, args = [], []
+
+        if meter is not None:
+            if table.meter is None:
+                raise LoonError(
+                    "No meter for response type: {0}".format(table.name)
+                )
+            if isinstance(meter, basestring):
+                meter = int(meter, base=16)
+            conditions.append('"{0}" = ?'.format(table.meter))
+            args.append(_signed(meter))
+
+        if start is not None:
+            conditions.append('"{0}" >= ?'.format(table.time))
+            args.append(_epoch(start))
+
+        if end is not None:
+            conditions.append('"{0}" <= ?'.format(table.time))
+            args.append(_epoch(end))
+
+        where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+
+        return where, args
+
+    def count(self, response_type, start=None, end=None, meter=None):
+        """Count the responses of a type in a time range."""
+
+        table = self._table(response_type)
+        where, args = self._where(table, start, end, meter)
+
+        try:
+            return self._connection.execute(
+                'SELECT COUNT(*) FROM "{0}"{1}'.format(table.name, where),
+                args
+            ).fetchone()[0]
+        except sqlite3.OperationalError:
+            # not yet created
+            return 0
+
+    def select(self, response_type, start=None, end=None, meter=None,
+               limit=None):
+        """
+        Iterate over responses of a type with time in [start, end] (as
+        datetimes or epoch seconds), in time order, optionally only for a
+        meter.
+        """
+
+        table = self._table(response_type)
+        where, args = self._where(table, start, end, meter)
+
+        query = 'SELECT {0} FROM "{1}"{2} ORDER BY "{3}"'.format(
+            ', '.join('"{0}"'.format(name) for name in table.kinds),
+            table.name, where, table.time
+        )
+
+        if limit is not None:
+            query += ' LIMIT ?'
+            args.append(limit)
+
+        try:
+            cursor = self._connection.execute(query, args)
+        except sqlite3.OperationalError:
+            return
+
+        for row in cursor:
+            yield table.response(row, self.timestamps)
+
+    def close(self):
+        """Close the database."""
+
+        self._connection.close()
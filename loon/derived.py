@@ -0,0 +1,140 @@
+"""
+Derived fields, computed from parsed responses.
+"""
+
+__all__ = ['DerivedFields', 'state_name']
+
+import re
+import logging
+
+from .node import Node
+from .exception import LoonError
+
+
+# state names by response type
+_STATE_NAMES = {}
+
+
+def state_name(response_type):
+    """
+    Name of the latest response of a type in expressions, e.g. `price` for
+    PriceCluster and `instantaneous_demand` for InstantaneousDemand.
+    """
+
+    try:
+        return _STATE_NAMES[response_type]
+    except KeyError:
+        pass
+
+    name = response_type
+    if name.endswith('Cluster'):
+        name = name[:-len('Cluster')]
+
+    name = _STATE_NAMES[response_type] = re.sub(
+        r'(?<!^)(?=[A-Z])', '_', name
+    ).lower()
+
+    return name
+
+
+class DerivedFields(object):
+    """
+    Fields computed from expressions on each response, e.g.::
+
+        InstantaneousDemand:
+          kW: Demand
+          cost_rate: Demand * price.Price / 10**price.TrailingDigits
+
+    Expressions are compiled once, and evaluated with the fields of the
+    response and the latest fields of each other response type (by
+    `state_name`) in scope. Responses are added to the state after their
+    fields are derived, so the previous response of the same type is also
+    available.
+    A field is left out if its expression fails (e.g. if there has not yet
+    been a response of a type it uses).
+    """
+
+    def __init__(self, fields=None, records='dict', previous=None):
+        """Initialise the derived fields."""
+
+        # response type -> [(name, code)]
+        self._fields = {}
+
+        # names used by the expressions (including attributes): only these
+        # response types and fields are kept in the state
+        self._names = set()
+
+        for key, expression in Node(fields or {}).items():
+            if len(key) != 2:
+                raise LoonError(
+                    "Invalid derived field: {0}".format('.'.join(key))
+                )
+
+            response_type, name = key
+
+            try:
+                code = compile(
+                    str(expression), '<{0}.{1}>'.format(*key), 'eval'
+                )
+            except SyntaxError as e:
+                raise LoonError("Invalid derived field: {0}: {1}".format(
+                    '.'.join(key), e
+                ))
+
+            self._fields.setdefault(response_type, []).append((name, code))
+            self._names.update(code.co_names)
+
+        if self._fields and records != 'dict':
+            raise LoonError("Derived fields require dict records.")
+
+        # latest response of each type, kept when the fields are changed
+        if previous is not None:
+            self.state = previous.state
+            self._namespace = previous._namespace
+        else:
+            self.state = Node()
+            self._namespace = {}
+
+    def __nonzero__(self):
+        """Return True if there are any derived fields."""
+
+        return bool(self._fields)
+
+    def __call__(self, response):
+        """Add the derived fields to a response, and update the state."""
+
+        response_type = response['response_type']
+
+        values = []
+
+        for name, code in self._fields.get(response_type, ()):
+            try:
+                values.append((name, eval(code, self._namespace, response)))
+            except (NameError, AttributeError, KeyError) as e:
+                logging.debug("Unable to derive field: {0}.{1}: {2}".format(
+                    response_type, name, e
+                ))
+            except Exception as e:
+                logging.warn("Unable to derive field: {0}.{1}: {2}".format(
+                    response_type, name, e
+                ))
+
+        for name, value in values:
+            response[name] = value
+
+        names = self._names
+
+        name = state_name(response_type)
+        if name not in names:
+            return response
+
+        state = self.state
+
+        for key, value in response.items():
+            if key in names:
+                state[name, key] = value
+
+        if name not in self._namespace and name in state:
+            self._namespace[name] = state[name]
+
+        return response
@@ -11,6 +11,7 @@ __all__ = [
 ]
 
 import os.path
+import re
 import datetime
 import calendar
 import decimal
@@ -24,16 +25,33 @@ from xml.etree import cElementTree as ElementTree
 
 from .exception import LoonError
 
-unescape = HTMLParser().unescape
+html_unescape = HTMLParser().unescape
 api_encoding = 'cp1252'
 
+# characters needing escaping (or re-encoding) in byte strings
+special_re = re.compile(r'[&<>\x80-\xff]')
+
 
 def escape(x, encoding=api_encoding):
     """Escape string for HTML."""
 
+    # plain ASCII strings are unchanged
+    if isinstance(x, str) and not special_re.search(x):
+        return x
+
     return cgi_escape(unicode(x)).encode(encoding, 'xmlcharrefreplace')
 
 
+def unescape(x):
+    """Unescape HTML string."""
+
+    # no character references
+    if '&' not in x:
+        return x
+
+    return html_unescape(x)
+
+
 def indent(elem, level=0, shift=2):
     """Indent ElementTree in-place."""
 
@@ -105,6 +123,16 @@ class Formatter(object):
     def parse(self, value):
         """Parse XML API value."""
 
+        # single value
+        if len(value) == 1 and not self.sequence:
+            x = value[0]
+            if x != self.missing:
+                return self._parse(x)
+            elif self.skip:
+                raise SkipSignal("Missing {0}".format(self.name))
+            else:
+                return None
+
         if not self.sequence and len(value) > 1:
             raise LoonError("Sequence not allowed.")
 
@@ -228,16 +256,67 @@ class Date(Hex):
         datetime.datetime(2000, 1, 1).utctimetuple()
     )
 
+    # parsed representations: datetime, integer epoch seconds or the raw
+    # integer offset from the RAVEn(TM) epoch (2000-01-01)
+    TIMESTAMPS = ['datetime', 'epoch', 'raw']
+
+    # number of recent datetimes cached
+    CACHE_SIZE = 256
+
+    # recently parsed datetimes by hex string, in two generations: entries
+    # are promoted from the previous generation on use, and the oldest
+    # generation is dropped when the current one is full
+    _cache = {}
+    _previous = {}
+
     def __init__(self, name, required=False, missing=None, skip=False,
-                 sequence=False):
+                 sequence=False, timestamps='datetime'):
+
+        if timestamps not in self.TIMESTAMPS:
+            raise LoonError("Unknown timestamp mode: {0}".format(timestamps))
+
+        self.timestamps = timestamps
 
         super(Date, self).__init__(
             name, required, missing, skip, sequence, range=(0, 0xffffffff)
         )
 
+    def using(self, timestamps):
+        """Copy of the formatter for a timestamp mode."""
+
+        return Date(
+            self.name, self.required, self.missing, self.skip, self.sequence,
+            timestamps
+        )
+
+    @staticmethod
+    def to_epoch(value, timestamps='datetime'):
+        """Convert a parsed value to epoch seconds."""
+
+        if timestamps == 'datetime':
+            return calendar.timegm(value.utctimetuple())
+        elif timestamps == 'raw':
+            return value + Date.EPOCH
+
+        return value
+
+    @staticmethod
+    def to_datetime(value, timestamps='epoch'):
+        """Convert a parsed value to a datetime."""
+
+        if timestamps == 'datetime':
+            return value
+
+        return datetime.datetime.utcfromtimestamp(
+            Date.to_epoch(value, timestamps)
+        )
+
     def encode(self, obj):
         """Convert object to XML API format."""
 
+        if not isinstance(obj, datetime.datetime):
+            obj = Date.to_datetime(obj, self.timestamps)
+
         return super(Date, self).encode(
             calendar.timegm(obj.utctimetuple()) - Date.EPOCH
         )
@@ -245,9 +324,27 @@ class Date(Hex):
     def _parse(self, value):
         """Convert XML API value to object."""
 
-        return datetime.datetime.utcfromtimestamp(
-            super(Date, self)._parse(value) + Date.EPOCH
-        )
+        if self.timestamps == 'raw':
+            return int(value, base=16)
+        elif self.timestamps == 'epoch':
+            return int(value, base=16) + Date.EPOCH
+
+        try:
+            return Date._cache[value]
+        except KeyError:
+            pass
+
+        result = Date._previous.get(value)
+        if result is None:
+            result = datetime.datetime.utcfromtimestamp(
+                int(value, base=16) + Date.EPOCH
+            )
+
+        if len(Date._cache) >= Date.CACHE_SIZE:
+            Date._previous, Date._cache = Date._cache, {}
+        Date._cache[value] = result
+
+        return result
 
 
 class Currency(Hex):
@@ -260,11 +357,17 @@ class Currency(Hex):
             name, required, missing, skip, sequence, range=(0, 0xffffffff)
         )
 
+    # XML API values by currency code
+    _ENCODE = {code: hex(number) for number, code in currency_code.items()}
+
+    # currency codes by XML API value, as seen
+    _DECODE = {}
+
     def encode(self, obj):
         """Convert object to XML API format."""
 
         try:
-            return super(Currency, self).encode(currency_number[obj])
+            return Currency._ENCODE[obj]
         except KeyError:
             raise LoonError("Unknown currency code: {0}".format(obj))
 
@@ -272,10 +375,19 @@ class Currency(Hex):
         """Convert XML API value to object."""
 
         try:
-            return currency_code[super(Currency, self)._parse(value)]
+            return Currency._DECODE[value]
+        except KeyError:
+            pass
+
+        try:
+            code = currency_code[super(Currency, self)._parse(value)]
         except KeyError:
             raise LoonError("Unknown currency number: {0}".format(value))
 
+        Currency._DECODE[value] = code
+
+        return code
+
 
 class Boolean(Formatter):
     """Boolean format."""
@@ -309,6 +421,12 @@ class EnumerationMeta(type):
         for i, level in enumerate(obj.LEVELS):
             setattr(obj, level.upper(), i)
 
+        # lookup tables: XML API values by level and index, and indices by
+        # XML API value
+        obj._ENCODE = dict(obj.LEVELS)
+        obj._VALUES = tuple(obj.LEVELS.values())
+        obj._DECODE = {value: i for i, value in enumerate(obj._VALUES)}
+
         return obj
 
 
@@ -325,9 +443,9 @@ class Enumeration(Formatter):
 
         try:
             if isinstance(obj, (int, long)):
-                return cls.LEVELS.values()[obj]
+                return cls._VALUES[obj]
             else:
-                return cls.LEVELS[obj]
+                return cls._ENCODE[obj]
         except (IndexError, KeyError):
             raise LoonError("Unknown/invalid level: {0}".format(obj))
 
@@ -335,8 +453,8 @@ class Enumeration(Formatter):
         """Convert XML API value to object."""
 
         try:
-            return self.LEVELS.values().index(value)
-        except IndexError:
+            return self._DECODE[value]
+        except KeyError:
             raise LoonError("Unknown/invalid level: {0}".format(value))
 
 
@@ -416,13 +534,17 @@ class IntervalPeriod(Formatter):
         (150, "2.5 minutes"),
     ])
 
+    # lookup tables: XML API values by period, and periods by XML API value
+    _ENCODE = {period: str(i) for i, period in enumerate(INTERVALS)}
+    _DECODE = {str(i): period for i, period in enumerate(INTERVALS)}
+
     @classmethod
     def encode(cls, obj):
         """Convert object to XML API format."""
 
         try:
-            return str(IntervalPeriod.INTERVALS.index(int(obj)))
-        except IndexError:
+            return IntervalPeriod._ENCODE[int(obj)]
+        except (KeyError, TypeError, ValueError):
             raise LoonError("Unknown/invalid interval: {0}".format(obj))
 
     @staticmethod
@@ -430,6 +552,12 @@ class IntervalPeriod(Formatter):
         """Convert XML API value to object."""
 
         try:
-            return IntervalPeriod.INTERVALS.keys()[int(value)]
-        except IndexError:
+            return IntervalPeriod._DECODE[value]
+        except KeyError:
+            pass
+
+        # other representations of the index (e.g. hex)
+        try:
+            return IntervalPeriod._DECODE[str(int(value, 0))]
+        except (KeyError, ValueError):
             raise LoonError("Unknown/invalid interval: {0}".format(value))
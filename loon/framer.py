@@ -0,0 +1,174 @@
+"""
+Incremental framing of the RAVEn(TM) XML response stream.
+"""
+
+__all__ = ['Framer', 'Frame']
+
+import logging
+
+from collections import namedtuple
+from xml.etree import cElementTree as ElementTree
+from xml.parsers import expat
+
+
+Frame = namedtuple('Frame', ['element', 'raw'])
+
+
+class _FrameEnd(Exception):
+    """Top-level element has been closed."""
+
+    pass
+
+
+class _Resync(Exception):
+    """Restart framing at the given offset."""
+
+    def __init__(self, offset, reason):
+
+        super(_Resync, self).__init__(reason)
+
+        self.offset = offset
+
+
+class Framer(object):
+    """
+    Incremental framer for the RAVEn(TM) XML response stream.
+
+    Raw bytes are fed to an expat parser as they arrive from the device and
+    each complete top-level element is emitted as a parsed element, along
+    with the raw bytes it was parsed from. NUL padding, truncated responses
+    and stray fragments between responses are discarded by the framer.
+    """
+
+    def __init__(self, max_size=0x10000):
+        """Initialise the framer."""
+
+        self.max_size = max_size
+
+        self._parser = None
+        self._buffer = bytearray()
+
+    def _reset(self):
+        """Prepare a new parser for the next response."""
+
+        parser = expat.ParserCreate()
+        parser.buffer_text = True
+        if hasattr(parser, 'returns_unicode'):
+            parser.returns_unicode = False
+
+        parser.StartElementHandler = self._start
+        parser.EndElementHandler = self._end
+        parser.CharacterDataHandler = self._data
+
+        self._parser = parser
+        self._buffer = bytearray()
+        self._stack = []
+        self._offsets = []
+        self._text = []
+        self._root = None
+        self._stop = None
+
+    def _start(self, tag, attrib):
+        """Handle start of element."""
+
+        # RAVEn(TM) responses are only two levels deep, so an element with
+        # children below the root must be the start of a new response
+        if len(self._stack) > 1:
+            raise _Resync(self._offsets[-1], "missing end")
+
+        if self._stack:
+            element = ElementTree.SubElement(self._stack[0], tag)
+        else:
+            element = self._root = ElementTree.Element(tag)
+
+        self._stack.append(element)
+        self._offsets.append(self._parser.CurrentByteIndex)
+        self._text = []
+
+    def _end(self, tag):
+        """Handle end of element."""
+
+        element = self._stack.pop()
+        self._offsets.pop()
+
+        if self._stack:
+            element.text = ''.join(self._text)
+            self._text = []
+            return
+
+        # end of the top-level element: "</" + tag + ">"
+        self._stop = self._parser.CurrentByteIndex + len(tag) + 3
+
+        if not len(element):
+            raise _Resync(self._stop, "missing start")
+
+        raise _FrameEnd()
+
+    def _data(self, text):
+        """Handle character data."""
+
+        if len(self._stack) > 1:
+            self._text.append(text)
+
+    def feed(self, data):
+        """Feed raw bytes to the framer, returning any complete frames."""
+
+        frames = []
+
+        # (only copied if there is padding to remove)
+        if b'\0' in data:
+            data = data.replace(b'\0', b'')
+
+        while data:
+
+            if self._parser is None:
+                # skip anything up to the start of the next response
+                n = data.find(b'<')
+                if n < 0:
+                    break
+
+                data = data[n:]
+                self._reset()
+
+            self._buffer.extend(data)
+
+            try:
+                self._parser.Parse(data, False)
+            except _FrameEnd:
+                frames.append(
+                    Frame(self._root, bytes(self._buffer[:self._stop]))
+                )
+                offset = self._stop
+            except _Resync as e:
+                offset = e.offset
+                logging.warn(
+                    "Discarding truncated response ({0}): {1!r}".format(
+                        e, bytes(self._buffer[:offset])
+                    )
+                )
+            except expat.ExpatError as e:
+                # restart at the next tag after the error
+                offset = self._buffer.find(
+                    b'<', max(self._parser.ErrorByteIndex, 1)
+                )
+                if offset < 0:
+                    offset = len(self._buffer)
+                logging.warn(
+                    "Discarding invalid response ({0}): {1!r}".format(
+                        e, bytes(self._buffer[:offset])
+                    )
+                )
+            else:
+                if len(self._buffer) > self.max_size:
+                    logging.warn(
+                        "Discarding oversized response: {0!r}...".format(
+                            bytes(self._buffer[:80])
+                        )
+                    )
+                    self._parser = None
+                break
+
+            data = bytes(self._buffer[offset:])
+            self._parser = None
+
+        return frames
@@ -0,0 +1,93 @@
+"""
+Results of commands.
+"""
+
+__all__ = ['Future']
+
+import logging
+
+from threading import Event, Lock
+
+from .exception import LoonError
+
+
+class Future(object):
+    """
+    Result of a command, completed from the capture thread.
+
+    Mirrors the parts of the `concurrent.futures.Future` interface used by
+    Loon, without requiring the backport on Python 2.
+    """
+
+    def __init__(self):
+        """Initialise the future."""
+
+        self._event = Event()
+        self._lock = Lock()
+        self._result = None
+        self._exception = None
+        self._callbacks = []
+
+    def done(self):
+        """Return True if the future has completed."""
+
+        return self._event.is_set()
+
+    def result(self, timeout=None):
+        """Wait for and return the result, raising any exception."""
+
+        if not self._event.wait(timeout):
+            raise LoonError("Timed out waiting for result.")
+
+        if self._exception is not None:
+            raise self._exception
+
+        return self._result
+
+    def exception(self, timeout=None):
+        """Wait for and return the exception (or None)."""
+
+        if not self._event.wait(timeout):
+            raise LoonError("Timed out waiting for result.")
+
+        return self._exception
+
+    def add_done_callback(self, callback):
+        """Call `callback(future)` when the future completes."""
+
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+
+        callback(self)
+
+    def _complete(self, result, exception):
+
+        with self._lock:
+            if self._event.is_set():
+                raise LoonError("Future already completed.")
+
+            self._result = result
+            self._exception = exception
+            self._event.set()
+
+            callbacks, self._callbacks = self._callbacks, []
+
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception:
+                logging.exception(
+                    "Future callback failed: {0}".format(callback)
+                )
+
+    def set_result(self, result):
+        """Complete the future with a result."""
+
+        self._complete(result, None)
+
+    def set_exception(self, exception):
+        """Complete the future with an exception."""
+
+        self._complete(None, exception)
@@ -0,0 +1,414 @@
+"""
+Append-only journal of raw response frames.
+
+The journal is a data file of raw frames, with fixed-width index files of
+(receive time, offset, length, response type) entries: one for all frames
+(`<path>.idx`) and one per response type (`<path>.<type>.idx`). Index entries
+are in time order, so they can be binary searched in place through `mmap`.
+"""
+
+__all__ = ['Journal', 'JournalReader', 'Entry']
+
+import os
+import glob
+import mmap
+import time
+import struct
+import logging
+
+from threading import Thread, Event, Lock
+from collections import deque, namedtuple
+
+from .exception import LoonError
+
+
+# (receive time, offset, length, response type)
+TYPE_SIZE = 32
+INDEX = struct.Struct('<dQI{0}s'.format(TYPE_SIZE))
+
+Entry = namedtuple('Entry', ['time', 'response_type', 'raw'])
+
+
+def index_path(path, response_type=None):
+    """Path of an index file."""
+
+    if response_type is None:
+        return '{0}.idx'.format(path)
+    else:
+        return '{0}.{1}.idx'.format(path, response_type)
+
+
+def _truncate(path, size):
+    """Truncate a file."""
+
+    with open(path, 'r+b') as f:
+        f.truncate(size)
+
+
+def _trim_index(path, size):
+    """
+    Drop partial entries, and entries referring past `size` bytes of data,
+    from the end of an index.
+
+    Returns the end of the data referred to by the last remaining entry.
+    """
+
+    length = os.path.getsize(path)
+    n = length // INDEX.size
+
+    end = 0
+    with open(path, 'rb') as f:
+        while n:
+            f.seek((n - 1) * INDEX.size)
+            t, offset, count, response_type = INDEX.unpack(
+                f.read(INDEX.size)
+            )
+            if offset + count <= size:
+                end = offset + count
+                break
+            n -= 1
+
+    if n * INDEX.size < length:
+        _truncate(path, n * INDEX.size)
+
+    return end
+
+
+class Journal(object):
+    """
+    Append-only raw frame journal writer.
+
+    Appends are buffered in memory and written by a background thread, which
+    syncs the files to disk every `fsync_interval` seconds, so appending never
+    waits on disk.
+    """
+
+    def __init__(self, path, fsync_interval=1.0):
+        """Open the journal for appending."""
+
+        self.path = path
+        self.fsync_interval = fsync_interval
+
+        self._recover()
+
+        self._data = open(path, 'ab')
+        self._data.seek(0, os.SEEK_END)
+        self._offset = self._data.tell()
+        self._indexes = {}
+        self._last = self._last_time(index_path(path))
+
+        self._pending = deque()
+        self._lock = Lock()
+        self._stop = Event()
+
+        self._thread = Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _recover(self):
+        """
+        Trim anything left by an interrupted write, so that appends line up
+        with the existing entries.
+
+        Partial index entries are dropped, then entries referring past the
+        end of the data, and finally any data past the last indexed frame.
+        """
+
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+
+        path = index_path(self.path)
+        end = _trim_index(path, size) if os.path.exists(path) else 0
+        if end < size:
+            _truncate(self.path, end)
+
+        for path in glob.glob(index_path(self.path, '*')):
+            _trim_index(path, end)
+
+    @staticmethod
+    def _last_time(path):
+        """Time of the last (complete) entry of an existing index."""
+
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return 0.0
+
+        size -= size % INDEX.size
+        if not size:
+            return 0.0
+
+        with open(path, 'rb') as f:
+            f.seek(size - INDEX.size)
+            return INDEX.unpack(f.read(INDEX.size))[0]
+
+    def _index(self, response_type=None):
+        """Get an open index file."""
+
+        try:
+            return self._indexes[response_type]
+        except KeyError:
+            pass
+
+        index = open(index_path(self.path, response_type), 'ab')
+        self._indexes[response_type] = index
+
+        return index
+
+    def append(self, raw, response_type, received=None):
+        """
+        Queue a raw frame to be written. The response type must be ASCII, of
+        at most 32 characters, to fit in the index.
+        """
+
+        try:
+            encoded = response_type.encode('ascii')
+        except (UnicodeError, AttributeError):
+            encoded = None
+
+        if encoded is None or not 0 < len(encoded) <= TYPE_SIZE:
+            raise LoonError(
+                "Invalid response type for journal: {0!r}".format(
+                    response_type
+                )
+            )
+
+        if received is None:
+            received = time.time()
+
+        self._pending.append((received, encoded, raw))
+
+    def flush(self, sync=False):
+        """Write queued frames, optionally syncing to disk."""
+
+        with self._lock:
+            while self._pending:
+                t, response_type, raw = self._pending.popleft()
+
+                # keep the index in time order
+                t = self._last = max(t, self._last)
+
+                entry = INDEX.pack(t, self._offset, len(raw), response_type)
+
+                self._data.write(raw)
+                self._index().write(entry)
+                self._index(response_type.decode('ascii')).write(entry)
+
+                self._offset += len(raw)
+
+            # data first, so the index never refers past the end of the data
+            for f in [self._data] + list(self._indexes.values()):
+                f.flush()
+                if sync:
+                    os.fsync(f.fileno())
+
+    def _run(self):
+        """Background writer."""
+
+        try:
+            while not self._stop.wait(self.fsync_interval):
+                self.flush(sync=True)
+        except Exception:
+            logging.exception("Journal writer stopped: %s", self.path)
+
+    def close(self):
+        """Flush outstanding frames and close the journal."""
+
+        if self._stop.is_set():
+            return
+
+        self._stop.set()
+        self._thread.join()
+
+        self.flush(sync=True)
+
+        for f in [self._data] + list(self._indexes.values()):
+            f.close()
+
+
+class _Index(object):
+    """Memory-mapped index file."""
+
+    def __init__(self, path):
+
+        self._file = open(path, 'rb')
+
+        size = os.fstat(self._file.fileno()).st_size
+        self._length = size // INDEX.size
+
+        # ignore any partially written entry
+        if self._length:
+            self._map = mmap.mmap(
+                self._file.fileno(), self._length * INDEX.size,
+                access=mmap.ACCESS_READ
+            )
+        else:
+            self._map = None
+
+    def __len__(self):
+
+        return self._length
+
+    def __getitem__(self, i):
+
+        return INDEX.unpack_from(self._map, i * INDEX.size)
+
+    def time(self, i):
+        """Time of an entry."""
+
+        return struct.unpack_from('<d', self._map, i * INDEX.size)[0]
+
+    def bisect(self, t, right=False):
+        """Binary search for the position of a time."""
+
+        lo, hi = 0, self._length
+
+        while lo < hi:
+            mid = (lo + hi) // 2
+            x = self.time(mid)
+            if x < t or (right and x == t):
+                lo = mid + 1
+            else:
+                hi = mid
+
+        return lo
+
+    def close(self):
+
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+
+class JournalReader(object):
+    """
+    Lazy journal reader.
+
+    Index and data files are memory-mapped, and frames are only read when
+    their entries are accessed, so large journals can be scanned without
+    loading them into memory.
+    """
+
+    def __init__(self, path):
+        """Open the journal for reading."""
+
+        self.path = path
+        self._indexes = {}
+        self._file = None
+        self._map = None
+
+        self.refresh()
+
+    def refresh(self):
+        """Re-map the journal to pick up frames written since opening."""
+
+        self.close()
+
+        try:
+            self._file = open(self.path, 'rb')
+        except IOError as e:
+            raise LoonError("Unable to open journal: {0}".format(e))
+
+        size = os.fstat(self._file.fileno()).st_size
+        if size:
+            self._map = mmap.mmap(
+                self._file.fileno(), size, access=mmap.ACCESS_READ
+            )
+
+    def _index(self, response_type=None):
+        """Get a mapped index."""
+
+        try:
+            return self._indexes[response_type]
+        except KeyError:
+            pass
+
+        path = index_path(self.path, response_type)
+        if not os.path.exists(path):
+            return None
+
+        index = self._indexes[response_type] = _Index(path)
+
+        return index
+
+    @property
+    def response_types(self):
+        """Response types in the journal."""
+
+        prefix, suffix = self.path + '.', '.idx'
+
+        return sorted(
+            x[len(prefix):-len(suffix)]
+            for x in glob.glob(index_path(self.path, '*'))
+        )
+
+    def __len__(self):
+        """Return the number of frames in the journal."""
+
+        index = self._index()
+        return len(index) if index is not None else 0
+
+    def _entry(self, entry):
+        """Read the frame for an index entry."""
+
+        t, offset, length, response_type = entry
+
+        if self._map is not None and offset + length <= len(self._map):
+            raw = self._map[offset:offset + length]
+        else:
+            # written since the data file was mapped
+            self._file.seek(offset)
+            raw = self._file.read(length)
+
+        return Entry(t, response_type.rstrip(b'\0').decode('ascii'), raw)
+
+    def __getitem__(self, i):
+        """Get an entry by position."""
+
+        index = self._index()
+
+        if index is None:
+            raise IndexError("journal index out of range")
+        if i < 0:
+            i += len(index)
+        if not 0 <= i < len(index):
+            raise IndexError("journal index out of range")
+
+        return self._entry(index[i])
+
+    def __iter__(self):
+        """Return an iterator over all entries."""
+
+        return self.select()
+
+    def select(self, start=None, end=None, response_type=None):
+        """
+        Iterate over entries with receive time in [start, end], optionally
+        restricted to a response type.
+        """
+
+        index = self._index(response_type)
+        if index is None:
+            return
+
+        lo = 0 if start is None else index.bisect(start)
+        hi = len(index) if end is None else index.bisect(end, right=True)
+
+        for i in range(lo, hi):
+            yield self._entry(index[i])
+
+    def close(self):
+        """Close the journal."""
+
+        for index in self._indexes.values():
+            index.close()
+        self._indexes = {}
+
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -4,10 +4,7 @@ Loon main class.
 
 # TODO
 # - defaults need to (potentially) be converted
-# - capture a response to command (blocking)
-#   - repeat until a response received!
 # - testing
-# - alternative results stores
 # - client/server
 
 __all__ = ['Loon']
@@ -15,12 +12,15 @@ __all__ = ['Loon']
 import os
 import re
 import time
+import heapq
 import types
 import logging
 
-from threading import Thread, Event
-from collections import deque
+from threading import (
+    Thread, Event, Lock, Condition, Timer, current_thread
+)
 from functools import partial
+from collections import deque
 
 import serial
 from serial.tools.list_ports import comports
@@ -28,15 +28,22 @@ import yaml
 
 from .command import *
 from .parser import *
-from .node import Node
+from .parser import Parser
+from .node import Node, FrozenNode
+from .framer import Framer
+from .buffer import ReadBuffer, ReadCounter
+from .store import ResponseStore
+from .timeseries import TimeSeries, Series
+from .formatter import Date
+from .journal import Journal
+from .database import Database
+from .future import Future
+from .writer import CommandWriter
+from .derived import DerivedFields
 from .exception import LoonError
 from formatter import SkipSignal
 
 
-start_re = re.compile(r'^<([a-zA-Z]+)>$')
-end_re = re.compile(r'^</([a-zA-Z]+)>$')
-
-
 class LoonMeta(type):
     """Loon meta-class to populate parsers and commands."""
 
@@ -44,13 +51,18 @@ class LoonMeta(type):
 
         obj = super(LoonMeta, cls).__new__(cls, name, bases, dict)
 
-        # register parsers on class
-        obj.PARSERS = {cls.__name__: cls for cls in dict['PARSERS']}
+        # register parsers on class (subclasses inherit them)
+        if 'PARSERS' in dict:
+            obj.PARSERS = {cls.__name__: cls for cls in dict['PARSERS']}
 
         # add methods for commands to class
-        for command in dict['COMMANDS']:
+        for command in dict.get('COMMANDS', []):
             def command_method(self, command=command, **args):
-                self._serial.write(command(defaults=self.defaults, **args))
+                defaults = self.defaults
+                return self._request(
+                    command, command(defaults=defaults, **args),
+                    command.match(defaults, **args)
+                )
             command_method.__doc__ = command.__doc__
 
             setattr(obj, command.__name__, command_method)
@@ -105,23 +117,130 @@ class Loon(object):
     ]
 
     def __init__(self, device=None, start_capture=True,
-                 options=None, defaults=None):
-        """Initialise the Loon."""
-
-        self._options = Node({
-            'use_formatting': True
+                 options=None, defaults=None, writer=CommandWriter):
+        """
+        Initialise the Loon. Commands are queued on a writer created by
+        `writer(write, rate)` (by default, one writing from its own thread).
+        """
+
+        options_ = Node({
+            'use_formatting': True,
+            'records': 'dict',
+            'lazy': {
+                'validate': 'access',
+            },
+            # response type -> fields to parse (by default, all), along with
+            # the fields replies to commands are matched by
+            'fields': {},
+            # response type -> derived field -> expression
+            'derived': {},
+            # datetime, epoch (seconds) or raw (seconds since 2000-01-01)
+            'timestamps': 'datetime',
+            'read': {
+                'chunk_size': 4096,
+                'timeout': 0.1,
+            },
+            'store': {
+                'size': None,
+                'policy': 'drop_oldest',
+                # when off, only responses of subscribed types are stored
+                # (with no subscribers, none are)
+                'unsubscribed': True,
+            },
+            'timeseries': False,
+            'journal': {
+                'path': None,
+                'fsync_interval': 1.0,
+            },
+            'database': {
+                'path': None,
+                'commit_interval': 1.0,
+                'batch_size': 1000,
+            },
+            'command': {
+                'timeout': 5.0,
+                'retries': 0,
+            },
+            'write': {
+                'rate': 11520,
+            },
         })
         if options:
-            self._options.update(options)
+            options_.update(Node(options))
+
+        # immutable snapshot, replaced when options are changed
+        self._options = FrozenNode(options_)
+        self._check_options(self._options)
+        self._options_lock = Lock()
 
         self._defaults = defaults if defaults else {}
 
-        self.responses = deque()
+        # fields computed from responses as they are captured
+        self._derived = DerivedFields(
+            self._options.get('derived'), self._options['records']
+        )
+
+        self.responses = ResponseStore(
+            self._options['store.size'], self._options['store.policy']
+        )
+        self.read_counter = ReadCounter()
+
+        # callbacks by response type (None for all types)
+        self._subscribers = {}
+        self._subscribe_lock = Lock()
+        self._store_unsubscribed = self._options['store.unsubscribed']
+
+        # conditions of blocking iterators over responses
+        self._iterators = set()
+
+        # commands awaiting a response, by response type
+        self._pending = {}
+        self._pending_lock = Lock()
+
+        # deadlines of pending commands (a heap), expired by a single timer
+        self._deadlines = []
+        self._timer = None
+        self._timer_lock = Lock()
+
+        # readings are kept in columns rather than as records
+        self.timeseries = TimeSeries(
+            self._options['timestamps']
+        ) if self._options['timeseries'] else None
 
         if not device:
             device = self._detect_device()
 
-        self._serial = serial.Serial(device, baudrate=115200)
+        # opened before the journal and database (and their threads), which
+        # are closed again if they cannot all be opened
+        self._serial = self._open(device)
+        self.journal = self.database = None
+
+        try:
+            # raw frame journal
+            if self._options['journal.path']:
+                self.journal = Journal(
+                    self._options['journal.path'],
+                    self._options['journal.fsync_interval']
+                )
+
+            # SQLite response store
+            if self._options['database.path']:
+                self.database = Database(
+                    self._options['database.path'],
+                    self._options['database.commit_interval'],
+                    self._options['database.batch_size'],
+                    self.PARSERS, self._options['timestamps']
+                )
+        except Exception:
+            if self.journal is not None:
+                self.journal.close()
+            self._serial.close()
+            raise
+
+        # 115200 baud is 11520 bytes per second
+        self.writer = writer(self._write, self._options['write.rate'])
+
+        self._framer = Framer()
 
         self._thread = None
         self._stop = Event()
@@ -144,6 +263,13 @@ class Loon(object):
             start_capture=True
         )
 
+    def _open(self, device):
+        """Open the serial port for the device."""
+
+        return serial.Serial(
+            device, baudrate=115200, timeout=self._options['read.timeout']
+        )
+
     def _detect_device(self):
         """Guess RAVEn device name."""
 
@@ -169,13 +295,6 @@ class Loon(object):
                 "{0}".format(', '.join(devices))
             )
 
-    def _get_line(self):
-        """Get a line of data."""
-
-        line = self._serial.readline()
-
-        return line.lstrip('\0').rstrip()
-
     def start_capture(self):
         """Start capturing data in background."""
 
@@ -192,6 +311,14 @@ class Loon(object):
 
         self._stop.set()
 
+        # end blocking iteration over responses
+        with self._subscribe_lock:
+            iterators = list(self._iterators)
+
+        for condition in iterators:
+            with condition:
+                condition.notify_all()
+
     @property
     def capturing(self):
         """Return True if background capturing thread is active."""
@@ -206,9 +333,85 @@ class Loon(object):
         else:
             del self._defaults[arg]
 
+    def set_option(self, option, value):
+        """Set an option."""
+
+        self.update_options({option: value})
+
+    def update_options(self, options):
+        """
+        Update options, replacing the snapshot used by the capture thread.
+        Options used to set up the Loon (e.g. read, store and journal) only
+        take effect when it is created.
+        """
+
+        with self._options_lock:
+            node = self._options.thaw()
+            node.update(Node(options))
+
+            options = FrozenNode(node)
+            self._check_options(options)
+
+            derived = DerivedFields(
+                options.get('derived'), options['records'], self._derived
+            )
+
+            self._options = options
+            self._derived = derived
+            self._store_unsubscribed = self._options['store.unsubscribed']
+
+            if self.database is not None:
+                self.database.timestamps = self._options['timestamps']
+            if self.timeseries is not None:
+                self.timeseries.timestamps = self._options['timestamps']
+
+    def _check_options(self, options):
+        """Check options, rather than failing on each response."""
+
+        if options['timestamps'] not in Date.TIMESTAMPS:
+            raise LoonError(
+                "Unknown timestamp mode: {0}".format(options['timestamps'])
+            )
+
+        if options['records'] not in Parser.RECORDS:
+            raise LoonError(
+                "Unknown record type: {0}".format(options['records'])
+            )
+
+        if options['lazy.validate'] not in Parser.VALIDATE:
+            raise LoonError(
+                "Unknown validation: {0}".format(options['lazy.validate'])
+            )
+
+        fields = options.get('fields')
+
+        for key, value in fields.items() if fields else []:
+            response_type = key[0]
+
+            try:
+                parser = self.PARSERS[response_type]
+            except KeyError:
+                raise LoonError(
+                    "Unknown response type: {0}".format(response_type)
+                )
+
+            parser.check_fields(value)
+
+            # readings are kept by time
+            if options['timeseries'] and parser in TimeSeries.PARSERS:
+                time = Series.time_field(parser)
+                if time not in value:
+                    raise LoonError(
+                        "Time series need {0} for {1}.".format(
+                            time, response_type
+                        )
+                    )
+
     def options():
         def fget(self):
-            return self._options.copy()
+            return self._options
+        def fset(self, value):
+            self.update_options(value)
         return locals()
     options = property(**options())
 
@@ -218,89 +421,415 @@ class Loon(object):
         return locals()
     defaults = property(**defaults())
 
-    def _get_responses(self):
-        """Main background process to capture and process data."""
+    def _process(self, element, raw):
+        """Parse a framed response and store the result."""
 
-        start_found = False
-        response = []
+        # get the parser for the response-type
+        tag = element.tag
 
-        while not self._stop.is_set():
+        try:
+            parser = self.PARSERS[tag]
+        except KeyError as e:
+            logging.warn(
+                "Unhandled response type: "
+                "{0}: {1}: {2}".format(tag, e, raw)
+            )
+            return
+
+        try:
+            response = parser(element, self.options)
+        except LoonError as e:
+            logging.error(
+                "Invalid response data: "
+                "{0}: {1}: {2!r}".format(tag, e, raw)
+            )
+        except SkipSignal as e:
+            logging.debug(
+                "Skipped response: {0}: {1}".format(tag, e)
+            )
+        else:
+            # formatted only if logged: formatting decodes lazy records
+            logging.debug("Captured response: %s: %s", tag, response)
+            self._store(response)
+
+    def subscribe(self, callback, response_type=None, meter=None):
+        """
+        Call `callback(response)` from the capture thread for each response
+        of a type (or all types), optionally only for a meter.
+        """
+
+        if isinstance(meter, basestring):
+            meter = int(meter, base=16)
+
+        with self._subscribe_lock:
+            self._subscribers[response_type] = self._subscribers.get(
+                response_type, ()
+            ) + ((callback, meter),)
 
-            line = self._get_line()
+    def unsubscribe(self, callback, response_type=None, meter=None):
+        """Remove a subscription."""
 
-            # look for truncated responses
-            n = line.rfind('<')
-            head, tail = line[:n], line[n:]
+        if isinstance(meter, basestring):
+            meter = int(meter, base=16)
 
-            start = start_re.match(tail)
-            end = end_re.match(head or tail)
+        with self._subscribe_lock:
+            subscribers = list(self._subscribers.get(response_type, ()))
 
-            if start:
-                # potentially (and probably) truncated line
-                if head:
-                    response.append(head)
+            try:
+                subscribers.remove((callback, meter))
+            except ValueError:
+                raise LoonError("Not subscribed: {0}".format(callback))
+
+            if subscribers:
+                self._subscribers[response_type] = tuple(subscribers)
             else:
-                response.append(line)
-
-            if end:
-                if start_found:
-
-                    # get the parser for the response-type
-                    tag = end.group(1)
-
-                    try:
-                        parser = self.PARSERS[tag]
-                    except KeyError as e:
-                        logging.warn(
-                            "Unhandled response type: "
-                            "{0}: {1}: {2}".format(
-                                tag, e, '\n'.join(response)
-                            )
-                        )
-                        start_found = False
-                        response = []
-                        continue
+                del self._subscribers[response_type]
 
-                    try:
-                        response = parser(response, self.options)
-                    except LoonError as e:
-                        logging.error(
-                            "Invalid response data: "
-                            "{0}: {1}: {2!r}".format(
-                                tag, e, '\n'.join(response)
-                            )
-                        )
-                    except SkipSignal as e:
-                        logging.debug(
-                            "Skipped response: {0}: {1}".format(tag, e)
-                        )
-                    else:
-                        logging.debug(
-                            "Captured response: {0}: {1}".format(tag, response)
-                        )
-                        self.responses.append(response)
+    def iter_responses(self, types=None, timeout=None):
+        """
+        Iterate over responses (of the given types) as they are captured,
+        until capture stops or none arrive within `timeout` seconds.
+        """
 
-                else:
-                    logging.warn(
-                        "Discarding truncated response (missing start): "
-                        "{0!r}".format('\n'.join(response))
-                    )
+        if isinstance(types, basestring):
+            types = [types]
+
+        queue = deque()
+        condition = Condition()
+
+        def callback(response):
+            with condition:
+                queue.append(response)
+                condition.notify()
 
-                start_found = False
-                response = []
+        with self._subscribe_lock:
+            self._iterators.add(condition)
 
-            # check this last in case there was a truncated end record
-            if start:
-                if response:
-                    logging.warn(
-                        "Discarding truncated response (missing end): "
-                        "{0!r}".format('\n'.join(response))
+        for response_type in types or [None]:
+            self.subscribe(callback, response_type)
+
+        try:
+            while True:
+                with condition:
+                    deadline = (
+                        time.time() + timeout if timeout is not None else None
                     )
 
-                start_found = True
-                response = [tail]
+                    # wait out the whole timeout, whatever wakes the thread
+                    while not queue and not self._stop.is_set():
+                        if deadline is None:
+                            condition.wait()
+                            continue
 
-    def __del__(self):
+                        remaining = deadline - time.time()
+                        if remaining <= 0:
+                            break
+                        condition.wait(remaining)
+
+                    if not queue:
+                        return
+                    response = queue.popleft()
+
+                yield response
+        finally:
+            for response_type in types or [None]:
+                self.unsubscribe(callback, response_type)
+
+            with self._subscribe_lock:
+                self._iterators.discard(condition)
+
+    def _dispatch(self, response):
+        """
+        Call the subscribers for a response, returning True if the response
+        type has any.
+        """
+
+        subscribers = self._subscribers
+        if not subscribers:
+            return False
+
+        matched = subscribers.get(response['response_type'], ())
+        subscribed = bool(matched)
+
+        matched += subscribers.get(None, ())
+        if not matched:
+            return False
+
+        meter_id = response.get('MeterMacId')
+
+        for callback, meter in matched:
+            if meter is not None and meter != meter_id:
+                continue
+            try:
+                callback(response)
+            except Exception:
+                logging.exception(
+                    "Subscriber failed: {0}".format(callback)
+                )
+
+        return subscribed or None in subscribers
+
+    def _store(self, response):
+        """Store a parsed response."""
+
+        if self._derived:
+            self._derived(response)
+
+        if self._pending:
+            self._correlate(response)
+
+        if self.database is not None:
+            self.database.append(response)
+
+        if not self._dispatch(response) and not self._store_unsubscribed:
+            return
+
+        if (
+            self.timeseries is not None and
+            response['response_type'] in self.timeseries
+        ):
+            self.timeseries.append(response)
+        else:
+            self.responses.append(response)
+
+    def _receive(self, data, received=None):
+        """Frame and process data received from the device."""
+
+        for element, raw in self._framer.feed(data):
+            if self.journal is not None:
+                try:
+                    self.journal.append(raw, element.tag, received)
+                except LoonError as e:
+                    logging.error("Frame not journaled: {0}".format(e))
+            self._process(element, raw)
+
+    def _send(self, data, priority=0, future=None):
+        """
+        Queue a command to be written to the device. The future (if given)
+        completes once the command has been written.
+        """
+
+        self.writer.put(data, priority, future)
+
+    def _write(self, data):
+        """Write a command to the device."""
+
+        self._serial.write(data)
+
+    def _future(self):
+        """Create a future for the result of a command."""
+
+        return Future()
+
+    def _request(self, command, data, match=()):
+        """
+        Send a command, returning a future for the response to it (or for
+        None if the command has no response). The response must have the
+        (field, value) pairs in `match`, e.g. the meter the command is for.
+        """
+
+        future = self._future()
+
+        if command.RESPONSE is None:
+            self._send(data, command.PRIORITY, future)
+            return future
+
+        timeout = self._options['command.timeout']
+        deadline = time.time() + timeout if timeout is not None else None
+
+        # request: [data, priority, deadline, retries remaining, future, match]
+        request = [
+            data, command.PRIORITY, deadline,
+            self._options['command.retries'], future, match,
+        ]
+
+        with self._pending_lock:
+            self._pending.setdefault(command.RESPONSE, deque()).append(request)
+
+        self._send(data, command.PRIORITY)
+
+        if deadline is not None:
+            self._schedule(deadline)
+
+        return future
+
+    def _correlate(self, response):
+        """Complete the oldest command waiting for the response."""
+
+        response_type = response['response_type']
+
+        with self._pending_lock:
+            requests = self._pending.get(response_type)
+            if not requests:
+                return
+
+            # e.g. a reply from another meter is not a match
+            for request in requests:
+                if all(response.get(k) == v for k, v in request[5]):
+                    break
+            else:
+                return
+
+            requests.remove(request)
+            if not requests:
+                del self._pending[response_type]
+
+        future = request[4]
+        if not future.done():
+            future.set_result(response)
+
+    def _expire(self, now=None):
+        """Resend or fail commands that have not had a response in time."""
+
+        now = now or time.time()
+
+        resend = []
+        failed = []
+
+        with self._pending_lock:
+            for response_type, requests in list(self._pending.items()):
+                for request in list(requests):
+                    data, priority, deadline, retries, future, match = request
+
+                    if future.done():
+                        requests.remove(request)
+                    elif deadline is None or deadline > now:
+                        continue
+                    elif retries:
+                        request[2] = now + self._options['command.timeout']
+                        request[3] -= 1
+                        resend.append(request)
+                    else:
+                        requests.remove(request)
+                        failed.append((response_type, future))
+
+                if not requests:
+                    del self._pending[response_type]
+
+        for request in resend:
+            logging.warn("No response to command, resending.")
+            self._send(request[0], request[1])
+            self._schedule(request[2])
+
+        for response_type, future in failed:
+            future.set_exception(LoonError(
+                "Timed out waiting for response: {0}".format(response_type)
+            ))
+
+    def _fail_pending(self, message):
+        """Fail all commands awaiting a response."""
+
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+
+        for requests in pending.values():
+            for request in requests:
+                future = request[4]
+                if not future.done():
+                    future.set_exception(LoonError(message))
+
+    def _schedule(self, deadline):
+        """
+        Arrange for pending commands to be expired after a deadline, even if
+        the capture loop is not running (or is blocked in a read).
+        """
+
+        with self._timer_lock:
+            heapq.heappush(self._deadlines, deadline)
+
+            # the timer is already due first
+            if self._timer is not None and self._deadlines[0] < deadline:
+                return
+
+            self._arm()
+
+    def _arm(self):
+        """(Re)start the timer for the earliest deadline."""
+
+        if self._timer is not None:
+            self._timer.cancel()
+
+        if not self._deadlines:
+            self._timer = None
+            return
+
+        self._timer = Timer(
+            max(self._deadlines[0] - time.time(), 0), self._on_timer
+        )
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self):
+        """Expire pending commands, then wait for the next deadline."""
+
+        self._expire()
+
+        with self._timer_lock:
+            # replaced while expiring
+            if self._timer is not current_thread():
+                return
+
+            now = time.time()
+            while self._deadlines and self._deadlines[0] <= now:
+                heapq.heappop(self._deadlines)
+
+            self._timer = None
+            self._arm()
+
+    def _get_responses(self):
+        """Main background process to capture and process data."""
+
+        buffer = ReadBuffer(self._options['read.chunk_size'])
+
+        while not self._stop.is_set():
+
+            if self._pending:
+                self._expire()
+
+            # pull everything available, waiting up to the timeout for data
+            try:
+                data = buffer.read(self._serial)
+            except Exception:
+                # the port was closed under the read
+                if self._stop.is_set():
+                    return
+                raise
+            if not data:
+                continue
+            self.read_counter.update(len(data))
+
+            self._receive(data, time.time())
+
+    def close(self):
+        """
+        Stop capturing and close the device, journal and database, failing
+        commands still awaiting a response.
+        """
 
         self.stop_capture()
+
+        # wait for a read in progress, so the port is not closed under it
+        thread = self._thread
+        if thread is not None and thread is not current_thread():
+            thread.join((self._options['read.timeout'] or 0) + 1.0)
+
+        self.writer.close()
         self._serial.close()
+
+        with self._timer_lock:
+            self._deadlines = []
+            self._arm()
+
+        self._fail_pending("Device closed")
+
+        if self.journal is not None:
+            self.journal.close()
+
+        if self.database is not None:
+            self.database.close()
+
+    def __del__(self):
+
+        # not if initialisation failed
+        if 'writer' in self.__dict__:
+            self.close()
@@ -0,0 +1,297 @@
+"""
+Single-threaded capture for many devices.
+"""
+
+__all__ = ['LoonManager']
+
+import os
+import time
+import heapq
+import errno
+import fcntl
+import logging
+
+from threading import Thread, Event, RLock
+from functools import partial
+from collections import OrderedDict
+
+try:
+    import selectors
+except ImportError:
+    import selectors34 as selectors
+
+from .loon import Loon
+from .writer import CommandWriter
+from .exception import LoonError
+
+
+class _ManagedLoon(Loon):
+    """Loon whose pending commands are expired from the manager's loop."""
+
+    def _schedule(self, deadline):
+        """Keep the deadline for the selector loop, rather than a timer."""
+
+        with self._timer_lock:
+            heapq.heappush(self._deadlines, deadline)
+
+
+class LoonManager(object):
+    """
+    Capture from many devices on a single thread.
+
+    Each device gets its own `Loon` (with its own framer, options and response
+    store), but all of them are read with non-blocking I/O from a single
+    selector loop instead of a capture thread per device. Responses are kept
+    in the store of their device; `responses()` yields them as
+    (device name, response) pairs.
+
+    Subscriptions are made on the Loon of each device, and callbacks receive
+    only the response, without the device name; to tell devices apart,
+    subscribe a callback bound to the name, such as
+    `manager[name].subscribe(partial(callback, name))`.
+
+    Commands are also written from the selector loop: each device's writer
+    queues them (in priority order, paced to the write rate of the device),
+    and the loop writes the next one when it is due and the device is
+    writable, so no writer threads are started.
+
+    Devices may be added and removed while the loop is running.
+    """
+
+    def __init__(self, options=None, defaults=None):
+        """Initialise the manager."""
+
+        self.options = options
+        self.defaults = defaults
+
+        self.devices = OrderedDict()
+
+        # guards the devices and their registrations, changed from any thread
+        self._lock = RLock()
+
+        self._selector = selectors.DefaultSelector()
+
+        # wakes the selector loop when a command is queued from another thread
+        self._wake_read, self._wake_write = os.pipe()
+        for fd in (self._wake_read, self._wake_write):
+            fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) |
+                        os.O_NONBLOCK)
+        self._selector.register(self._wake_read, selectors.EVENT_READ, None)
+
+        self._thread = None
+        self._stop = Event()
+
+    def add(self, device, name=None, options=None, defaults=None):
+        """Register a device, returning its Loon."""
+
+        name = name or device
+
+        with self._lock:
+            if name in self.devices:
+                raise LoonError(
+                    "Device already registered: {0}".format(name)
+                )
+
+            loon = _ManagedLoon(
+                device=device, start_capture=False,
+                options=options or self.options,
+                defaults=defaults or self.defaults,
+                writer=partial(
+                    CommandWriter, threaded=False, on_put=self._wake
+                ),
+            )
+
+            fd = loon._serial.fileno()
+            fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) |
+                        os.O_NONBLOCK)
+
+            self.devices[name] = loon
+            self._selector.register(fd, selectors.EVENT_READ, (name, loon))
+
+        loon.initialize()
+
+        return loon
+
+    def remove(self, name):
+        """Unregister a device, returning its Loon (to be closed)."""
+
+        with self._lock:
+            loon = self.devices.pop(name)
+            self._selector.unregister(loon._serial.fileno())
+
+        return loon
+
+    def __getitem__(self, name):
+        """Get the Loon for a device."""
+
+        return self.devices[name]
+
+    def _wake(self):
+        """Wake the selector loop."""
+
+        try:
+            os.write(self._wake_write, b'\0')
+        except OSError as e:
+            # already woken
+            if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                raise
+
+    def _drain(self):
+        """Clear wake-ups of the selector loop."""
+
+        try:
+            while os.read(self._wake_read, 4096):
+                pass
+        except OSError as e:
+            if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                raise
+
+    def _read(self, name, loon):
+        """Read everything available from a device."""
+
+        try:
+            data = os.read(
+                loon._serial.fileno(), loon._options['read.chunk_size']
+            )
+        except OSError as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return
+            data = None
+            logging.error("Unable to read from {0}: {1}".format(name, e))
+
+        if not data:
+            logging.warn("Device closed: {0}".format(name))
+            self.remove(name).close()
+            return
+
+        loon.read_counter.update(len(data))
+        loon._receive(data, time.time())
+
+    def _watch(self, timeout):
+        """
+        Watch for writes on devices with a command due, returning the timeout
+        shortened to when the next command is due to be written or to time
+        out.
+        """
+
+        now = time.time()
+
+        for name, loon in self.devices.items():
+            # wake for the next command deadline (expired after selecting)
+            with loon._timer_lock:
+                deadlines = loon._deadlines
+                while deadlines and deadlines[0] <= now:
+                    heapq.heappop(deadlines)
+                    timeout = 0
+                if deadlines and (
+                    timeout is None or deadlines[0] - now < timeout
+                ):
+                    timeout = deadlines[0] - now
+
+            delay = loon.writer.delay(now)
+
+            events = selectors.EVENT_READ
+            if delay == 0:
+                events |= selectors.EVENT_WRITE
+            elif delay is not None and (timeout is None or delay < timeout):
+                timeout = delay
+
+            key = self._selector.get_key(loon._serial.fileno())
+            if key.events != events:
+                self._selector.modify(key.fd, events, key.data)
+
+        return timeout
+
+    def poll(self, timeout=None):
+        """
+        Read from all ready devices and write due commands, waiting up to
+        `timeout` seconds.
+        """
+
+        if not self.devices:
+            if timeout:
+                time.sleep(timeout)
+            return
+
+        with self._lock:
+            timeout = self._watch(timeout)
+
+        ready = self._selector.select(timeout)
+
+        with self._lock:
+            for key, events in ready:
+                if key.data is None:
+                    self._drain()
+                    continue
+
+                name, loon = key.data
+
+                # removed while waiting
+                if self.devices.get(name) is not loon:
+                    continue
+
+                if events & selectors.EVENT_READ:
+                    self._read(name, loon)
+
+                if events & selectors.EVENT_WRITE and name in self.devices:
+                    loon.writer.write_next()
+
+            loons = list(self.devices.values())
+
+        for loon in loons:
+            if loon._pending:
+                loon._expire()
+
+    def run(self):
+        """Capture from all devices until stopped."""
+
+        while not self._stop.is_set():
+            self.poll(0.1)
+
+    def start(self):
+        """Capture from all devices in a (single) background thread."""
+
+        if not self.capturing:
+            self._stop.clear()
+            self._thread = Thread(target=self.run)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        """Stop capturing."""
+
+        self._stop.set()
+
+    @property
+    def capturing(self):
+        """Return True if the background thread is active."""
+
+        return self._thread is not None and self._thread.is_alive()
+
+    def responses(self):
+        """
+        Remove and iterate over stored responses, as (name, response) pairs,
+        where `name` is the name the device was added with.
+        """
+
+        with self._lock:
+            devices = list(self.devices.items())
+
+        for name, loon in devices:
+            while loon.responses:
+                yield name, loon.responses.popleft()
+
+    def close(self):
+        """Stop capturing and close all devices."""
+
+        self.stop()
+        if self._thread is not None:
+            self._thread.join()
+
+        for name in list(self.devices):
+            self.remove(name).close()
+
+        self._selector.close()
+
+        os.close(self._wake_read)
+        os.close(self._wake_write)
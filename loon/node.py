@@ -1,61 +1,333 @@
 from collections import OrderedDict, MutableMapping
-from operator import itemgetter
+from itertools import count
+
+
+class _Tree(object):
+    """
+    Flat storage for a node tree.
+
+    Leaf values are kept by their full path (a tuple of keys), along with an
+    index of the child keys of each internal node (in insertion order) and
+    the number of leaves below it, so that lookups, lengths and iteration do
+    not recurse. A tree may be shared by copies of a node, in which case it
+    is copied by the first of them to change it.
+
+    Nodes set as values are kept by reference, as leaves, and are also
+    indexed in `mounts` (by path), so that paths through them can be found.
+    """
+
+    def __init__(self):
+
+        self.values = {}
+        self.children = {(): OrderedDict()}
+        self.sizes = {(): 0}
+        self.mounts = {}
+
+        # number of nodes sharing the tree
+        self.owners = 1
+
+    def clone(self, copy_mounts=False):
+        """
+        Copy of the tree, for a single owner, optionally with copies of the
+        mounted nodes.
+        """
+
+        tree = _Tree()
+        tree.values = self.values.copy()
+        tree.children = {
+            prefix: children.copy()
+            for prefix, children in self.children.items()
+        }
+        tree.sizes = self.sizes.copy()
+        tree.mounts = self.mounts.copy()
+
+        if copy_mounts:
+            for path, node in tree.mounts.items():
+                tree.values[path] = tree.mounts[path] = node.copy()
+
+        return tree
+
+    def walk(self, prefix):
+        """
+        Iterate depth-first over the paths below an internal node, as
+        (path, is_leaf) pairs.
+        """
+
+        children = self.children
+        stack = [(prefix, iter(children.get(prefix, ())))]
+
+        while stack:
+            parent, keys = stack[-1]
+            for key in keys:
+                path = parent + (key,)
+                if path in children:
+                    yield path, False
+                    stack.append((path, iter(children[path])))
+                    break
+                yield path, True
+            else:
+                stack.pop()
+
+    def _adjust(self, path, n):
+        """Adjust the leaf counts of the ancestors of a path."""
+
+        sizes = self.sizes
+        for i in range(len(path)):
+            sizes[path[:i]] += n
+
+    def remove(self, path, unlink=True):
+        """
+        Remove a leaf or internal node, keeping its place among its siblings
+        if it is to be replaced.
+        """
+
+        mounts = self.mounts
+
+        if path in self.values:
+            del self.values[path]
+            self._adjust(path, -1)
+            if mounts:
+                mounts.pop(path, None)
+        elif path in self.children:
+            self._adjust(path, -self.sizes[path])
+
+            for sub_path, is_leaf in list(self.walk(path)):
+                if is_leaf:
+                    del self.values[sub_path]
+                    if mounts:
+                        mounts.pop(sub_path, None)
+                else:
+                    del self.children[sub_path]
+                    del self.sizes[sub_path]
+
+            del self.children[path]
+            del self.sizes[path]
+        else:
+            raise KeyError(path)
+
+        if unlink:
+            del self.children[path[:-1]][path[-1]]
+
+    def node(self, path):
+        """Ensure there is an internal node at a path."""
+
+        for i in range(len(path)):
+            sub_path = path[:i + 1]
+
+            if sub_path in self.children:
+                continue
+
+            # leaves on the way are replaced by nodes
+            if sub_path in self.values:
+                self.remove(sub_path, unlink=False)
+
+            self.children[path[:i]][path[i]] = None
+            self.children[sub_path] = OrderedDict()
+            self.sizes[sub_path] = 0
+
+    def set(self, path, value):
+        """Set a leaf value, replacing any node at the path."""
+
+        if path in self.values:
+            self.values[path] = value
+            if self.mounts:
+                self.mounts.pop(path, None)
+            return
+
+        self.node(path[:-1])
+
+        if path in self.children:
+            self.remove(path, unlink=False)
+
+        self.children[path[:-1]][path[-1]] = None
+        self.values[path] = value
+        self._adjust(path, 1)
+
+    def mount(self, path, node):
+        """Set a node as a leaf value, keeping it by reference."""
+
+        self.set(path, node)
+        self.mounts[path] = node
+
+    def graft(self, path, node):
+        """Copy the values (and structure) of a node tree in at a path."""
+
+        if path in self.values or path in self.children:
+            self.remove(path, unlink=False)
+        self.node(path)
+
+        source = node._ref.tree
+        start = len(node._prefix)
+
+        for sub_path, is_leaf in list(source.walk(node._prefix)):
+            target = path + sub_path[start:]
+            if not is_leaf:
+                self.node(target)
+            elif sub_path in source.mounts:
+                self.graft(target, source.mounts[sub_path])
+            else:
+                self.set(target, source.values[sub_path])
+
+    def inline(self):
+        """Replace the mounted nodes with copies of their values."""
+
+        for path, node in list(self.mounts.items()):
+            self.graft(path, node)
+
+
+class _Ref(object):
+    """Reference to a (possibly shared) tree, held by a node and its views."""
+
+    def __init__(self, tree):
+
+        self.tree = tree
+
+    def writable(self):
+        """Tree to change, copying it first if it is shared."""
+
+        tree = self.tree
+
+        if tree.owners > 1:
+            tree.owners -= 1
+            tree = self.tree = tree.clone()
+
+        return tree
 
 
 class Node(MutableMapping):
     """
     Recursive mapping to use as a `locals()` replacement in `eval`.
+
+    Values are stored flat, by path: getting a key that is a prefix of other
+    keys returns a view of that part of the tree. A node set as a value is
+    kept by reference (as with nested dictionaries), so changes made through
+    either are seen by both.
     """
 
+    # attributes of the node itself, rather than items
+    _ATTRIBUTES = frozenset(['_ref', '_prefix', 'version'])
+
+    # paths of string keys
+    _PATHS = {}
+    PATHS = 1024
+
     def __init__(self, *args, **kwargs):
         """Initialise the node."""
 
-        self.data = OrderedDict()
+        self._ref = _Ref(_Tree())
+        self._prefix = ()
 
         for arg in list(args) + [kwargs.items()]:
-            for key, value in arg.items() if hasattr(arg, 'items') else arg:
-                if (
-                    isinstance(value, dict) or (
-                        isinstance(value, (list, tuple)) and
-                        all(
-                            isinstance(v, tuple) and len(v) == 2
-                            for v in value
-                        )
+            self._load((), arg)
+
+    def _load(self, prefix, items):
+        """
+        Set the items of a mapping (or sequence of pairs) below a path.
+
+        Nested mappings are stored flat, under their paths: only nodes given
+        as values are mounted.
+        """
+
+        tree = self._ref.tree
+
+        for key, value in items.items() if hasattr(items, 'items') else items:
+            path = prefix + Node._split_key(key)
+
+            if (
+                isinstance(value, dict) or (
+                    isinstance(value, (list, tuple)) and
+                    all(
+                        isinstance(v, tuple) and len(v) == 2
+                        for v in value
                     )
-                ):
-                    self[key] = Node(value)
-                else:
-                    self[key] = value
+                )
+            ):
+                # replace whatever was there, as setting a node would
+                if path in tree.values or path in tree.children:
+                    tree.remove(path, unlink=False)
+                tree.node(path)
+                self._load(path, value)
+            else:
+                self[path] = value
+
+    @classmethod
+    def _view(cls, ref, prefix):
+        """Node for part of a tree."""
+
+        node = cls.__new__(cls)
+        node._ref = ref
+        node._prefix = prefix
+
+        return node
 
     @staticmethod
     def _split_key(key):
-        """Split up the key into head and tail."""
+        """Split up the key into a path."""
 
         # split up the key if it is a string
         if isinstance(key, (str, unicode)):
-            if '.' in key:
-                return itemgetter(0, 2)(key.partition('.'))
-            else:
-                return key, None
+            try:
+                return Node._PATHS[key]
+            except KeyError:
+                pass
+
+            path = key.split('.')
+            if len(path) > 1 and not path[-1]:
+                path.pop()
+            path = tuple(path)
+
+            if len(Node._PATHS) < Node.PATHS:
+                Node._PATHS[key] = path
+
+            return path
 
         try:
-            return key[0], key[1:]
-        except:
-            return key, None
+            return tuple(key) or (key,)
+        except TypeError:
+            return key,
+
+    def _mounted(self, path):
+        """
+        Node mounted on a path (if any), and the rest of the path below it.
+        """
+
+        mounts = self._ref.tree.mounts
+
+        for i in range(len(path) - 1, 0, -1):
+            node = mounts.get(path[:i])
+            if node is not None:
+                return node, path[i:]
+
+        return None, None
 
     def __getitem__(self, key):
         """Get an item from the node tree."""
 
-        head, tail = Node._split_key(key)
+        path = self._prefix + Node._split_key(key)
+        tree = self._ref.tree
 
-        if tail:
-            return self.data[head][tail]
-        else:
-            return self.data[head]
+        try:
+            return tree.values[path]
+        except KeyError:
+            if path in tree.children:
+                return self._view(self._ref, path)
+
+        if tree.mounts:
+            node, rest = self._mounted(path)
+            if node is not None:
+                try:
+                    return node[rest]
+                except KeyError:
+                    pass
+
+        raise KeyError(key)
 
     def __getattr__(self, attr):
         """Get an item from the node tree."""
 
+        if attr in Node._ATTRIBUTES:
+            raise AttributeError(attr)
+
         try:
             return self[attr]
         except KeyError:
@@ -64,45 +336,123 @@ class Node(MutableMapping):
     def __setitem__(self, key, value):
         """Set an item in the node tree."""
 
-        head, tail = Node._split_key(key)
+        path = self._prefix + Node._split_key(key)
 
-        # create a new node if one does not already exist or is not node
-        if not head in self.data or not isinstance(self.data[head], Node):
-            self.data[head] = Node()
+        # set within a mounted node
+        if self._ref.tree.mounts:
+            node, rest = self._mounted(path)
+            if node is not None:
+                node[rest] = value
+                return
 
-        if tail:
-            self.data[head][tail] = value
+        tree = self._ref.writable()
+
+        # (the MRO is checked directly, as instance checks on ABCs are slow)
+        if Node not in type(value).__mro__:
+            tree.set(path, value)
         else:
-            self.data[head] = value
+            tree.mount(path, value)
 
     def __delitem__(self, key):
         """Delete an item from the node tree."""
 
-        head, tail = Node._split_key(key)
+        path = self._prefix + Node._split_key(key)
 
-        if tail:
-            del self.data[head][tail]
-        else:
-            del self.data[head]
+        # delete from a mounted node
+        if self._ref.tree.mounts:
+            node, rest = self._mounted(path)
+            if node is not None:
+                try:
+                    del node[rest]
+                except KeyError:
+                    raise KeyError(key)
+                return
+
+        try:
+            self._ref.writable().remove(path)
+        except KeyError:
+            raise KeyError(key)
+
+    def get(self, key, default=None):
+        """Get an item from the node tree, or a default if it is absent."""
+
+        path = self._prefix + Node._split_key(key)
+        tree = self._ref.tree
+
+        if path in tree.values:
+            return tree.values[path]
+        elif path in tree.children:
+            return self._view(self._ref, path)
+
+        if tree.mounts:
+            node, rest = self._mounted(path)
+            if node is not None:
+                return node.get(rest, default)
+
+        return default
+
+    def __contains__(self, key):
+        """Check whether the key is in the node tree."""
+
+        path = self._prefix + Node._split_key(key)
+        tree = self._ref.tree
+
+        if path in tree.values or path in tree.children:
+            return True
+
+        if tree.mounts:
+            node, rest = self._mounted(path)
+            if node is not None:
+                return rest in node
+
+        return False
 
     def __iter__(self):
         """Return an iterator over the keys in the node tree."""
 
+        start = len(self._prefix)
+        tree = self._ref.tree
+
+        if tree.mounts:
+            return self._iter_mounted()
+
         return (
-            (key, ) + sub_key
-            for key, value in self.data.items()
-            for sub_key in (
-                value if isinstance(value, Node) else ((), )
-            )
+            path[start:]
+            for path, is_leaf in tree.walk(self._prefix)
+            if is_leaf
         )
 
+    def _iter_mounted(self):
+        """Iterate over the keys, including those of mounted nodes."""
+
+        start = len(self._prefix)
+        tree = self._ref.tree
+
+        for path, is_leaf in tree.walk(self._prefix):
+            if not is_leaf:
+                continue
+
+            node = tree.mounts.get(path)
+            if node is None:
+                yield path[start:]
+            else:
+                for key in node:
+                    yield path[start:] + key
+
     def __len__(self):
         """Return the number of values in the node tree."""
 
-        return sum(
-            len(value) if isinstance(value, Node) else 1
-            for key, value in self.data.items()
-        )
+        tree = self._ref.tree
+        size = tree.sizes.get(self._prefix, 0)
+
+        # mounted nodes are counted by their values
+        if tree.mounts:
+            n = len(self._prefix)
+            for path, node in tree.mounts.items():
+                if path[:n] == self._prefix:
+                    size += len(node) - 1
+
+        return size
 
     def __repr__(self):
         """String representation of the node tree."""
@@ -111,7 +461,7 @@ class Node(MutableMapping):
             "{0}: {1}".format(repr(key), repr(value))
             for key, value in self.items()
         )
-        return 'Node({{0}})'.format(items)
+        return 'Node({{{0}}})'.format(items)
 
     def __str__(self):
         """String representation of the node tree."""
@@ -121,15 +471,84 @@ class Node(MutableMapping):
     def to_dict(self):
         """Convert the node tree back to dictionaries."""
 
-        return OrderedDict(
-            (key, value.to_dict() if isinstance(value, Node) else value)
-            for key, value in self.data.items()
-        )
+        tree = self._ref.tree
+        mounts = tree.mounts
+
+        result = OrderedDict()
+        parents = {self._prefix: result}
+
+        for path, is_leaf in tree.walk(self._prefix):
+            if mounts and path in mounts:
+                parents[path[:-1]][path[-1]] = mounts[path].to_dict()
+            elif is_leaf:
+                parents[path[:-1]][path[-1]] = tree.values[path]
+            else:
+                parents[path[:-1]][path[-1]] = parents[path] = OrderedDict()
+
+        return result
 
     def copy(self):
-        """Shallow copy."""
+        """Shallow copy, sharing the tree until either node is changed."""
 
-        return Node(
-            (key, value.copy() if isinstance(value, Node) else value)
-            for key, value in self.data.items()
-        )
+        tree = self._ref.tree
+
+        # mounted nodes can be changed without changing the tree, so they
+        # are copied now
+        if tree.mounts:
+            return Node._view(_Ref(tree.clone(copy_mounts=True)), self._prefix)
+
+        tree.owners += 1
+
+        return Node._view(_Ref(tree), self._prefix)
+
+
+class FrozenNode(Node):
+    """
+    Immutable node tree, shared between threads without copying.
+
+    Each frozen node tree has a unique version number, so settings derived
+    from it can be cached until it is replaced.
+    """
+
+    _versions = count(1)
+
+    def __init__(self, *args, **kwargs):
+        """Initialise the node."""
+
+        # keep the structure (including empty nodes) of a single node
+        if len(args) == 1 and not kwargs and isinstance(args[0], Node):
+            node = args[0]
+            tree = node._ref.tree.clone()
+        else:
+            node = Node(*args, **kwargs)
+            tree = node._ref.tree
+
+        # mounted nodes are frozen by value
+        if tree.mounts:
+            tree.inline()
+
+        for path, value in tree.values.items():
+            if isinstance(value, list):
+                tree.values[path] = tuple(value)
+
+        self._ref = _Ref(tree)
+        self._prefix = node._prefix
+        self.version = next(FrozenNode._versions)
+
+    def __setitem__(self, key, value):
+
+        raise TypeError("Node is read-only.")
+
+    def __delitem__(self, key):
+
+        raise TypeError("Node is read-only.")
+
+    def copy(self):
+        """Shallow copy (the node itself, as it cannot change)."""
+
+        return self
+
+    def thaw(self):
+        """Mutable copy of the node tree."""
+
+        return Node.copy(self)
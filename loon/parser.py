@@ -9,29 +9,96 @@ __all__ = [
     'InstantaneousDemand', 'CurrentSummationDelivered',
     'CurrentPeriodUsage', 'LastPeriodUsage',
     'ProfileData', 'Warning', 'Error',
-    'Firmware'
+    'Firmware',
+    'Reading',
 ]
 
 
-from collections import OrderedDict
-from itertools import groupby
+from collections import OrderedDict, namedtuple
 from xml.etree import cElementTree as ElementTree
 from xml.etree.ElementTree import ParseError
 
 from .formatter import *
+from .record import record_type, lazy_record_type
 from .exception import LoonError
 
 
+# parse settings compiled from the options
+Settings = namedtuple('Settings', [
+    'index', 'plan', 'lazy_type', 'records', 'validate', 'formatting',
+])
+
+
+class ParserMeta(type):
+    """Parser metaclass to compile the parse plan for the tags."""
+
+    def __new__(cls, name, bases, d):
+
+        obj = super(ParserMeta, cls).__new__(cls, name, bases, d)
+
+        # map each tag to the slot of the first formatter for it: later
+        # formatters with the same name find the values already consumed
+        obj._INDEX = OrderedDict()
+        obj._PLAN = []
+
+        for formatter in obj.TAGS:
+            if formatter.name in obj._INDEX:
+                slot = None
+            else:
+                slot = obj._INDEX[formatter.name] = len(obj._INDEX)
+
+            obj._PLAN.append((formatter, slot))
+
+        # compact record type with a field for each tag
+        obj._record_type = record_type(
+            name + 'Record', ['response_type'] + list(obj._INDEX)
+        )
+
+        # record type decoding each field on access
+        obj._lazy_type = lazy_record_type(name + 'LazyRecord', obj._PLAN)
+
+        # settings by projection, timestamp mode and record options
+        obj._COMPILED = {}
+
+        # settings by options version
+        obj._VERSIONS = {}
+
+        return obj
+
+
 class Parser(object):
     """Parser for RAVEn(TM) XML API responses."""
 
+    __metaclass__ = ParserMeta
+
     TAGS = []
 
+    # tags used by the parser itself, kept in any projection
+    INTERNAL = []
+
+    # tags replies are matched to commands by (see `Command.MATCH`), kept in
+    # any projection so commands still get their replies
+    KEYS = ['MeterMacId', 'Event', 'Offset']
+
+    # record types: ordered dictionaries, compact (slotted) records or lazy
+    # records decoding fields on access
+    RECORDS = ['dict', 'compact', 'lazy']
+
+    # when lazy records decode required fields: on access or on creation
+    VALIDATE = ['access', 'required']
+
+    # number of options versions to keep settings for
+    VERSIONS = 16
+
     _result_type = OrderedDict
 
     @classmethod
     def _parsexml(cls, response):
 
+        # already parsed by the framer
+        if ElementTree.iselement(response):
+            return response
+
         # parse XML into ElementTree element
         try:
             return ElementTree.fromstringlist(response)
@@ -45,43 +112,191 @@ class Parser(object):
 
         response = cls._parsexml(response)
 
-        def fix_text(text):
-            """Replace empty text with empty string."""
-
-            return text.strip() if text is not None else ''
+        settings = cls._settings(options)
+        index = settings.index
+        data = [None] * len(index)
+        unparsed = []
 
         # group up values with common tags
-        data = {
-            k: [fix_text(e.text) for e in v]
-            for k, v in groupby(
-                sorted(response, key=lambda x: x.tag),
-                key=lambda x: x.tag
-            )
-        }
+        for element in response:
+            try:
+                slot = index[element.tag]
+            except KeyError:
+                unparsed.append(element.tag)
+                continue
+
+            # projected out
+            if slot is None:
+                continue
 
-        result = cls._result_type(response_type=response.tag)
+            # replace empty text with empty string
+            text = element.text
+            text = text.strip() if text is not None else ''
+
+            if data[slot] is None:
+                data[slot] = [text]
+            else:
+                data[slot].append(text)
+
+        records = settings.records
+
+        if records == 'lazy':
+            return cls._lazy(settings, response.tag, data, unparsed)
+        elif records == 'compact':
+            result = cls._record_type(response_type=response.tag)
+        else:
+            result = cls._result_type(response_type=response.tag)
 
         # process tags
-        for formatter in cls.TAGS:
+        for formatter, slot in settings.plan:
+            values = data[slot] if slot is not None else None
+
             try:
-                value = formatter.parse(data.pop(formatter.name))
+                if values is None:
+                    raise KeyError(formatter.name)
+                value = formatter.parse(values)
             except KeyError:
+                # unknown values are treated as missing
                 if formatter.required:
                     raise LoonError(
                         "Missing value: {0}".format(formatter.name)
                     )
+                continue
             except LoonError as e:
                 raise LoonError("Unable to process argument: {0}: {1}".format(
                     formatter.name, e
                 ))
-            else:
-                # don't store empty results
-                if value is not None:
-                    result[formatter.name] = value
+
+            # don't store empty results
+            if value is not None:
+                result[formatter.name] = value
 
         # check for unparsed data
-        if data:
-            raise LoonError("Unparsed data: {0}".format(', '.join(data)))
+        if unparsed:
+            raise LoonError("Unparsed data: {0}".format(
+                ', '.join(sorted(set(unparsed)))
+            ))
+
+        return result
+
+    @classmethod
+    def check_fields(cls, fields):
+        """Check the fields of a projection are tags of the response."""
+
+        unknown = set(fields).difference(cls._INDEX)
+        if unknown:
+            raise LoonError("Unknown fields for {0}: {1}".format(
+                cls.__name__, ', '.join(sorted(unknown))
+            ))
+
+    @classmethod
+    def _settings(cls, options):
+        """Settings for the options, cached by the options version."""
+
+        version = getattr(options, 'version', None)
+
+        if version is None:
+            return cls._compile(options)
+
+        try:
+            return cls._VERSIONS[version]
+        except KeyError:
+            pass
+
+        settings = cls._compile(options)
+
+        if len(cls._VERSIONS) >= cls.VERSIONS:
+            cls._VERSIONS.clear()
+        cls._VERSIONS[version] = settings
+
+        return settings
+
+    @classmethod
+    def _compile(cls, options):
+        """
+        Settings for the options: the index, parse plan and lazy record type
+        for the fields of the response type selected (by default, all fields)
+        and the timestamp mode, and the record options.
+        """
+
+        if options:
+            fields = options.get('fields.' + cls.__name__)
+            key = (
+                tuple(fields) if fields else None,
+                options.get('timestamps') or 'datetime',
+                options.get('records'),
+                options.get('lazy.validate'),
+                bool(options.get('use_formatting')),
+            )
+        else:
+            key = (None, 'datetime', None, None, False)
+
+        try:
+            return cls._COMPILED[key]
+        except KeyError:
+            pass
+
+        fields, timestamps, records, validate, formatting = key
+
+        index, plan = cls._INDEX, cls._PLAN
+
+        if fields:
+            cls.check_fields(fields)
+
+            keep = set(fields).union(cls.INTERNAL, cls.KEYS)
+
+            # projected out tags are known, but have no slot
+            index = {
+                tag: slot if tag in keep else None
+                for tag, slot in cls._INDEX.items()
+            }
+            plan = [
+                (formatter, slot) for formatter, slot in plan
+                if formatter.name in keep
+            ]
+
+        if timestamps != 'datetime':
+            plan = [
+                (formatter.using(timestamps), slot)
+                if isinstance(formatter, Date) else (formatter, slot)
+                for formatter, slot in plan
+            ]
+
+        if plan is cls._PLAN:
+            lazy_type = cls._lazy_type
+        else:
+            lazy_type = lazy_record_type(cls.__name__ + 'LazyRecord', plan)
+
+        settings = cls._COMPILED[key] = Settings(
+            index, plan, lazy_type, records, validate == 'required',
+            formatting,
+        )
+
+        return settings
+
+    @classmethod
+    def _lazy(cls, settings, response_type, data, unparsed):
+        """Create a lazy record from raw values, by slot."""
+
+        result = settings.lazy_type(response_type, data)
+
+        # decode required tags now, rather than on access
+        validate = settings.validate
+
+        for formatter, slot in settings.plan:
+            if slot is None or data[slot] is None:
+                if formatter.required:
+                    raise LoonError(
+                        "Missing value: {0}".format(formatter.name)
+                    )
+            elif formatter.skip or (validate and formatter.required):
+                result._decode(formatter.name)
+
+        # check for unparsed data
+        if unparsed:
+            raise LoonError("Unparsed data: {0}".format(
+                ', '.join(sorted(set(unparsed)))
+            ))
 
         return result
 
@@ -277,15 +492,67 @@ class PriceCluster(Parser):
     ]
 
 
+class Reading(float):
+    """
+    Scaled reading, formatted on demand.
+
+    A float that keeps the display hints sent by the RAVEn(TM) as a format
+    specification, so `str()` gives the value padded and rounded as the
+    device would show it.
+    """
+
+    __slots__ = ('format',)
+
+    def __new__(cls, value, format='f'):
+
+        obj = super(Reading, cls).__new__(cls, value)
+        obj.format = format
+
+        return obj
+
+    def __str__(self):
+        """Formatted value."""
+
+        return float.__format__(self, self.format).lstrip()
+
+    def __format__(self, spec):
+
+        return float.__format__(self, spec) if spec else str(self)
+
+    def __reduce__(self):
+
+        return Reading, (float(self), self.format)
+
+
 class ScaleParser(Parser):
 
     NUMBERS = []
 
+    INTERNAL = [
+        'Multiplier', 'Divisor', 'DigitsRight', 'DigitsLeft',
+        'SuppressLeadingZero',
+    ]
+
+    # format specifications by display hints
+    _FORMATS = {}
+
     @staticmethod
     def _scalar(x):
 
         return float(x) if x else 1.0
 
+    @staticmethod
+    def _format(zero, left, right):
+        """Shared format specification for display hints."""
+
+        key = zero, left, right
+
+        try:
+            return ScaleParser._FORMATS[key]
+        except KeyError:
+            spec = ScaleParser._FORMATS[key] = '{0}{1}.{2}f'.format(*key)
+            return spec
+
     def __new__(cls, response, options=None):
 
         result = super(ScaleParser, cls).__new__(cls, response, options)
@@ -298,12 +565,20 @@ class ScaleParser(Parser):
         left = result.pop('DigitsLeft') + right + 1
         zero = '' if result.pop('SuppressLeadingZero') else '0'
 
+        if cls._settings(options).formatting:
+            spec = ScaleParser._format(zero, left, right)
+        else:
+            spec = None
+
+        scale = multiplier / divisor
+
         for number in cls.NUMBERS:
-            result[number] *= multiplier / divisor
-            if options and options.get('use_formatting'):
-                result[number] = '{0:{zero}{left}.{right}f}'.format(
-                    result[number], zero=zero, left=left, right=right
-                ).lstrip()
+            if number not in result:
+                continue
+            if spec is not None:
+                result[number] = Reading(result[number] * scale, spec)
+            else:
+                result[number] *= scale
 
         return result
 
@@ -0,0 +1,276 @@
+"""
+Compact record types for parsed responses.
+"""
+
+__all__ = ['Record', 'LazyRecord', 'record_type', 'lazy_record_type']
+
+from collections import Mapping
+
+from .exception import LoonError
+
+
+class Record(object):
+    """
+    Compact record for a parsed response.
+
+    Values are held in slots rather than a dictionary. The record supports
+    the mapping read API (and item assignment/deletion), so it can be used in
+    place of an `OrderedDict` result. Keys are ordered as the fields of the
+    record type.
+    """
+
+    __slots__ = ()
+
+    FIELDS = ()
+
+    # field name -> slot descriptor
+    _SLOTS = {}
+
+    def __init__(self, **kwargs):
+        """Initialise the record."""
+
+        for key, value in kwargs.items():
+            self[key] = value
+
+    def __getitem__(self, key):
+        """Get a value from the record."""
+
+        try:
+            return self._SLOTS[key].__get__(self)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        """Set a value in the record."""
+
+        try:
+            slot = self._SLOTS[key]
+        except KeyError:
+            raise KeyError("Unknown field: {0}".format(key))
+
+        slot.__set__(self, value)
+
+    def __delitem__(self, key):
+        """Delete a value from the record."""
+
+        try:
+            self._SLOTS[key].__delete__(self)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        """Check whether the record has a value for the key."""
+
+        try:
+            self._SLOTS[key].__get__(self)
+        except (KeyError, AttributeError):
+            return False
+        else:
+            return True
+
+    def __iter__(self):
+        """Return an iterator over the keys with values."""
+
+        return (key for key in self.FIELDS if key in self)
+
+    def __len__(self):
+        """Return the number of values in the record."""
+
+        return sum(1 for key in self)
+
+    def get(self, key, default=None):
+        """Get a value from the record, with a default."""
+
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def pop(self, key, *default):
+        """Remove a value from the record and return it."""
+
+        try:
+            value = self[key]
+        except KeyError:
+            if default:
+                return default[0]
+            raise
+
+        del self[key]
+
+        return value
+
+    def keys(self):
+        """Return a list of the keys."""
+
+        return list(self)
+
+    iterkeys = __iter__
+
+    def itervalues(self):
+        """Return an iterator over the values."""
+
+        return (self[key] for key in self)
+
+    def iteritems(self):
+        """Return an iterator over the (key, value) pairs."""
+
+        return ((key, self[key]) for key in self)
+
+    def values(self):
+        """Return a list of the values."""
+
+        return [self[key] for key in self]
+
+    def items(self):
+        """Return a list of the (key, value) pairs."""
+
+        return [(key, self[key]) for key in self]
+
+    def __eq__(self, other):
+
+        try:
+            return dict(self.items()) == dict(other.items())
+        except AttributeError:
+            return NotImplemented
+
+    def __ne__(self, other):
+
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        """String representation of the record."""
+
+        return '{0}({1})'.format(
+            type(self).__name__,
+            ', '.join('{0}={1!r}'.format(k, v) for k, v in self.items())
+        )
+
+
+class LazyRecord(Record):
+    """
+    Record that decodes fields on first access.
+
+    The raw text values of each tag are kept from the response, and a field
+    is decoded (and memoized) the first time it is read. Decoding errors are
+    raised as `LoonError` on access.
+    """
+
+    __slots__ = ('_raw', '_values')
+
+    # field name -> [(formatter, slot)] decode plan
+    _DECODE = {}
+
+    def __init__(self, response_type, raw):
+        """Initialise the record from raw values, by slot."""
+
+        self._raw = raw
+        self._values = {'response_type': response_type}
+
+    def _decode(self, key):
+        """Decode and memoize a field."""
+
+        try:
+            plan = self._DECODE[key]
+        except KeyError:
+            raise KeyError(key)
+
+        result = None
+
+        for formatter, slot in plan:
+            values = self._raw[slot] if slot is not None else None
+
+            # required tags are checked when the record is created
+            if values is None:
+                continue
+
+            try:
+                value = formatter.parse(values)
+            except KeyError:
+                # unknown values are treated as missing
+                if formatter.required:
+                    raise LoonError(
+                        "Missing value: {0}".format(formatter.name)
+                    )
+                continue
+            except LoonError as e:
+                raise LoonError("Unable to process argument: {0}: {1}".format(
+                    formatter.name, e
+                ))
+
+            if value is not None:
+                result = value
+
+        self._values[key] = result
+
+        return result
+
+    def __getitem__(self, key):
+        """Get a value from the record, decoding it if necessary."""
+
+        try:
+            value = self._values[key]
+        except KeyError:
+            value = self._decode(key)
+
+        if value is None:
+            raise KeyError(key)
+
+        return value
+
+    def __setitem__(self, key, value):
+        """Set a value in the record."""
+
+        if key not in self._DECODE and key != 'response_type':
+            raise KeyError("Unknown field: {0}".format(key))
+
+        self._values[key] = value
+
+    def __delitem__(self, key):
+        """Delete a value from the record."""
+
+        self[key]
+        self._values[key] = None
+
+    def __contains__(self, key):
+        """Check whether the record has a value for the key."""
+
+        try:
+            self[key]
+        except KeyError:
+            return False
+        else:
+            return True
+
+
+Mapping.register(Record)
+
+
+def record_type(name, fields):
+    """Create a compact record type with the given fields."""
+
+    fields = tuple(fields)
+
+    cls = type(name, (Record,), {'__slots__': fields, 'FIELDS': fields})
+    cls._SLOTS = {field: cls.__dict__[field] for field in fields}
+
+    return cls
+
+
+def lazy_record_type(name, plan):
+    """Create a lazy record type from a parse plan of (formatter, slot)."""
+
+    decode = {}
+    for formatter, slot in plan:
+        decode.setdefault(formatter.name, []).append((formatter, slot))
+
+    fields = ('response_type',) + tuple(
+        formatter.name for formatter, slot in plan if slot is not None
+    )
+
+    return type(name, (LazyRecord,), {
+        '__slots__': (), 'FIELDS': fields, '_DECODE': decode,
+    })
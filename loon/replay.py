@@ -0,0 +1,211 @@
+"""
+Offline replay of captured RAVEn(TM) data.
+"""
+
+__all__ = ['Replay', 'CapturePort', 'JournalPort']
+
+import os
+import time
+
+from .loon import Loon
+from .journal import JournalReader, index_path
+
+
+# 115200 baud, 8N1
+BYTES_PER_SECOND = 11520
+
+
+class ReplayPort(object):
+    """
+    Serial port stand-in that serves chunks of captured data.
+
+    Chunks are (due, data) pairs, where due is the offset in seconds from the
+    start of the replay at which the data "arrives". With no speed, all data
+    is available immediately. Commands written to the port are discarded.
+    """
+
+    def __init__(self, chunks, speed=None, timeout=0.1, on_end=None):
+
+        self.speed = speed
+        self.timeout = timeout
+        self.on_end = on_end
+
+        self._chunks = iter(chunks)
+        self._data = b''
+        self._due = 0.0
+        self._start = None
+        self._exhausted = False
+
+    def _now(self):
+        """Replay time, in seconds of capture time."""
+
+        if self._start is None:
+            self._start = time.time()
+
+        return (time.time() - self._start) * self.speed
+
+    def _next(self):
+        """Load the next chunk."""
+
+        while not self._data:
+            try:
+                self._due, self._data = next(self._chunks)
+            except StopIteration:
+                self._exhausted = True
+                if self.on_end is not None:
+                    self.on_end()
+                return False
+
+        return True
+
+    @property
+    def in_waiting(self):
+        """Number of bytes available without waiting."""
+
+        if not self._data and not self._next():
+            return 0
+
+        if self.speed and self._due > self._now():
+            return 0
+
+        return len(self._data)
+
+    def readinto(self, b):
+        """Read available data into a buffer, waiting up to the timeout."""
+
+        if not self._data and not self._next():
+            return 0
+
+        if self.speed:
+            wait = (self._due - self._now()) / self.speed
+            if wait > self.timeout:
+                time.sleep(self.timeout)
+                return 0
+            elif wait > 0:
+                time.sleep(wait)
+
+        n = min(len(b), len(self._data))
+        b[:n] = self._data[:n]
+        self._data = self._data[n:]
+
+        return n
+
+    def read(self, size=1):
+        """Read available data."""
+
+        b = bytearray(size)
+        return bytes(b[:self.readinto(b)])
+
+    def write(self, data):
+        """Discard written commands."""
+
+        return len(data)
+
+    def close(self):
+
+        self._chunks = iter([])
+
+
+class CapturePort(ReplayPort):
+    """
+    Replay a capture of raw serial bytes. When timed, the data is paced at the
+    serial line rate.
+    """
+
+    def __init__(self, source, speed=None, timeout=0.1, on_end=None):
+
+        if isinstance(source, basestring):
+            source = open(source, 'rb')
+
+        super(CapturePort, self).__init__(
+            self._chunks(source, speed), speed, timeout, on_end
+        )
+
+    @staticmethod
+    def _chunks(source, speed):
+
+        size = 64 if speed else 0x10000
+        offset = 0
+
+        with source:
+            while True:
+                data = source.read(size)
+                if not data:
+                    break
+
+                yield float(offset) / BYTES_PER_SECOND, data
+                offset += len(data)
+
+
+class JournalPort(ReplayPort):
+    """
+    Replay the frames of a journal. When timed, frames arrive at their
+    recorded receive times.
+    """
+
+    def __init__(self, source, speed=None, timeout=0.1, on_end=None,
+                 start=None, end=None):
+
+        super(JournalPort, self).__init__(
+            self._chunks(source, start, end), speed, timeout, on_end
+        )
+
+    @staticmethod
+    def _chunks(source, start, end):
+
+        reader = JournalReader(source)
+        first = None
+
+        try:
+            for entry in reader.select(start, end):
+                if first is None:
+                    first = entry.time
+
+                yield entry.time - first, entry.raw
+        finally:
+            reader.close()
+
+
+class Replay(Loon):
+    """
+    Drive the Loon capture pipeline from captured data instead of a device.
+
+    The source is either a journal (see `loon.journal`) or a file of raw
+    serial bytes. With no speed, data is replayed as fast as possible;
+    otherwise it is replayed in real-time at `speed` times the original rate.
+    Capturing stops when the source is exhausted.
+    """
+
+    def __init__(self, source, speed=None, start_capture=False,
+                 options=None, defaults=None):
+        """Initialise the replay."""
+
+        self.source = source
+        self.speed = speed
+
+        super(Replay, self).__init__(
+            device=source, start_capture=start_capture,
+            options=options, defaults=defaults
+        )
+
+    def _open(self, device):
+        """Open the replay port for the source."""
+
+        if (
+            isinstance(device, basestring) and
+            os.path.exists(index_path(device))
+        ):
+            port = JournalPort
+        else:
+            port = CapturePort
+
+        return port(
+            device, speed=self.speed, timeout=self._options['read.timeout'],
+            on_end=self.stop_capture
+        )
+
+    def run(self):
+        """Replay the source in the calling thread until it is exhausted."""
+
+        self._stop.clear()
+        self._get_responses()
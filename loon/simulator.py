@@ -0,0 +1,310 @@
+"""
+Simulated RAVEn(TM) device on a pseudo-terminal.
+
+Usage: python -m loon.simulator [--rate N] [--meters N] ...
+
+The simulator prints the device name of the pseudo-terminal, which can be
+used directly as a Loon device: `Loon(device='/dev/pts/N')`.
+"""
+
+__all__ = ['Simulator']
+
+import os
+import sys
+import pty
+import tty
+import time
+import errno
+import random
+import select
+import logging
+
+from itertools import cycle
+from threading import Thread, Event
+
+from .command import *
+from .parser import *
+from .framer import Framer
+from .synthetic import FrameGenerator, frame
+
+
+class Simulator(object):
+    """
+    Simulated RAVEn(TM) device on a pseudo-terminal.
+
+    Unsolicited frames are emitted at `rate` frames per second, drawn from the
+    frame generator mix for the simulated meters, with a fraction truncated,
+    NUL padded or malformed. Commands written to the device are answered with
+    plausible replies, and SET_FAST_POLL starts a burst of demand frames.
+    """
+
+    # replies to commands
+    COMMANDS = {
+        command.__name__: command.RESPONSE
+        for command in [
+            restart, factory_reset, get_connection_status, get_device_info,
+            get_schedule, set_schedule, set_schedule_default,
+            get_meter_list, get_meter_info, get_network_info, set_meter_info,
+            get_time, get_message, confirm_message,
+            get_current_price, set_current_price,
+            get_instantaneous_demand, get_current_summation_delivered,
+            get_current_period_usage, get_last_period_usage,
+            close_current_period, get_profile_data, image_block_dump,
+        ]
+    }
+
+    def __init__(self, rate=1.0, meters=1, mix=None, truncation=0.0,
+                 padding=0.0, malformed=0.0, pool=1000, seed=None):
+        """Initialise the simulator."""
+
+        self.rate = rate
+        self.malformed = malformed
+
+        self.generator = FrameGenerator(
+            mix=mix, meters=meters, truncation=truncation, padding=padding,
+            seed=seed
+        )
+        self.rng = random.Random(seed)
+
+        self.parsers = {cls.__name__: cls for cls in FrameGenerator.PARSERS}
+
+        # pre-generate frames to keep up with high rates
+        self._frames = cycle(
+            [self._frame() for i in range(pool)]
+        ) if pool else None
+
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)
+        tty.setraw(self._master)
+        self._set_nonblocking(self._master)
+
+        self.device = os.ttyname(self._slave)
+
+        self._framer = Framer()
+        self._polls = []
+
+        self.sent = 0
+        self.dropped = 0
+        self.commands = 0
+
+        self._thread = None
+        self._stop = Event()
+
+    @staticmethod
+    def _set_nonblocking(fd):
+
+        import fcntl
+
+        flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+        fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+    def _frame(self):
+        """Generate an unsolicited frame."""
+
+        data = self.generator.frame()
+
+        if self.malformed and self.rng.random() < self.malformed:
+            # mangle the closing tag of a random element
+            n = data.rfind('</', 0, self.rng.randint(1, len(data)))
+            if n >= 0:
+                data = data[:n + 2] + 'X' + data[n + 2:]
+
+        return data
+
+    def _write(self, data):
+        """Write to the device, dropping whatever does not fit."""
+
+        try:
+            n = os.write(self._master, data)
+        except OSError as e:
+            if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                raise
+            n = 0
+
+        self.dropped += len(data) - n
+
+        return n
+
+    def _reply(self, element):
+        """Reply to a command."""
+
+        args = {child.tag: (child.text or '').strip() for child in element}
+        name = args.pop('Name', '').lower()
+
+        self.commands += 1
+
+        if name == 'set_fast_poll':
+            self.fast_poll(
+                args.get('MeterMacId'),
+                int(args.get('Frequency', '0x4'), 16),
+                int(args.get('Duration', '0x0'), 16),
+            )
+            return
+
+        try:
+            cls = self.parsers[self.COMMANDS[name]]
+        except KeyError:
+            cls, args = Error, {'Text': "Unknown command: {0}".format(name)}
+
+        overrides = {'DeviceMacId': self.generator.device}
+        if cls is MeterList:
+            overrides['MeterMacId'] = self.generator.meters
+        else:
+            overrides['MeterMacId'] = self.rng.choice(self.generator.meters)
+
+        # echo matching arguments
+        overrides.update(args)
+
+        if cls is ProfileData:
+            n = int(args.get('NumberOfPeriods', '0x1'), 16)
+            overrides['NumberOfPeriodsDelivered'] = hex(n)
+            overrides['IntervalData'] = [
+                hex(self.rng.randint(0, 0xffff)) for i in range(n)
+            ] or ['0xffffff']
+        elif cls is Firmware:
+            n = int(args.get('BlkSize', '0x40'), 16)
+            overrides['Name'] = 'RAVEn'
+            overrides['Blk'] = ''.join(
+                chr(self.rng.randint(0, 255)) for i in range(n)
+            ).encode('base64').replace('\n', '')
+
+        self._write(frame(cls, self.rng, overrides=overrides))
+
+    def fast_poll(self, meter=None, frequency=4, duration=900):
+        """
+        Emit demand frames for a meter every `frequency` seconds for
+        `duration` seconds (or stop fast polling with a duration of 0).
+        """
+
+        meter = meter or self.rng.choice(self.generator.meters)
+
+        self._polls = [poll for poll in self._polls if poll[0] != meter]
+
+        if duration:
+            now = time.time()
+            self._polls.append([meter, now, frequency, now + duration])
+
+    def _poll(self, now):
+        """Emit due fast poll frames."""
+
+        data = []
+
+        for poll in self._polls:
+            meter, due, frequency, end = poll
+            while due <= min(now, end):
+                data.append(frame(
+                    InstantaneousDemand, self.rng,
+                    overrides={
+                        'DeviceMacId': self.generator.device,
+                        'MeterMacId': meter,
+                    }
+                ))
+                due += frequency
+            poll[1] = due
+
+        self._polls = [poll for poll in self._polls if poll[3] > now]
+
+        return data
+
+    def run(self):
+        """Run the simulator until stopped."""
+
+        interval = 1.0 / self.rate if self.rate else None
+        due = time.time()
+
+        while not self._stop.is_set():
+
+            now = time.time()
+            timeout = 0.1 if interval is None else min(0.1, due - now)
+
+            r, w, x = select.select([self._master], [], [], max(timeout, 0))
+
+            if r:
+                try:
+                    data = os.read(self._master, 4096)
+                except OSError as e:
+                    if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                        raise
+                else:
+                    for element, raw in self._framer.feed(data):
+                        self._reply(element)
+
+            now = time.time()
+            frames = self._poll(now) if self._polls else []
+
+            # catch up on unsolicited frames
+            if interval is not None:
+                while due <= now:
+                    frames.append(
+                        next(self._frames) if self._frames else self._frame()
+                    )
+                    due += interval
+
+            if frames:
+                self.sent += len(frames)
+                self._write(''.join(frames))
+
+    def start(self):
+        """Run the simulator in the background."""
+
+        self._stop.clear()
+        self._thread = Thread(target=self.run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop the simulator."""
+
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def close(self):
+        """Stop the simulator and close the pseudo-terminal."""
+
+        self.stop()
+        os.close(self._master)
+        os.close(self._slave)
+
+
+def main(argv=None):
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Simulated RAVEn(TM).")
+    parser.add_argument('--rate', type=float, default=1.0,
+                        help="unsolicited frames per second")
+    parser.add_argument('--meters', type=int, default=1)
+    parser.add_argument('--truncation', type=float, default=0.0)
+    parser.add_argument('--padding', type=float, default=0.0)
+    parser.add_argument('--malformed', type=float, default=0.0)
+    parser.add_argument('--seed', type=int)
+
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+
+    simulator = Simulator(
+        rate=args.rate, meters=args.meters, truncation=args.truncation,
+        padding=args.padding, malformed=args.malformed, seed=args.seed
+    )
+
+    print(simulator.device)
+    sys.stdout.flush()
+
+    try:
+        simulator.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.close()
+        logging.info(
+            "Sent {0} frames ({1} bytes dropped), "
+            "answered {2} commands".format(
+                simulator.sent, simulator.dropped, simulator.commands
+            )
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+Response stores.
+"""
+
+__all__ = ['ResponseStore']
+
+from threading import Lock
+from collections import deque, OrderedDict
+from itertools import islice
+
+from .exception import LoonError
+
+
+class ResponseStore(object):
+    """
+    Bounded store for captured responses.
+
+    When the store is full, new responses are handled according to the
+    policy:
+
+    - drop_oldest: evict the oldest response
+    - drop_newest: drop the new response
+    - latest: keep only the latest response for each response type and meter,
+      evicting the oldest when there are too many
+
+    Appending never blocks. The number of evicted and dropped responses are
+    counted in `evicted` and `dropped`.
+    """
+
+    POLICIES = ['drop_oldest', 'drop_newest', 'latest']
+
+    def __init__(self, size=None, policy='drop_oldest'):
+        """Initialise the store."""
+
+        if policy not in self.POLICIES:
+            raise LoonError("Unknown store policy: {0}".format(policy))
+
+        if size is not None and size < 1:
+            raise LoonError("Invalid store size: {0}".format(size))
+
+        self.size = size
+        self.policy = policy
+
+        self.evicted = 0
+        self.dropped = 0
+
+        self._lock = Lock()
+
+        if policy == 'latest':
+            self._data = OrderedDict()
+            self.append = self._append_latest
+        elif policy == 'drop_newest':
+            self._data = deque()
+            self.append = self._append_newest
+        else:
+            self._data = deque(maxlen=size)
+            self.append = self._append_oldest
+
+    @staticmethod
+    def _key(response):
+        """Key for latest-response policy."""
+
+        meter = response.get('MeterMacId')
+
+        # e.g. the meters of a MeterList
+        if isinstance(meter, list):
+            meter = tuple(meter)
+
+        return response['response_type'], meter
+
+    def _append_oldest(self, response):
+        """Append response, evicting the oldest if full."""
+
+        if self.size is not None and len(self._data) >= self.size:
+            self.evicted += 1
+
+        self._data.append(response)
+
+    def _append_newest(self, response):
+        """Append response, dropping it if full."""
+
+        if self.size is not None and len(self._data) >= self.size:
+            self.dropped += 1
+        else:
+            self._data.append(response)
+
+    def _append_latest(self, response):
+        """Append response, replacing any earlier one with the same key."""
+
+        key = self._key(response)
+
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self.evicted += 1
+            elif self.size is not None and len(self._data) >= self.size:
+                self._data.popitem(last=False)
+                self.evicted += 1
+
+            self._data[key] = response
+
+    def popleft(self):
+        """Remove and return the oldest response."""
+
+        if self.policy != 'latest':
+            return self._data.popleft()
+
+        with self._lock:
+            try:
+                return self._data.popitem(last=False)[1]
+            except KeyError:
+                raise IndexError("pop from an empty store")
+
+    def pop(self):
+        """Remove and return the newest response."""
+
+        if self.policy != 'latest':
+            return self._data.pop()
+
+        with self._lock:
+            try:
+                return self._data.popitem()[1]
+            except KeyError:
+                raise IndexError("pop from an empty store")
+
+    def clear(self):
+        """Remove all responses."""
+
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        """Return the number of stored responses."""
+
+        return len(self._data)
+
+    def __iter__(self):
+        """Return an iterator over the stored responses, oldest first."""
+
+        if self.policy != 'latest':
+            return iter(self._data)
+
+        with self._lock:
+            return iter(list(self._data.values()))
+
+    def __getitem__(self, index):
+        """Get a stored response by position."""
+
+        if self.policy != 'latest':
+            return self._data[index]
+
+        with self._lock:
+            if index < 0:
+                index += len(self._data)
+            try:
+                return next(islice(self._data.values(), index, None))
+            except (StopIteration, ValueError):
+                raise IndexError("store index out of range")
+
+    def __repr__(self):
+        """String representation of the store."""
+
+        return 'ResponseStore({0!r}, size={1!r}, policy={2!r})'.format(
+            list(self), self.size, self.policy
+        )
@@ -0,0 +1,214 @@
+"""
+Synthetic RAVEn(TM) response frames.
+"""
+
+__all__ = ['FrameGenerator', 'sample_value', 'sample_text', 'frame']
+
+import random
+import datetime
+
+from xml.etree import cElementTree as ElementTree
+
+from .parser import *
+from .formatter import *
+
+
+# relative frequency of responses from a device with a couple of meters
+DEFAULT_MIX = {
+    'InstantaneousDemand': 60,
+    'CurrentSummationDelivered': 20,
+    'CurrentPeriodUsage': 4,
+    'LastPeriodUsage': 1,
+    'PriceCluster': 4,
+    'TimeCluster': 4,
+    'ConnectionStatus': 2,
+    'NetworkInfo': 1,
+    'DeviceInfo': 1,
+    'MeterInfo': 1,
+    'MeterList': 1,
+    'ScheduleInfo': 1,
+    'MessageCluster': 1,
+    'ProfileData': 1,
+}
+
+# realistic values for specific tags
+VALUES = {
+    'Multiplier': lambda rng: 1,
+    'Divisor': lambda rng: 1000,
+    'DigitsRight': lambda rng: 3,
+    'DigitsLeft': lambda rng: 15,
+    'Demand': lambda rng: rng.randint(0, 10000),
+    'SummationDelivered': lambda rng: rng.randint(0, 0x1000000),
+    'SummationReceived': lambda rng: 0,
+    'CurrentUsage': lambda rng: rng.randint(0, 100000),
+    'LastUsage': lambda rng: rng.randint(0, 100000),
+    'Channel': lambda rng: rng.randint(11, 26),
+    'LinkStrength': lambda rng: rng.randint(0, 0x64),
+    'Price': lambda rng: rng.randint(1000, 3000),
+    'TrailingDigits': lambda rng: 4,
+    'Currency': lambda rng: 'AUD',
+    'NumberOfPeriodsDelivered': lambda rng: 12,
+    'Status': lambda rng: 0,
+}
+
+
+def sample_value(formatter, rng=random, now=None):
+    """Plausible Python value for a formatter."""
+
+    if formatter.name in VALUES:
+        return VALUES[formatter.name](rng)
+
+    if isinstance(formatter, Date):
+        now = now or datetime.datetime.utcnow().replace(microsecond=0)
+        return now - datetime.timedelta(seconds=rng.randint(0, 3600))
+    elif isinstance(formatter, Currency):
+        return 'AUD'
+    elif isinstance(formatter, (Hex, Integer)):
+        return rng.randint(formatter.min, min(formatter.max, 0xffffffff))
+    elif isinstance(formatter, Boolean):
+        return rng.random() < 0.5
+    elif isinstance(formatter, Enumeration):
+        return rng.choice(list(formatter.LEVELS))
+    elif isinstance(formatter, IntervalPeriod):
+        return rng.choice(list(IntervalPeriod.INTERVALS))
+    elif isinstance(formatter, Decimal):
+        return rng.random() * 100
+    elif isinstance(formatter, Base64String):
+        return ''.join(chr(rng.randint(0, 255)) for i in range(16))
+    else:
+        return 'RAVEn'
+
+
+def sample_text(formatter, rng=random, now=None):
+    """Plausible XML API text for a formatter."""
+
+    return formatter.encode(sample_value(formatter, rng, now)).strip()
+
+
+def element(cls, rng=random, now=None, overrides=None):
+    """Build a response element for a parser class."""
+
+    result = ElementTree.Element(cls.__name__)
+
+    for formatter in cls.TAGS:
+        if result.find(formatter.name) is not None:
+            continue
+
+        if overrides and formatter.name in overrides:
+            texts = overrides[formatter.name]
+        else:
+            texts = sample_text(formatter, rng, now)
+
+        # sequences are repeated tags
+        if not isinstance(texts, list):
+            texts = [texts]
+
+        for text in texts:
+            ElementTree.SubElement(result, formatter.name).text = text
+
+    return result
+
+
+def frame(cls, rng=random, now=None, overrides=None):
+    """Build the raw bytes of a response frame, laid out as the device does."""
+
+    lines = ['<{0}>'.format(cls.__name__)]
+    lines.extend(
+        '  ' + ElementTree.tostring(child).strip()
+        for child in element(cls, rng, now, overrides)
+    )
+    lines.append('</{0}>'.format(cls.__name__))
+
+    return '\r\n'.join(lines) + '\r\n'
+
+
+class FrameGenerator(object):
+    """
+    Generator of synthetic response frames.
+
+    Frames are drawn from a weighted mix of response types, for one or more
+    meters. A fraction of frames can be truncated (cut short at a random
+    point, as the device does when it restarts a response), and a fraction
+    can be followed by NUL padding.
+    """
+
+    PARSERS = [
+        ConnectionStatus, DeviceInfo, ScheduleInfo,
+        MeterList, MeterInfo, NetworkInfo,
+        TimeCluster, MessageCluster, PriceCluster,
+        InstantaneousDemand, CurrentSummationDelivered,
+        CurrentPeriodUsage, LastPeriodUsage,
+        ProfileData, Warning, Error,
+        Firmware,
+    ]
+
+    def __init__(self, mix=None, meters=1, truncation=0.0, padding=0.0,
+                 seed=None):
+        """Initialise the generator."""
+
+        parsers = {cls.__name__: cls for cls in self.PARSERS}
+
+        mix = mix if mix is not None else DEFAULT_MIX
+        self.mix = [(parsers[name], weight) for name, weight in mix.items()]
+        self._total = float(sum(weight for cls, weight in self.mix))
+
+        self.truncation = truncation
+        self.padding = padding
+
+        self.rng = random.Random(seed)
+        self.now = datetime.datetime.utcnow().replace(microsecond=0)
+
+        self.device = '0x00158d00{0:08x}'.format(self.rng.getrandbits(32))
+        self.meters = [
+            '0x00135003{0:08x}'.format(self.rng.getrandbits(32))
+            for i in range(meters)
+        ]
+
+    def choose(self):
+        """Choose a response type from the mix."""
+
+        x = self.rng.random() * self._total
+
+        for cls, weight in self.mix:
+            x -= weight
+            if x < 0:
+                return cls
+
+        return self.mix[-1][0]
+
+    def frame(self, cls=None):
+        """Generate a single (possibly truncated or padded) frame."""
+
+        cls = cls or self.choose()
+
+        overrides = {'DeviceMacId': self.device}
+        if cls is MeterList:
+            overrides['MeterMacId'] = self.meters
+        else:
+            overrides['MeterMacId'] = self.rng.choice(self.meters)
+
+        data = frame(cls, self.rng, self.now, overrides)
+
+        if self.truncation and self.rng.random() < self.truncation:
+            data = data[:self.rng.randint(1, len(data) - 1)]
+
+        if self.padding and self.rng.random() < self.padding:
+            data += '\0' * self.rng.randint(1, 16)
+
+        return data
+
+    def __iter__(self):
+        """Return an infinite iterator over frames."""
+
+        while True:
+            yield self.frame()
+
+    def frames(self, n):
+        """Generate a list of frames."""
+
+        return [self.frame() for i in range(n)]
+
+    def stream(self, n):
+        """Generate the raw bytes of a stream of frames."""
+
+        return ''.join(self.frames(n))
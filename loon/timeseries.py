@@ -0,0 +1,304 @@
+"""
+Columnar time-series store for scaled meter readings.
+"""
+
+__all__ = ['TimeSeries', 'Series']
+
+import datetime
+import calendar
+
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+from .parser import (
+    InstantaneousDemand, CurrentSummationDelivered,
+    CurrentPeriodUsage, LastPeriodUsage
+)
+from .formatter import Date
+from .exception import LoonError
+
+
+# 64-bit epoch timestamps ('q' is not available in all array versions)
+try:
+    array('q')
+    TIMESTAMP_TYPE = 'q'
+except ValueError:
+    TIMESTAMP_TYPE = 'l' if array('l').itemsize == 8 else 'd'
+
+
+# missing values
+NAN = float('nan')
+
+
+def epoch(value, offset=0):
+    """
+    Convert a timestamp to epoch seconds (integers are offset from the
+    epoch by `offset` seconds).
+    """
+
+    if isinstance(value, datetime.datetime):
+        return calendar.timegm(value.utctimetuple())
+
+    return value + offset
+
+
+def view(column, start=None, stop=None):
+    """Zero-copy, read-only view of (a slice of) a column."""
+
+    start, stop, _ = slice(start, stop).indices(len(column))
+    stop = max(start, stop)
+
+    try:
+        return memoryview(column)[start:stop]
+    except TypeError:
+        # old-style buffer interface only
+        size = column.itemsize
+        return buffer(column, start * size, (stop - start) * size)
+
+
+class Series(object):
+    """
+    Columns of readings for a single response type.
+
+    Readings are kept in the order they were appended, unless they arrive out
+    of time order (e.g. from meters with different clocks): then the columns
+    are sorted by time (stably) when next needed for a time-range query.
+    """
+
+    MACS = ['DeviceMacId', 'MeterMacId']
+
+    def __init__(self, parser, macs, offset=0):
+        """Initialise the series."""
+
+        self.response_type = parser.__name__
+        self.offset = offset
+
+        self.dates = [
+            formatter.name for formatter in parser.TAGS
+            if isinstance(formatter, Date)
+        ]
+        self.numbers = list(parser.NUMBERS)
+
+        self.time = Series.time_field(parser)
+
+        self.columns = OrderedDict(
+            [(name, array('I')) for name in self.MACS] +
+            [(name, array(TIMESTAMP_TYPE)) for name in self.dates] +
+            [(name, array('d')) for name in self.numbers]
+        )
+
+        self._macs = macs
+        self._ordered = True
+
+    @staticmethod
+    def time_field(parser):
+        """Primary time axis (LastPeriodUsage has no TimeStamp)."""
+
+        dates = [
+            formatter.name for formatter in parser.TAGS
+            if isinstance(formatter, Date)
+        ]
+
+        return 'TimeStamp' if 'TimeStamp' in dates else dates[-1]
+
+    def append(self, record):
+        """
+        Append a parsed record to the columns. Fields missing from the record
+        (e.g. projected out) are stored as None MAC ids, zero times and NaN
+        values; the time field is required.
+        """
+
+        columns = self.columns
+
+        try:
+            time = epoch(record[self.time], self.offset)
+        except KeyError:
+            raise LoonError("Missing time for {0}: {1}".format(
+                self.response_type, self.time
+            ))
+
+        if columns[self.time] and time < columns[self.time][-1]:
+            self._ordered = False
+
+        for name in self.MACS:
+            columns[name].append(self._macs.encode(record.get(name)))
+        for name in self.dates:
+            value = record.get(name)
+            columns[name].append(
+                epoch(value, self.offset) if value is not None else 0
+            )
+        for name in self.numbers:
+            value = record.get(name)
+            columns[name].append(float(value) if value is not None else NAN)
+
+    def __len__(self):
+        """Return the number of readings."""
+
+        return len(self.columns[self.time])
+
+    def _record(self, i):
+        """Rebuild the record at a position."""
+
+        record = OrderedDict(response_type=self.response_type)
+
+        for name, column in self.columns.items():
+            value = column[i]
+            if name in self.MACS:
+                value = self._macs.decode(value)
+            elif name in self.dates and not value:
+                value = None
+            record[name] = value
+
+        return record
+
+    def __getitem__(self, index):
+        """Get a reading (or list of readings for a slice)."""
+
+        if isinstance(index, slice):
+            return [
+                self._record(i)
+                for i in range(*index.indices(len(self)))
+            ]
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("series index out of range")
+
+        return self._record(index)
+
+    def __iter__(self):
+        """Return an iterator over the readings."""
+
+        return (self._record(i) for i in range(len(self)))
+
+    def between(self, start=None, end=None):
+        """
+        Return the slice of readings with time in [start, end]. Times may be
+        datetimes or epoch seconds.
+
+        Readings appended out of time order are sorted into place first, so
+        positions from before may no longer refer to the same readings.
+        """
+
+        if not self._ordered:
+            self._sort()
+
+        column = self.columns[self.time]
+
+        lo = 0 if start is None else bisect_left(column, epoch(start))
+        hi = len(column) if end is None else bisect_right(column, epoch(end))
+
+        return slice(lo, hi)
+
+    def _sort(self):
+        """Sort the readings by time."""
+
+        time = self.columns[self.time]
+        order = sorted(range(len(time)), key=time.__getitem__)
+
+        # new columns, so views of the old ones are left as they were
+        self.columns = OrderedDict(
+            (name, array(column.typecode, [column[i] for i in order]))
+            for name, column in self.columns.items()
+        )
+
+        self._ordered = True
+
+    def column(self, name, index=slice(None)):
+        """Zero-copy view of a column, optionally restricted to a slice."""
+
+        return view(self.columns[name], index.start, index.stop)
+
+    @property
+    def nbytes(self):
+        """Memory used by the column data."""
+
+        return sum(
+            len(column) * column.itemsize
+            for column in self.columns.values()
+        )
+
+
+class MacDictionary(object):
+    """Dictionary encoding for MAC ids."""
+
+    def __init__(self):
+
+        self.values = []
+        self._codes = {}
+
+    def encode(self, value):
+        """Get the code for a MAC id."""
+
+        try:
+            return self._codes[value]
+        except KeyError:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+            return code
+
+    def decode(self, code):
+        """Get the MAC id for a code."""
+
+        return self.values[code]
+
+
+class TimeSeries(object):
+    """
+    Columnar store for scaled meter readings.
+
+    Readings are appended to per-type columns of doubles (values), 64-bit
+    integers (epoch timestamps) and dictionary-encoded MAC ids, rather than
+    being kept as individual records.
+    """
+
+    PARSERS = [
+        InstantaneousDemand, CurrentSummationDelivered,
+        CurrentPeriodUsage, LastPeriodUsage,
+    ]
+
+    def __init__(self, timestamps='datetime'):
+        """Initialise the store for records parsed in a timestamp mode."""
+
+        self.macs = MacDictionary()
+        self.series = OrderedDict(
+            (parser.__name__, Series(parser, self.macs))
+            for parser in self.PARSERS
+        )
+
+        self.timestamps = timestamps
+
+    def timestamps():
+        def fget(self):
+            return self._timestamps
+        def fset(self, value):
+            # raw timestamps are offset from the RAVEn(TM) epoch
+            offset = Date.EPOCH if value == 'raw' else 0
+            for series in self.series.values():
+                series.offset = offset
+            self._timestamps = value
+        return locals()
+    timestamps = property(**timestamps())
+
+    def __contains__(self, response_type):
+        """Check whether a response type is stored."""
+
+        return response_type in self.series
+
+    def __getitem__(self, response_type):
+        """Get the series for a response type."""
+
+        return self.series[response_type]
+
+    def append(self, record):
+        """Append a parsed record."""
+
+        self.series[record['response_type']].append(record)
+
+    @property
+    def nbytes(self):
+        """Memory used by the column data."""
+
+        return sum(series.nbytes for series in self.series.values())
@@ -0,0 +1,194 @@
+"""
+Prioritised, paced command writes.
+"""
+
+__all__ = ['CommandWriter']
+
+import time
+import heapq
+import logging
+
+from itertools import count
+from threading import Thread, Condition
+
+from .exception import LoonError
+
+
+class CommandWriter(object):
+    """
+    Background writer for commands.
+
+    Commands are queued by callers and written from a dedicated thread (or
+    from the event loop of the caller, if not threaded) in priority order
+    (lowest first, then in order of submission). Writes are paced to at most
+    `rate` bytes per second, so that the small input buffer of the RAVEn(TM)
+    is not overrun; a higher priority command queued while waiting is written
+    first.
+    """
+
+    def __init__(self, write, rate=None, threaded=True, on_put=None):
+        """
+        Initialise the writer. If not `threaded`, commands are written by
+        calling `write_next` (e.g. from a selector loop) when `delay` is zero,
+        and `on_put()` is called when a command is queued.
+        """
+
+        self._write = write
+        self.rate = rate
+        self.threaded = threaded
+        self.on_put = on_put
+
+        self._queue = []
+        self._order = count()
+        self._condition = Condition()
+
+        self._thread = None
+        self._closed = False
+
+        # time the link is next free
+        self._ready = 0.0
+
+        # counters
+        self.written = 0
+        self.bytes = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    @property
+    def depth(self):
+        """Number of commands waiting to be written."""
+
+        return len(self._queue)
+
+    @property
+    def latency(self):
+        """Mean time from queueing to writing a command, in seconds."""
+
+        return self.latency_total / self.written if self.written else None
+
+    def put(self, data, priority=0, future=None):
+        """
+        Queue a command for writing. The future (if given) completes once the
+        command has been written.
+        """
+
+        with self._condition:
+            if self._closed:
+                raise LoonError("Writer is closed.")
+
+            heapq.heappush(
+                self._queue,
+                (priority, next(self._order), data, time.time(), future)
+            )
+            self._condition.notify()
+
+            if self.threaded and self._thread is None:
+                self._thread = Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+
+        if self.on_put is not None:
+            self.on_put()
+
+    def delay(self, now=None):
+        """
+        Time until the next command may be written (None if there are no
+        commands waiting).
+        """
+
+        with self._condition:
+            if self._closed or not self._queue:
+                return None
+
+            return max(0.0, self._ready - (now or time.time()))
+
+    def write_next(self):
+        """Write the next command if it is due, returning True if written."""
+
+        with self._condition:
+            if (
+                self._closed or not self._queue or
+                self._ready > time.time()
+            ):
+                return False
+
+            item = heapq.heappop(self._queue)
+
+        self._write_item(item)
+
+        return True
+
+    def _next(self):
+        """Wait for the next command that may be written."""
+
+        with self._condition:
+            while True:
+                if self._closed:
+                    return None
+
+                if not self._queue:
+                    self._condition.wait()
+                    continue
+
+                delay = self._ready - time.time()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+
+                return heapq.heappop(self._queue)
+
+    def _run(self):
+        """Write queued commands until closed."""
+
+        while True:
+            item = self._next()
+            if item is None:
+                return
+
+            self._write_item(item)
+
+    def _write_item(self, item):
+        """Write a queued command, completing its future."""
+
+        priority, order, data, queued, future = item
+
+        start = time.time()
+
+        try:
+            self._write(data)
+        except Exception as e:
+            logging.error("Unable to write command: {0}".format(e))
+            if future is not None and not future.done():
+                future.set_exception(LoonError(
+                    "Unable to write command: {0}".format(e)
+                ))
+            return
+
+        now = time.time()
+
+        if self.rate:
+            self._ready = (
+                max(self._ready, start) + len(data) / float(self.rate)
+            )
+
+        latency = now - queued
+        self.written += 1
+        self.bytes += len(data)
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+
+        if future is not None and not future.done():
+            future.set_result(None)
+
+    def close(self):
+        """Stop writing, failing the futures of queued commands."""
+
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+
+            queue, self._queue = self._queue, []
+
+        for priority, order, data, queued, future in queue:
+            if future is not None and not future.done():
+                future.set_exception(LoonError("Writer closed"))
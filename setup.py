@@ -9,10 +9,15 @@ setup(
     author="Josh Bode",
     author_email='joshbode@gmail.com',
     install_requires=[
-        'pyserial',
+        'pyserial>=3.0',
     ],
+    extras_require={
+        # backports for Python 2
+        'manager': ['selectors34; python_version < "3.4"'],
+        'aio': ['trollius; python_version < "3.4"'],
+    },
     license='LICENSE.rst',
-    packages=find_packages(),
+    packages=find_packages(exclude=['benchmarks', 'tests']),
     long_description=open('README.rst', 'r').read(),
     #entry_points={
     #    'console_scripts': [
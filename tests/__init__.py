@@ -0,0 +1,5 @@
+"""
+Loon tests.
+
+Run with `python -m unittest discover tests`.
+"""
@@ -0,0 +1,145 @@
+"""
+AsyncLoon tests, against a simulated device.
+"""
+
+import unittest
+
+try:
+    import asyncio
+except ImportError:
+    import trollius as asyncio
+
+from loon.aio import AsyncLoon
+from loon.simulator import Simulator
+from loon.exception import LoonError
+
+
+class CloseTest(unittest.TestCase):
+    """Commands outstanding when the device closes fail."""
+
+    def setUp(self):
+
+        self.simulator = Simulator(rate=0, seed=1)
+        self.loop = asyncio.new_event_loop()
+        self.loon = AsyncLoon(
+            device=self.simulator.device, start_capture=False,
+            options={'command': {'timeout': None}}, loop=self.loop
+        )
+
+    def tearDown(self):
+
+        self.loon.close()
+        self.loop.close()
+        if self.simulator is not None:
+            self.simulator.close()
+
+    def test_close(self):
+        """Unwritten and unanswered commands fail on close."""
+
+        future = self.loon.get_device_info()
+
+        # completes once written
+        write = self.loon.restart()
+
+        self.loon.close()
+
+        self.assertIsInstance(write.exception(), LoonError)
+        self.assertIsInstance(future.exception(), LoonError)
+
+    def test_device_closed(self):
+        """Commands awaiting a response fail when the device goes away."""
+
+        self.loon.start_capture()
+        future = self.loon.get_device_info()
+
+        self.loop.run_until_complete(asyncio.sleep(0.1, loop=self.loop))
+
+        # the simulator is not running, so there is no response
+        self.assertFalse(future.done())
+
+        self.simulator.close()
+        self.simulator = None
+
+        self.loop.run_until_complete(asyncio.wait(
+            [future], timeout=1.0, loop=self.loop
+        ))
+
+        self.assertIsInstance(future.exception(), LoonError)
+
+
+class CaptureTest(unittest.TestCase):
+    """Responses and replies through the event loop."""
+
+    def setUp(self):
+
+        self.simulator = Simulator(rate=0, seed=1)
+        self.simulator.start()
+        self.loop = asyncio.new_event_loop()
+        self.loon = AsyncLoon(
+            device=self.simulator.device, loop=self.loop
+        )
+
+    def tearDown(self):
+
+        self.loon.close()
+        self.loop.close()
+        self.simulator.close()
+
+    def wait(self, future, timeout=2.0):
+
+        return self.loop.run_until_complete(
+            asyncio.wait_for(future, timeout, loop=self.loop)
+        )
+
+    def test_command(self):
+        """Command futures complete with their replies."""
+
+        response = self.wait(self.loon.get_device_info())
+
+        self.assertEqual(response['response_type'], 'DeviceInfo')
+
+        # written from the event loop, not a writer thread
+        self.assertFalse(self.loon.writer.threaded)
+        self.assertIsNone(self.loon.writer._thread)
+        self.assertGreater(self.loon.writer.written, 0)
+
+    def test_next(self):
+        """Stored responses are delivered in order."""
+
+        self.wait(self.loon.get_device_info())
+        self.wait(self.loon.get_network_info())
+
+        response_types = [
+            self.wait(self.loon.next())['response_type']
+            for i in range(len(self.loon.responses))
+        ]
+
+        self.assertEqual(response_types[-2:], ['DeviceInfo', 'NetworkInfo'])
+
+    def test_priority(self):
+        """Queued commands are written in priority order."""
+
+        written = []
+        write = self.loon.writer._write
+        self.loon.writer._write = lambda data: (
+            written.append(data), write(data)
+        )
+
+        self.loon.writer.rate = 100
+        futures = [
+            self.loon.image_block_dump(Offset=0, BlkSize=0x40),
+            self.loon.get_device_info(),
+        ]
+
+        self.wait(asyncio.gather(*futures, loop=self.loop))
+
+        names = [
+            name for data in written
+            for name in ['get_device_info', 'image_block_dump']
+            if name.encode('ascii') in data
+        ]
+        self.assertEqual(names, ['get_device_info', 'image_block_dump'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+Read buffer tests.
+"""
+
+import random
+import unittest
+
+from loon.buffer import ReadBuffer, ReadCounter
+
+
+class Stream(object):
+    """
+    Stream with data arriving in chunks of at most `chunk` bytes, like a
+    serial port: a chunk is waiting once the previous one has been read.
+    """
+
+    def __init__(self, data, chunk):
+
+        self.data = data
+        self.chunk = chunk
+        self.waiting = 0
+        self.reads = 0
+
+    @property
+    def in_waiting(self):
+
+        return self.waiting
+
+    def readinto(self, b):
+
+        self.reads += 1
+
+        # a blocking read waits for the next chunk
+        if not self.waiting:
+            self.waiting = min(len(self.data), self.chunk)
+
+        n = min(len(b), self.waiting)
+        b[:n] = self.data[:n]
+        self.data = self.data[n:]
+        self.waiting -= n
+
+        return n
+
+
+class ReadBufferTest(unittest.TestCase):
+
+    def test_waiting(self):
+        """Everything waiting is read at once."""
+
+        buffer = ReadBuffer(16)
+        stream = Stream(b'abcdefghij', 4)
+        stream.waiting = 6
+
+        self.assertEqual(buffer.read(stream), b'abcdef')
+        self.assertEqual(stream.reads, 1)
+
+    def test_wait(self):
+        """With nothing waiting, a read waits for data then takes it all."""
+
+        buffer = ReadBuffer(16)
+        stream = Stream(b'abcdefghij', 4)
+
+        self.assertEqual(buffer.read(stream), b'abcd')
+        self.assertEqual(stream.reads, 2)
+
+        self.assertEqual(buffer.read(stream), b'efgh')
+        self.assertEqual(buffer.read(stream), b'ij')
+        self.assertEqual(buffer.read(stream), b'')
+
+    def test_size(self):
+        """Reads are limited to the size of the buffer."""
+
+        buffer = ReadBuffer(8)
+        stream = Stream(b'x' * 32, 32)
+
+        self.assertEqual(len(buffer.read(stream)), 8)
+        self.assertEqual(len(buffer.read(stream)), 8)
+
+        # data returned is not changed by later reads
+        stream = Stream(b'abcdefghij', 3)
+        data = buffer.read(stream)
+        buffer.read(stream)
+        self.assertEqual(data, b'abc')
+
+    def test_stream(self):
+        """A stream read in random chunks is reproduced exactly."""
+
+        rng = random.Random(0)
+        data = bytes(bytearray(rng.getrandbits(8) for i in range(10000)))
+
+        for size in [1, 7, 64, 4096]:
+            buffer = ReadBuffer(size)
+            stream = Stream(data, rng.randint(1, 2 * size))
+            result = []
+
+            while stream.data or stream.waiting:
+                result.append(buffer.read(stream))
+
+            self.assertEqual(b''.join(result), data)
+
+
+class ReadCounterTest(unittest.TestCase):
+
+    def test_update(self):
+
+        counter = ReadCounter()
+        counter.update(10)
+        counter.update(5)
+
+        self.assertEqual((counter.bytes, counter.reads), (15, 2))
+
+        counter.reset()
+        self.assertEqual((counter.bytes, counter.reads), (0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+"""
+Prepared command tests.
+"""
+
+import unittest
+
+from loon.command import confirm_message, get_time
+
+
+class PrepareTest(unittest.TestCase):
+
+    def test_reuse(self):
+        """Commands with the same arguments share their encoding."""
+
+        self.assertIs(get_time(MeterMacId=0x10), get_time(meterMacId=0x10))
+        self.assertIsNot(get_time(MeterMacId=0x10), get_time(MeterMacId=0x20))
+        self.assertIs(
+            get_time({'MeterMacId': 0x10}, Refresh=True),
+            get_time(MeterMacId=0x10, Refresh=True)
+        )
+
+    def test_types(self):
+        """Equal arguments of different types are encoded separately."""
+
+        confirm_message(Id=1)
+
+        # not the cached encoding of 1
+        self.assertRaises(TypeError, confirm_message, Id=1.0)
+
+        self.assertEqual(get_time(Refresh=True), get_time(Refresh=1))
+        self.assertIsNot(get_time(Refresh=True), get_time(Refresh=1))
+
+
+if __name__ == '__main__':
+    unittest.main()
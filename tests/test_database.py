@@ -0,0 +1,198 @@
+"""
+SQLite response store tests.
+"""
+
+import os
+import shutil
+import random
+import calendar
+import datetime
+import tempfile
+import unittest
+
+from loon.database import Database, DatabaseReader, parser_classes
+from loon.parser import InstantaneousDemand
+from loon.synthetic import element
+from loon.formatter import Date
+from loon.exception import LoonError
+
+
+class DatabaseTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'loon.db')
+        self.database = Database(self.path)
+        self.rng = random.Random(0)
+
+    def tearDown(self):
+
+        self.database.close()
+        shutil.rmtree(self.directory)
+
+    def test_bad_row(self):
+        """A response that cannot be stored does not stop the writer."""
+
+        response = InstantaneousDemand(element(InstantaneousDemand, self.rng))
+
+        bad = dict(response)
+        bad['Demand'] = 'bogus'
+
+        self.database.append(bad)
+        self.database.append(response)
+        self.database.flush(5.0)
+
+        self.assertEqual(self.database.failed, 1)
+        self.assertEqual(self.database.written, 1)
+
+        self.database.append(response)
+        self.database.flush(5.0)
+
+        self.assertEqual(self.database.written, 2)
+
+        reader = DatabaseReader(self.path)
+        self.assertEqual(reader.count('InstantaneousDemand'), 2)
+        reader.close()
+
+    def test_skipped(self):
+        """Responses without a table are skipped, not written."""
+
+        self.database.append({'response_type': 'Bogus'})
+        self.database.flush(5.0)
+
+        self.assertEqual(self.database.skipped, 1)
+        self.assertEqual(self.database.written, 0)
+        self.assertEqual(self.database.failed, 0)
+
+    def test_round_trip(self):
+        """Responses of each type are read back as they were stored."""
+
+        responses = {}
+
+        for name, cls in parser_classes().items():
+            # (synthetic messages have no TimeStamp)
+            if name == 'MessageCluster':
+                continue
+
+            response = cls(element(cls, self.rng), {'use_formatting': True})
+            responses[name] = response
+            self.database.append(response)
+
+        self.database.flush(5.0)
+        self.assertEqual(self.database.written, len(responses))
+
+        reader = DatabaseReader(self.path)
+
+        for name, response in responses.items():
+            self.assertEqual(list(reader.select(name)), [response])
+
+        reader.close()
+
+
+class SelectTest(unittest.TestCase):
+    """Time-range and meter reads."""
+
+    START = datetime.datetime(2020, 1, 1)
+
+    METERS = [0x10, 0xfffffffffffffff0]
+
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'loon.db')
+        self.rng = random.Random(0)
+
+        database = Database(self.path)
+
+        for i in range(10):
+            for meter in self.METERS:
+                database.append(InstantaneousDemand(element(
+                    InstantaneousDemand, self.rng, overrides={
+                        'TimeStamp': Date('TimeStamp').encode(
+                            self.START + datetime.timedelta(minutes=i)
+                        ),
+                        'MeterMacId': '0x{0:x}'.format(meter),
+                    }
+                )))
+
+        database.close()
+
+        self.reader = DatabaseReader(self.path)
+
+    def tearDown(self):
+
+        self.reader.close()
+        shutil.rmtree(self.directory)
+
+    def minutes(self, responses):
+
+        return [
+            (x['TimeStamp'] - self.START).seconds // 60 for x in responses
+        ]
+
+    def test_time_range(self):
+        """Bounds are inclusive, as datetimes or epoch seconds."""
+
+        start = self.START + datetime.timedelta(minutes=2)
+        end = self.START + datetime.timedelta(minutes=4)
+
+        for bounds in [
+            (start, end),
+            (calendar.timegm(start.timetuple()),
+             calendar.timegm(end.timetuple())),
+        ]:
+            self.assertEqual(
+                self.minutes(self.reader.select(
+                    'InstantaneousDemand', *bounds, meter=0x10
+                )),
+                [2, 3, 4]
+            )
+            self.assertEqual(
+                self.reader.count('InstantaneousDemand', *bounds), 6
+            )
+
+        self.assertEqual(
+            self.minutes(self.reader.select(
+                'InstantaneousDemand', start=end, meter=0x10
+            )),
+            [4, 5, 6, 7, 8, 9]
+        )
+        self.assertEqual(self.reader.count('InstantaneousDemand'), 20)
+        self.assertEqual(
+            len(list(self.reader.select('InstantaneousDemand', limit=3))), 3
+        )
+
+    def test_meter(self):
+        """Meters are given as integers or hex strings."""
+
+        for meter in self.METERS:
+            for value in [meter, '0x{0:x}'.format(meter)]:
+                responses = list(self.reader.select(
+                    'InstantaneousDemand', meter=value
+                ))
+
+                self.assertEqual(len(responses), 10)
+                self.assertEqual(
+                    set(x['MeterMacId'] for x in responses), set([meter])
+                )
+                self.assertEqual(
+                    self.reader.count('InstantaneousDemand', meter=value), 10
+                )
+
+        self.assertEqual(self.reader.count('InstantaneousDemand', meter=1), 0)
+
+    def test_invalid(self):
+        """Unknown types and meters of types without them are errors."""
+
+        self.assertRaises(LoonError, self.reader.count, 'Bogus')
+        self.assertRaises(
+            LoonError, self.reader.count, 'DeviceInfo', meter=0x10
+        )
+
+        # known, but nothing stored
+        self.assertEqual(list(self.reader.select('PriceCluster')), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
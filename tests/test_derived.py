@@ -0,0 +1,101 @@
+"""
+Derived field tests.
+"""
+
+import unittest
+
+from collections import OrderedDict
+
+from loon.derived import DerivedFields, state_name
+from loon.exception import LoonError
+
+
+def response(response_type, **fields):
+    """Parsed response."""
+
+    result = OrderedDict(response_type=response_type)
+    result.update(sorted(fields.items()))
+
+    return result
+
+
+class DerivedFieldsTest(unittest.TestCase):
+
+    FIELDS = {
+        'InstantaneousDemand': {
+            'watts': 'Demand * 1000',
+            'cost_rate': 'Demand * price.Price / 10**price.TrailingDigits',
+        },
+    }
+
+    def setUp(self):
+
+        self.derived = DerivedFields(self.FIELDS)
+
+    def test_state_name(self):
+
+        self.assertEqual(state_name('PriceCluster'), 'price')
+        self.assertEqual(
+            state_name('InstantaneousDemand'), 'instantaneous_demand'
+        )
+
+    def test_response(self):
+        """Fields are derived from the response alone."""
+
+        result = self.derived(response('InstantaneousDemand', Demand=1.5))
+
+        self.assertEqual(result['watts'], 1500.0)
+
+    def test_missing_state(self):
+        """Fields using a response type not yet seen are left out."""
+
+        result = self.derived(response('InstantaneousDemand', Demand=1.5))
+
+        self.assertNotIn('cost_rate', result)
+
+    def test_state(self):
+        """Fields use the latest response of other types."""
+
+        self.derived(response('PriceCluster', Price=100, TrailingDigits=2))
+        result = self.derived(response('InstantaneousDemand', Demand=1.5))
+        self.assertEqual(result['cost_rate'], 1.5)
+
+        self.derived(response('PriceCluster', Price=300, TrailingDigits=2))
+        result = self.derived(response('InstantaneousDemand', Demand=1.5))
+        self.assertEqual(result['cost_rate'], 4.5)
+
+    def test_previous(self):
+        """The state is kept when the fields are changed."""
+
+        self.derived(response('PriceCluster', Price=100, TrailingDigits=2))
+
+        derived = DerivedFields({
+            'InstantaneousDemand': {'cost': 'Demand * price.Price'},
+        }, previous=self.derived)
+
+        result = derived(response('InstantaneousDemand', Demand=2.0))
+        self.assertEqual(result['cost'], 200.0)
+        self.assertNotIn('watts', result)
+
+    def test_invalid(self):
+        """Invalid expressions and field names are rejected."""
+
+        self.assertRaises(LoonError, DerivedFields, {
+            'InstantaneousDemand': {'watts': 'Demand *'},
+        })
+        self.assertRaises(LoonError, DerivedFields, {'watts': 'Demand'})
+
+    def test_records(self):
+        """Derived fields need dict records."""
+
+        for records in ['lazy', 'compact']:
+            self.assertRaises(
+                LoonError, DerivedFields, self.FIELDS, records
+            )
+
+        # without fields, any records will do
+        self.assertFalse(DerivedFields(None, 'lazy'))
+
+
+if __name__ == '__main__':
+    unittest.main()
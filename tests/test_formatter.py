@@ -0,0 +1,157 @@
+"""
+Formatter round trip tests.
+"""
+
+import calendar
+import datetime
+import unittest
+
+from loon.formatter import (
+    Date, Enumeration, IntervalPeriod, Currency, String
+)
+from loon.exception import LoonError
+
+
+def roundtrip(formatter, values, expected=None):
+    """Encode and parse values, returning those that do not round trip."""
+
+    expected = expected or values
+
+    failures = []
+
+    for value, result in zip(values, expected):
+        try:
+            parsed = formatter.parse([formatter.encode(value)])
+        except Exception as e:
+            parsed = e
+        if parsed != result:
+            failures.append(repr(value))
+
+    return failures
+
+
+def roundtrips():
+    """Round trip every enumerated value."""
+
+    results = {}
+
+    for cls in Enumeration.__subclasses__():
+        formatter = cls(cls.__name__)
+        levels = list(cls.LEVELS)
+        indices = list(range(len(levels)))
+
+        # by level name and by index
+        results[cls.__name__] = (
+            roundtrip(formatter, levels, indices) +
+            roundtrip(formatter, indices)
+        )
+
+    results['IntervalPeriod'] = roundtrip(
+        IntervalPeriod('IntervalPeriod'), list(IntervalPeriod.INTERVALS)
+    )
+    results['Currency'] = roundtrip(
+        Currency('Currency'), sorted(Currency._ENCODE)
+    )
+    results['String'] = roundtrip(
+        String('String'), ['RAVEn', 'a & b', '<tag>', 'caf&eacute;', '&amp;']
+    )
+
+    return {
+        name: {'failures': len(failures), 'values': failures[:10]}
+        for name, failures in results.items()
+    }
+
+
+class RoundTripTest(unittest.TestCase):
+
+    def test_roundtrips(self):
+        """Every enumerated value is parsed back from its encoding."""
+
+        for name, result in sorted(roundtrips().items()):
+            self.assertEqual(
+                result['failures'], 0,
+                "{0} does not round trip: {1}".format(
+                    name, ', '.join(result['values'])
+                )
+            )
+
+
+class DateTest(unittest.TestCase):
+
+    TIME = datetime.datetime(2020, 1, 2, 3, 4, 5)
+
+    def setUp(self):
+
+        self.text = Date('TimeStamp').encode(self.TIME)
+        self.epoch = calendar.timegm(self.TIME.utctimetuple())
+
+        # a small, empty cache
+        self.cache_size = Date.CACHE_SIZE
+        Date.CACHE_SIZE = 4
+        Date._cache, Date._previous = {}, {}
+
+    def tearDown(self):
+
+        Date.CACHE_SIZE = self.cache_size
+        Date._cache, Date._previous = {}, {}
+
+    def test_timestamps(self):
+        """Dates are parsed and encoded in each timestamp mode."""
+
+        values = {
+            'datetime': self.TIME,
+            'epoch': self.epoch,
+            'raw': self.epoch - Date.EPOCH,
+        }
+
+        for timestamps, value in values.items():
+            formatter = Date('TimeStamp', timestamps=timestamps)
+
+            self.assertEqual(formatter.parse([self.text]), value)
+            self.assertEqual(formatter.encode(value), self.text)
+
+            # datetimes are encoded in any mode
+            self.assertEqual(formatter.encode(self.TIME), self.text)
+
+            self.assertEqual(Date.to_epoch(value, timestamps), self.epoch)
+            self.assertEqual(Date.to_datetime(value, timestamps), self.TIME)
+
+        self.assertEqual(
+            Date('TimeStamp').using('raw').parse([self.text]),
+            values['raw']
+        )
+        self.assertRaises(LoonError, Date, 'TimeStamp', timestamps='bogus')
+
+    def test_cache(self):
+        """Cached datetimes are kept when the cache turns over."""
+
+        formatter = Date('TimeStamp')
+
+        result = formatter.parse([self.text])
+        self.assertIs(formatter.parse([self.text]), result)
+
+        # push it into the previous generation
+        for i in range(Date.CACHE_SIZE):
+            formatter.parse([hex(i)])
+        self.assertNotIn(self.text, Date._cache)
+        self.assertIn(self.text, Date._previous)
+
+        # and back
+        self.assertIs(formatter.parse([self.text]), result)
+        self.assertIn(self.text, Date._cache)
+
+    def test_cache_size(self):
+        """The cache holds at most two generations."""
+
+        formatter = Date('TimeStamp')
+
+        for i in range(10 * Date.CACHE_SIZE):
+            formatter.parse([hex(i)])
+            self.assertLessEqual(
+                len(Date._cache) + len(Date._previous), 2 * Date.CACHE_SIZE
+            )
+            self.assertLessEqual(len(Date._cache), Date.CACHE_SIZE)
+
+
+if __name__ == '__main__':
+    unittest.main()
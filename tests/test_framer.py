@@ -0,0 +1,123 @@
+"""
+Framer tests, on synthetic response frames.
+"""
+
+import unittest
+
+from loon.framer import Framer
+from loon.synthetic import FrameGenerator
+from loon.parser import (
+    InstantaneousDemand, DeviceInfo, PriceCluster, MeterList,
+    ConnectionStatus,
+)
+
+
+class FramerTest(unittest.TestCase):
+
+    TYPES = [
+        InstantaneousDemand, DeviceInfo, PriceCluster, MeterList,
+        ConnectionStatus,
+    ]
+
+    def setUp(self):
+
+        generator = FrameGenerator(meters=2, seed=0)
+        self.frames = [generator.frame(cls) for cls in self.TYPES]
+
+    @staticmethod
+    def feed(data, size=4096):
+        """Feed data to a new framer in chunks, returning the frames."""
+
+        framer = Framer()
+        frames = []
+
+        for i in range(0, len(data), size):
+            frames.extend(framer.feed(data[i:i + size]))
+
+        return frames
+
+    def assertFrames(self, frames, expected):
+
+        self.assertEqual(
+            [frame.element.tag for frame in frames],
+            [cls.__name__ for cls in expected]
+        )
+
+        # frames parse to responses
+        for frame, cls in zip(frames, expected):
+            self.assertEqual(cls(frame.element)['response_type'], cls.__name__)
+
+    def test_chunks(self):
+        """Frames split across reads are framed as a whole."""
+
+        data = ''.join(self.frames)
+
+        for size in [1, 7, 4096]:
+            frames = self.feed(data, size)
+            self.assertFrames(frames, self.TYPES)
+            self.assertEqual(
+                [frame.raw for frame in frames],
+                [raw.rstrip() for raw in self.frames]
+            )
+
+    def test_padding(self):
+        """NUL padding and garbage between frames are discarded."""
+
+        data = '\0' * 8 + 'garbage\r\n'.join(
+            frame + '\0' * 3 for frame in self.frames
+        )
+
+        for size in [1, 7, 4096]:
+            frames = self.feed(data, size)
+            self.assertFrames(frames, self.TYPES)
+            for frame in frames:
+                self.assertNotIn('\0', frame.raw)
+
+    def test_truncated(self):
+        """A response cut short is dropped when the next one starts."""
+
+        first, second = self.frames[:2]
+
+        # cut at the end of a line and mid-tag
+        lines = first.split('\r\n')
+        cuts = ['\r\n'.join(lines[:3]) + '\r\n', first[:len(lines[0]) + 8]]
+
+        for cut in cuts:
+            for size in [1, 7, 4096]:
+                frames = self.feed(cut + second + self.frames[2], size)
+                self.assertFrames(frames, self.TYPES[1:3])
+
+    def test_malformed(self):
+        """Framing recovers from a malformed response."""
+
+        first = self.frames[0]
+        n = first.rfind('</', 0, first.rfind('</'))
+        malformed = first[:n + 2] + 'X' + first[n + 2:]
+
+        for size in [1, 7, 4096]:
+            frames = self.feed(malformed + ''.join(self.frames[1:]), size)
+            self.assertFrames(frames, self.TYPES[1:])
+
+    def test_missing_start(self):
+        """The tail of a response without its start is discarded."""
+
+        first = self.frames[0]
+        tail = first[first.index('\r\n', first.index('\r\n') + 2) + 2:]
+
+        for size in [1, 7, 4096]:
+            frames = self.feed(tail + ''.join(self.frames[1:]), size)
+            self.assertFrames(frames, self.TYPES[1:])
+
+    def test_oversized(self):
+        """A response that never ends is discarded."""
+
+        framer = Framer(max_size=256)
+
+        frames = framer.feed('<InstantaneousDemand>' + ' ' * 512)
+        frames.extend(framer.feed(self.frames[1]))
+
+        self.assertFrames(frames, self.TYPES[1:2])
+
+
+if __name__ == '__main__':
+    unittest.main()
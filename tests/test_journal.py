@@ -0,0 +1,161 @@
+"""
+Journal tests.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from loon.journal import Journal, JournalReader, INDEX, index_path
+from loon.synthetic import FrameGenerator
+from loon.parser import InstantaneousDemand, DeviceInfo, PriceCluster
+from loon.exception import LoonError
+
+
+class JournalTest(unittest.TestCase):
+
+    TYPES = [
+        InstantaneousDemand, DeviceInfo, InstantaneousDemand, PriceCluster,
+    ]
+
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'loon.journal')
+
+        generator = FrameGenerator(seed=0)
+        self.frames = [
+            (1000.0 + i, cls.__name__, generator.frame(cls))
+            for i, cls in enumerate(self.TYPES)
+        ]
+
+        journal = Journal(self.path)
+        for t, response_type, raw in self.frames:
+            journal.append(raw, response_type, t)
+        journal.close()
+
+    def tearDown(self):
+
+        shutil.rmtree(self.directory)
+
+    def test_read(self):
+        """Frames are read back in order, with their times and types."""
+
+        reader = JournalReader(self.path)
+
+        self.assertEqual(len(reader), len(self.frames))
+        self.assertEqual(
+            [tuple(entry) for entry in reader], self.frames
+        )
+        self.assertEqual(tuple(reader[-1]), self.frames[-1])
+        self.assertRaises(IndexError, lambda: reader[len(self.frames)])
+
+        self.assertEqual(
+            reader.response_types,
+            ['DeviceInfo', 'InstantaneousDemand', 'PriceCluster']
+        )
+
+        reader.close()
+
+    def test_select(self):
+        """Entries are selected by time range and response type."""
+
+        reader = JournalReader(self.path)
+
+        self.assertEqual(
+            [entry.time for entry in reader.select(1001.0, 1002.0)],
+            [1001.0, 1002.0]
+        )
+        self.assertEqual(
+            [
+                entry.time for entry in
+                reader.select(1000.5, response_type='InstantaneousDemand')
+            ],
+            [1002.0]
+        )
+        self.assertEqual(list(reader.select(response_type='Bogus')), [])
+
+        reader.close()
+
+    def test_append(self):
+        """Frames appended after opening are read after a refresh."""
+
+        reader = JournalReader(self.path)
+
+        journal = Journal(self.path)
+        t, response_type, raw = self.frames[0]
+        journal.append(raw, response_type, 999.0)
+        journal.flush()
+
+        reader.refresh()
+
+        # kept in time order
+        self.assertEqual(len(reader), len(self.frames) + 1)
+        self.assertEqual(reader[-1].time, self.frames[-1][0])
+        self.assertEqual(reader[-1].raw, raw)
+
+        journal.close()
+        reader.close()
+
+    def test_invalid_type(self):
+        """Types that don't fit the index are rejected before queueing."""
+
+        journal = Journal(self.path)
+        raw = self.frames[0][2]
+
+        for response_type in ['', 'X' * 33, u'Demand\u00e9', None]:
+            self.assertRaises(
+                LoonError, journal.append, raw, response_type, 2000.0
+            )
+
+        journal.append(raw, 'X' * 32, 2000.0)
+        journal.close()
+
+        reader = JournalReader(self.path)
+        self.assertEqual(len(reader), len(self.frames) + 1)
+        self.assertEqual(reader[-1].response_type, 'X' * 32)
+        reader.close()
+
+    def test_recover(self):
+        """A partial entry left by a crash is trimmed before appending."""
+
+        path = index_path(self.path)
+        size = os.path.getsize(path)
+        with open(path, 'r+b') as f:
+            f.truncate(size - 5)
+
+        journal = Journal(self.path)
+        t, response_type, raw = self.frames[0]
+        journal.append(raw, response_type, 2000.0)
+        journal.close()
+
+        self.assertEqual(os.path.getsize(path) % INDEX.size, 0)
+
+        reader = JournalReader(self.path)
+
+        self.assertEqual(
+            [tuple(entry) for entry in reader],
+            self.frames[:-1] + [(2000.0, response_type, raw)]
+        )
+        # the dropped frame is dropped from its type's index too
+        self.assertEqual(
+            list(reader.select(response_type='PriceCluster')), []
+        )
+        self.assertEqual(
+            os.path.getsize(self.path),
+            sum(len(x) for _, _, x in self.frames[:-1]) + len(raw)
+        )
+
+        reader.close()
+
+    def test_missing(self):
+        """Opening a missing journal fails."""
+
+        self.assertRaises(
+            LoonError, JournalReader, os.path.join(self.directory, 'bogus')
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
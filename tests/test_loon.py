@@ -0,0 +1,404 @@
+"""
+Loon capture path tests, against a simulated device.
+"""
+
+import os
+import time
+import random
+import shutil
+import tempfile
+import threading
+import unittest
+
+from threading import Thread
+
+from loon.loon import Loon
+from loon.simulator import Simulator
+from loon.synthetic import element
+from loon.parser import (
+    DeviceInfo, ConnectionStatus, InstantaneousDemand, ScheduleInfo
+)
+from loon.formatter import Date
+from loon.exception import LoonError
+
+
+class LoonTestCase(unittest.TestCase):
+    """Loon on a simulated device, without background capture."""
+
+    OPTIONS = {}
+
+    def setUp(self):
+
+        self.simulator = Simulator(rate=0, seed=1)
+        self.loon = Loon(
+            device=self.simulator.device, start_capture=False,
+            options=self.OPTIONS
+        )
+        self.rng = random.Random(0)
+
+    def tearDown(self):
+
+        self.loon.close()
+        self.simulator.close()
+
+
+class LazyTest(LoonTestCase):
+
+    OPTIONS = {'records': 'lazy'}
+
+    def test_process_decodes_nothing(self):
+        """Stored lazy records are only decoded on access."""
+
+        self.loon._process(element(DeviceInfo, self.rng), '')
+
+        record = self.loon.responses.pop()
+        self.assertEqual(list(record._values), ['response_type'])
+
+    def test_invalid_field_on_access(self):
+        """Invalid values are only raised when the field is read."""
+
+        self.loon._process(element(
+            ConnectionStatus, self.rng, overrides={'Status': 'Bogus'}
+        ), '')
+
+        record = self.loon.responses.pop()
+        self.assertRaises(LoonError, lambda: record['Status'])
+
+    def test_invalid_options(self):
+        """Unknown record types and validation are rejected."""
+
+        self.assertRaises(
+            LoonError, self.loon.update_options, {'records': 'dcit'}
+        )
+        self.assertRaises(
+            LoonError, self.loon.update_options, {'lazy': {'validate': 'x'}}
+        )
+        self.assertEqual(self.loon.options['records'], 'lazy')
+
+        self.loon.update_options({'lazy': {'validate': 'required'}})
+
+
+class CompactTest(LoonTestCase):
+
+    OPTIONS = {'records': 'compact'}
+
+    def test_store(self):
+        """Compact records are stored, and complete commands."""
+
+        future = self.loon.get_instantaneous_demand(MeterMacId=0x10)
+
+        self.loon._process(element(
+            InstantaneousDemand, self.rng, overrides={'MeterMacId': '0x10'}
+        ), '')
+
+        record = self.loon.responses.pop()
+
+        self.assertEqual(type(record).__name__, 'InstantaneousDemandRecord')
+        self.assertEqual(record['MeterMacId'], 0x10)
+        self.assertIs(future.result(0), record)
+
+
+class CorrelateTest(LoonTestCase):
+
+    def test_meter(self):
+        """Replies from other meters do not complete a command."""
+
+        future = self.loon.get_instantaneous_demand(MeterMacId=0x10)
+
+        for meter in ['0x20', '0x10']:
+            self.loon._process(element(
+                InstantaneousDemand, self.rng, overrides={'MeterMacId': meter}
+            ), '')
+            if meter == '0x20':
+                self.assertFalse(future.done())
+
+        self.assertEqual(future.result(0)['MeterMacId'], 0x10)
+
+    def test_event(self):
+        """Schedule replies are matched by event."""
+
+        future = self.loon.get_schedule(MeterMacId=0x10, Event='demand')
+
+        for event in ['price', 'demand']:
+            self.loon._process(element(
+                ScheduleInfo, self.rng,
+                overrides={'MeterMacId': '0x10', 'Event': event}
+            ), '')
+
+        self.assertEqual(future.result(0)['Event'], 2)
+
+    def test_any_meter(self):
+        """Commands without a meter take the next reply."""
+
+        future = self.loon.get_instantaneous_demand()
+
+        self.loon._process(element(InstantaneousDemand, self.rng), '')
+
+        self.assertTrue(future.done())
+
+
+class TimeoutTest(LoonTestCase):
+
+    OPTIONS = {'command': {'timeout': 0.05, 'retries': 1}}
+
+    def test_without_capture(self):
+        """Commands time out without the capture loop running."""
+
+        future = self.loon.get_instantaneous_demand()
+        other = self.loon.get_instantaneous_demand(MeterMacId=0x10)
+
+        self.assertIsInstance(future.exception(1.0), LoonError)
+        self.assertIsInstance(other.exception(1.0), LoonError)
+        self.assertFalse(self.loon._pending)
+        self.assertFalse(self.loon.capturing)
+
+
+class ProjectionTest(LoonTestCase):
+
+    OPTIONS = {
+        'timeseries': True,
+        'fields': {'InstantaneousDemand': ['TimeStamp', 'Demand']},
+    }
+
+    def test_timeseries(self):
+        """Projected readings are kept in the time series."""
+
+        self.loon._process(element(InstantaneousDemand, self.rng), '')
+
+        series = self.loon.timeseries['InstantaneousDemand']
+        self.assertEqual(len(series), 1)
+        self.assertIsNone(series[0]['DeviceMacId'])
+        self.assertIsNotNone(series[0]['MeterMacId'])
+
+    def test_correlate(self):
+        """Fields replies are matched by are kept in projections."""
+
+        future = self.loon.get_instantaneous_demand(MeterMacId=0x10)
+
+        self.loon._process(element(
+            InstantaneousDemand, self.rng, overrides={'MeterMacId': '0x10'}
+        ), '')
+
+        result = future.result(0)
+        self.assertEqual(result['MeterMacId'], 0x10)
+        self.assertNotIn('DeviceMacId', result)
+
+    def test_unknown_field(self):
+        """Unknown fields are rejected when the options are set."""
+
+        self.assertRaises(LoonError, self.loon.update_options, {
+            'fields': {'InstantaneousDemand': ['Bogus']},
+        })
+        self.assertRaises(LoonError, self.loon.update_options, {
+            'fields': {'Bogus': ['TimeStamp']},
+        })
+
+    def test_time_field(self):
+        """Time series readings need their time field."""
+
+        self.assertRaises(LoonError, self.loon.update_options, {
+            'fields': {'InstantaneousDemand': ['Demand']},
+        })
+
+
+class TimestampsTest(LoonTestCase):
+
+    OPTIONS = {'timeseries': True}
+
+    def test_mode_change(self):
+        """Time series times are epoch seconds in every timestamp mode."""
+
+        overrides = {'TimeStamp': '0x1f000000'}
+
+        for mode in ['datetime', 'raw', 'epoch']:
+            self.loon.set_option('timestamps', mode)
+            self.loon._process(
+                element(InstantaneousDemand, self.rng, overrides=overrides),
+                ''
+            )
+
+        series = self.loon.timeseries['InstantaneousDemand']
+        self.assertEqual(
+            list(series.columns['TimeStamp']), [0x1f000000 + Date.EPOCH] * 3
+        )
+
+    def test_invalid(self):
+        """Unknown timestamp modes are rejected when the options are set."""
+
+        self.assertRaises(
+            LoonError, self.loon.update_options, {'timestamps': 'bogus'}
+        )
+        self.assertEqual(self.loon.options['timestamps'], 'datetime')
+
+
+class OpenTest(unittest.TestCase):
+    """Nothing is left open when a Loon cannot be created."""
+
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+        self.options = {
+            'journal': {'path': os.path.join(self.directory, 'journal')},
+            'database': {'path': os.path.join(self.directory, 'loon.db')},
+        }
+
+    def tearDown(self):
+
+        shutil.rmtree(self.directory)
+
+    def test_device(self):
+        """No journal or database threads are started without a device."""
+
+        threads = threading.active_count()
+
+        self.assertRaises(
+            Exception, Loon, device=os.path.join(self.directory, 'bogus'),
+            start_capture=False, options=self.options
+        )
+        self.assertEqual(threading.active_count(), threads)
+        self.assertFalse(os.path.exists(self.options['journal']['path']))
+
+    def test_database(self):
+        """The journal and device are closed if the database fails."""
+
+        self.options['database']['path'] = self.directory
+
+        simulator = Simulator(rate=0, seed=1)
+        threads = threading.active_count()
+
+        self.assertRaises(
+            Exception, Loon, device=simulator.device, start_capture=False,
+            options=self.options
+        )
+        self.assertEqual(threading.active_count(), threads)
+
+        simulator.close()
+
+
+class CloseTest(LoonTestCase):
+
+    def test_close_while_capturing(self):
+        """Closing waits for the capture thread to stop reading."""
+
+        errors = []
+
+        def capture():
+            try:
+                self.loon._get_responses()
+            except Exception as e:
+                errors.append(e)
+
+        self.simulator.start()
+
+        thread = self.loon._thread = Thread(target=capture)
+        thread.start()
+        time.sleep(0.2)
+
+        self.loon.close()
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(errors, [])
+
+
+class SubscribeTest(LoonTestCase):
+
+    def test_meter(self):
+        """Subscriptions for a meter only receive its responses."""
+
+        received = []
+        self.loon.subscribe(received.append, 'InstantaneousDemand', '0x10')
+
+        for meter in ['0x20', '0x10']:
+            self.loon._process(element(
+                InstantaneousDemand, self.rng, overrides={'MeterMacId': meter}
+            ), '')
+
+        self.assertEqual([r['MeterMacId'] for r in received], [0x10])
+
+        self.loon.unsubscribe(received.append, 'InstantaneousDemand', 0x10)
+        self.loon._process(element(
+            InstantaneousDemand, self.rng, overrides={'MeterMacId': '0x10'}
+        ), '')
+        self.assertEqual(len(received), 1)
+
+        self.assertRaises(
+            LoonError, self.loon.unsubscribe, received.append
+        )
+
+    def test_store_unsubscribed(self):
+        """Without storing unsubscribed types, only subscribed are stored."""
+
+        self.loon.update_options({'store': {'unsubscribed': False}})
+
+        # no subscribers at all: nothing is stored
+        self.loon._process(element(DeviceInfo, self.rng), '')
+        self.assertEqual(len(self.loon.responses), 0)
+
+        received = []
+        self.loon.subscribe(received.append, 'InstantaneousDemand')
+
+        self.loon._process(element(DeviceInfo, self.rng), '')
+        self.loon._process(element(InstantaneousDemand, self.rng), '')
+
+        self.assertEqual(len(received), 1)
+        self.assertEqual(
+            [r['response_type'] for r in self.loon.responses],
+            ['InstantaneousDemand']
+        )
+
+        # subscribing to all types stores them all
+        self.loon.subscribe(received.append)
+        self.loon._process(element(DeviceInfo, self.rng), '')
+        self.assertEqual(len(self.loon.responses), 2)
+
+
+class IterResponsesTest(LoonTestCase):
+
+    def test_independent(self):
+        """Iterators are not ended by responses for other iterators."""
+
+        results = {}
+
+        def consume(response_type, timeout):
+            start = time.time()
+            responses = list(self.loon.iter_responses(response_type, timeout))
+            results[response_type] = responses, time.time() - start
+
+        threads = [
+            Thread(target=consume, args=('DeviceInfo', 0.5)),
+            Thread(target=consume, args=('InstantaneousDemand', 0.2)),
+        ]
+        for thread in threads:
+            thread.start()
+
+        time.sleep(0.1)
+        self.loon._process(element(InstantaneousDemand, self.rng), '')
+        time.sleep(0.1)
+        self.loon._process(element(DeviceInfo, self.rng), '')
+
+        for thread in threads:
+            thread.join()
+
+        responses, elapsed = results['DeviceInfo']
+        self.assertEqual(len(responses), 1)
+        self.assertGreaterEqual(elapsed, 0.5)
+
+        responses, elapsed = results['InstantaneousDemand']
+        self.assertEqual(len(responses), 1)
+
+    def test_stop(self):
+        """Stopping capture ends iteration."""
+
+        def stop():
+            time.sleep(0.1)
+            self.loon.stop_capture()
+
+        Thread(target=stop).start()
+
+        start = time.time()
+        self.assertEqual(list(self.loon.iter_responses(timeout=5)), [])
+        self.assertLess(time.time() - start, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
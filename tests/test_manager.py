@@ -0,0 +1,125 @@
+"""
+LoonManager tests, against simulated devices.
+"""
+
+import time
+import random
+import threading
+import unittest
+
+from loon.manager import LoonManager
+from loon.simulator import Simulator
+from loon.synthetic import frame
+from loon.parser import InstantaneousDemand, DeviceInfo
+
+
+class ManagerTest(unittest.TestCase):
+    """Capture and commands for several devices on a single thread."""
+
+    DEVICES = 5
+
+    def setUp(self):
+
+        self.simulators = [
+            Simulator(rate=0, seed=i) for i in range(self.DEVICES)
+        ]
+        for simulator in self.simulators:
+            simulator.start()
+
+        self.manager = LoonManager()
+
+    def tearDown(self):
+
+        self.manager.close()
+        for simulator in self.simulators:
+            simulator.close()
+
+    def test_single_thread(self):
+
+        threads = threading.active_count()
+
+        loons = [
+            self.manager.add(simulator.device, name=str(i))
+            for i, simulator in enumerate(self.simulators)
+        ]
+        self.manager.start()
+
+        for loon in loons:
+            loon.get_device_info()
+
+        # initialize and get_device_info, written from the manager thread
+        deadline = time.time() + 5.0
+        while time.time() < deadline:
+            if all(loon.responses for loon in loons):
+                break
+            time.sleep(0.01)
+
+        for loon in loons:
+            self.assertEqual(loon.writer.written, 2)
+            self.assertEqual(
+                loon.responses.popleft()['response_type'], 'DeviceInfo'
+            )
+
+        self.assertEqual(threading.active_count(), threads + 1)
+
+    def poll(self, condition):
+        """Poll the manager until the condition holds."""
+
+        deadline = time.time() + 5.0
+        while time.time() < deadline and not condition():
+            self.manager.poll(0.01)
+
+    def test_framer_isolation(self):
+        """A partial frame on one device does not affect another."""
+
+        for simulator in self.simulators[:2]:
+            simulator.stop()
+
+        loons = [
+            self.manager.add(simulator.device, name=str(i))
+            for i, simulator in enumerate(self.simulators[:2])
+        ]
+
+        rng = random.Random(0)
+        demand = frame(
+            InstantaneousDemand, rng, overrides={'MeterMacId': '0x10'}
+        )
+        half = len(demand) // 2
+
+        self.simulators[0]._write(demand[:half])
+        self.simulators[1]._write(frame(DeviceInfo, rng))
+        self.poll(lambda: loons[1].responses)
+
+        self.assertFalse(loons[0].responses)
+
+        self.simulators[0]._write(demand[half:])
+        self.poll(lambda: loons[0].responses)
+
+        self.assertEqual(
+            [(name, response['response_type'])
+             for name, response in self.manager.responses()],
+            [('0', 'InstantaneousDemand'), ('1', 'DeviceInfo')]
+        )
+
+    def test_running(self):
+        """Devices are added while running, and closed when they end."""
+
+        self.manager.start()
+
+        loons = [
+            self.manager.add(simulator.device, name=str(i))
+            for i, simulator in enumerate(self.simulators[:2])
+        ]
+
+        self.simulators.pop(0).close()
+
+        deadline = time.time() + 5.0
+        while time.time() < deadline and loons[0]._serial.is_open:
+            time.sleep(0.01)
+
+        self.assertEqual(list(self.manager.devices), ['1'])
+        self.assertFalse(loons[0]._serial.is_open)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+"""
+Node tree tests.
+"""
+
+import unittest
+
+from loon.node import Node, FrozenNode
+
+
+class NodeTest(unittest.TestCase):
+
+    def test_set_node_aliases(self):
+        """A node set as a value is kept by reference."""
+
+        node = Node({'a': 1})
+        sub = Node({'p': 1})
+
+        node['s'] = sub
+        sub['q'] = 2
+        node['s.r'] = 3
+
+        self.assertIs(node['s'], sub)
+        self.assertIs(node.s, sub)
+        self.assertEqual(node['s.q'], 2)
+        self.assertEqual(sub['r'], 3)
+        self.assertEqual(sub.to_dict(), {'p': 1, 'q': 2, 'r': 3})
+
+        self.assertEqual(len(node), 4)
+        self.assertEqual(
+            list(node), [('a',), ('s', 'p'), ('s', 'q'), ('s', 'r')]
+        )
+        self.assertEqual(
+            node.to_dict(), {'a': 1, 's': {'p': 1, 'q': 2, 'r': 3}}
+        )
+        self.assertIn('s.p', node)
+        self.assertEqual(node.get('s.q'), 2)
+        self.assertIsNone(node.get('s.z'))
+
+        del node['s.p']
+        self.assertNotIn('p', sub)
+
+        # replacing the node drops the reference
+        node['s'] = 4
+        sub['t'] = 5
+        self.assertEqual(node.to_dict(), {'a': 1, 's': 4})
+
+    def test_construct_aliases(self):
+        """Nodes given as values on construction are kept by reference."""
+
+        sub = Node({'p': 1})
+        node = Node({'s': sub}, t=sub)
+
+        sub['q'] = 2
+
+        self.assertEqual(node['s.q'], 2)
+        self.assertEqual(node['t.q'], 2)
+        self.assertEqual(len(node), 4)
+
+    def test_construct_flat(self):
+        """Nested mappings given on construction are stored flat."""
+
+        node = Node(
+            {'a': {'b': {'c': 1}}, 'x': [('k', 2)], 'e': {}},
+            a={'b': {'d': 3}}
+        )
+
+        self.assertEqual(node._ref.tree.mounts, {})
+        self.assertEqual(node['a.b.d'], 3)
+        self.assertNotIn('a.b.c', node)
+        self.assertEqual(node.x.k, 2)
+        self.assertIn('e', node)
+        self.assertEqual(len(node), 2)
+        self.assertEqual(list(node), [('a', 'b', 'd'), ('x', 'k')])
+        self.assertEqual(
+            node.to_dict(), {'a': {'b': {'d': 3}}, 'x': {'k': 2}, 'e': {}}
+        )
+
+        # copies share the tree until changed
+        other = node.copy()
+        self.assertIs(other._ref.tree, node._ref.tree)
+        other['a.b.d'] = 4
+        self.assertEqual(node['a.b.d'], 3)
+
+    def test_copy(self):
+        """Copies are independent of the original and its nodes."""
+
+        sub = Node({'p': 1})
+        node = Node({'a': {'b': 1}})
+        node['s'] = sub
+
+        copy = node.copy()
+        sub['q'] = 2
+        copy['s.r'] = 3
+        copy['a.b'] = 2
+
+        self.assertEqual(
+            node.to_dict(), {'a': {'b': 1}, 's': {'p': 1, 'q': 2}}
+        )
+        self.assertEqual(
+            copy.to_dict(), {'a': {'b': 2}, 's': {'p': 1, 'r': 3}}
+        )
+
+    def test_frozen(self):
+        """Frozen nodes keep the values of nodes at the time of freezing."""
+
+        sub = Node({'p': [1, 2]})
+        node = Node()
+        node['s'] = sub
+
+        frozen = FrozenNode(node)
+        sub['q'] = 2
+
+        self.assertEqual(frozen.to_dict(), {'s': {'p': (1, 2)}})
+        self.assertRaises(TypeError, frozen.__setitem__, 's.q', 1)
+        self.assertEqual(frozen.thaw().to_dict(), {'s': {'p': (1, 2)}})
+
+    def test_view_aliases(self):
+        """Views share the tree they were taken from."""
+
+        node = Node({'s': {'p': 1}})
+        view = node['s']
+
+        view['q'] = 2
+        node['s.r'] = 3
+
+        self.assertEqual(node['s.q'], 2)
+        self.assertEqual(view['r'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,227 @@
+"""
+Parser tests, on synthetic response elements.
+"""
+
+import pickle
+import random
+import unittest
+
+from xml.etree import cElementTree as ElementTree
+
+from loon.parser import (
+    InstantaneousDemand, MeterInfo, ConnectionStatus, Reading,
+    MessageCluster, MeterList, ProfileData, ScheduleInfo
+)
+from loon.synthetic import element
+from loon.formatter import SkipSignal
+from loon.exception import LoonError
+
+
+class InvalidValueTest(unittest.TestCase):
+    """Invalid values are errors of the response, not of the parser."""
+
+    def setUp(self):
+
+        self.rng = random.Random(0)
+
+    def test_required_boolean(self):
+        """An invalid required value is a missing value."""
+
+        for text in ['X', '']:
+            response = element(
+                InstantaneousDemand, self.rng,
+                overrides={'SuppressLeadingZero': text}
+            )
+            self.assertRaises(LoonError, InstantaneousDemand, response)
+
+    def test_optional_boolean(self):
+        """An invalid optional value is left out."""
+
+        result = MeterInfo(element(
+            MeterInfo, self.rng, overrides={'Enabled': 'X'}
+        ))
+
+        self.assertNotIn('Enabled', result)
+
+    def test_enumeration(self):
+        """An unknown level is invalid."""
+
+        response = element(
+            ConnectionStatus, self.rng, overrides={'Status': 'Bogus'}
+        )
+        self.assertRaises(LoonError, ConnectionStatus, response)
+
+    def test_lazy(self):
+        """Invalid values of lazy records are also missing values."""
+
+        options = {'records': 'lazy', 'lazy': {'validate': None}}
+
+        result = MeterInfo(element(
+            MeterInfo, self.rng, overrides={'Enabled': 'X'}
+        ), options)
+        self.assertNotIn('Enabled', result)
+
+        # formatting hints are decoded when the record is created
+        response = element(
+            InstantaneousDemand, self.rng,
+            overrides={'SuppressLeadingZero': 'X'}
+        )
+        self.assertRaises(LoonError, InstantaneousDemand, response, options)
+
+
+class PlanTest(unittest.TestCase):
+    """Parse plans behave as parsing tag by tag did."""
+
+    def setUp(self):
+
+        self.rng = random.Random(0)
+
+    def assertFails(self, exception, message, cls, response, options=None):
+
+        try:
+            cls(response, options)
+        except exception as e:
+            self.assertEqual(str(e), message)
+        else:
+            self.fail("{0} not raised".format(exception.__name__))
+
+    def test_duplicate_tags(self):
+        """
+        The second formatter of a tag finds its values consumed, so messages
+        always fail on their (required) TimeStamp.
+        """
+
+        for options in [None, {'records': 'lazy'}]:
+            for timestamp in [None, '0x1f000000']:
+                overrides = {'TimeStamp': timestamp} if timestamp else None
+                self.assertFails(
+                    LoonError, "Missing value: TimeStamp",
+                    MessageCluster,
+                    element(MessageCluster, self.rng, overrides=overrides),
+                    options
+                )
+
+        # an empty TimeStamp is skipped by the first formatter
+        self.assertFails(
+            SkipSignal, "Missing TimeStamp", MessageCluster,
+            element(MessageCluster, self.rng, overrides={'TimeStamp': ''})
+        )
+
+    def test_sequence(self):
+        """Repeated tags are parsed as lists, without missing values."""
+
+        result = MeterList(element(MeterList, self.rng, overrides={
+            'MeterMacId': ['0x01', '0xffffffffffffffff', '0x02'],
+        }))
+        self.assertEqual(result['MeterMacId'], [1, 2])
+
+        result = ProfileData(element(ProfileData, self.rng, overrides={
+            'IntervalData': ['0x000001', '0xffffff', '0x000003'],
+        }))
+        self.assertEqual(result['IntervalData'], [1, 3])
+
+        # no meters
+        result = MeterList(element(MeterList, self.rng, overrides={
+            'MeterMacId': ['0xffffffffffffffff'],
+        }))
+        self.assertEqual(result['MeterMacId'], [])
+
+    def test_skip(self):
+        """Responses for no meter are skipped."""
+
+        self.assertFails(
+            SkipSignal, "Missing MeterMacId", ScheduleInfo,
+            element(ScheduleInfo, self.rng, overrides={
+                'MeterMacId': '0xffffffffffffffff',
+            })
+        )
+
+    def test_unparsed(self):
+        """Unknown tags are errors."""
+
+        response = element(InstantaneousDemand, self.rng)
+        ElementTree.SubElement(response, 'Bogus').text = '1'
+        ElementTree.SubElement(response, 'Other').text = '1'
+
+        for options in [None, {'records': 'lazy'}]:
+            self.assertFails(
+                LoonError, "Unparsed data: Bogus, Other",
+                InstantaneousDemand, response, options
+            )
+
+
+class ReadingTest(unittest.TestCase):
+    """Scaled readings are numbers, formatted on demand."""
+
+    # (demand, multiplier, divisor, digits right, digits left, suppress)
+    HINTS = [
+        (1234, 1, 1000, 3, 6, 'N'),
+        (1234, 1, 1000, 3, 6, 'Y'),
+        (5, 10, 1, 0, 0, 'N'),
+        (5, 10, 1, 0, 0, 'Y'),
+        (98765, 1, 100000, 5, 2, 'Y'),
+        (0, 0, 0, 1, 1, 'N'),
+    ]
+
+    def setUp(self):
+
+        self.rng = random.Random(0)
+
+    def parse(self, demand, multiplier, divisor, right, left, suppress,
+              formatting=True):
+
+        return InstantaneousDemand(element(
+            InstantaneousDemand, self.rng, overrides={
+                'Demand': '0x{0:06x}'.format(demand),
+                'Multiplier': '0x{0:08x}'.format(multiplier),
+                'Divisor': '0x{0:08x}'.format(divisor),
+                'DigitsRight': '0x{0:02x}'.format(right),
+                'DigitsLeft': '0x{0:02x}'.format(left),
+                'SuppressLeadingZero': suppress,
+            }
+        ), {'use_formatting': formatting})
+
+    def test_str(self):
+        """Readings are shown as the device would show them."""
+
+        for hints in self.HINTS:
+            demand, multiplier, divisor, right, left, suppress = hints
+
+            value = float(demand) * (multiplier or 1) / (divisor or 1)
+            expected = '{0:{zero}{left}.{right}f}'.format(
+                value, zero='' if suppress == 'Y' else '0',
+                left=left + right + 1, right=right
+            ).lstrip()
+
+            reading = self.parse(*hints)['Demand']
+
+            self.assertIsInstance(reading, Reading)
+            self.assertEqual(reading, value)
+            self.assertEqual(str(reading), expected)
+            self.assertEqual(format(reading, ''), expected)
+            self.assertEqual('{0}'.format(reading), expected)
+            self.assertEqual(format(reading, '.1f'), format(value, '.1f'))
+
+    def test_pickle(self):
+        """Readings keep their format through pickling."""
+
+        reading = self.parse(*self.HINTS[0])['Demand']
+
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            result = pickle.loads(pickle.dumps(reading, protocol))
+
+            self.assertIs(type(result), Reading)
+            self.assertEqual(result, reading)
+            self.assertEqual(str(result), str(reading))
+
+    def test_no_formatting(self):
+        """Without formatting, readings are plain floats."""
+
+        reading = self.parse(*self.HINTS[0], formatting=False)['Demand']
+
+        self.assertIs(type(reading), float)
+        self.assertEqual(reading, 1.234)
+
+
+if __name__ == '__main__':
+    unittest.main()
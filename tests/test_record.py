@@ -0,0 +1,91 @@
+"""
+Compact record tests.
+"""
+
+import random
+import unittest
+
+from collections import OrderedDict
+
+from loon.record import record_type
+from loon.parser import InstantaneousDemand, MeterInfo
+from loon.synthetic import element
+
+
+Point = record_type('Point', ['response_type', 'x', 'y', 'z'])
+
+
+class RecordTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.record = Point(response_type='Point', z=3, x=1)
+
+    def test_items(self):
+        """Values are got by key, in field order."""
+
+        self.assertEqual(self.record['x'], 1)
+        self.assertRaises(KeyError, lambda: self.record['y'])
+        self.assertRaises(KeyError, lambda: self.record['bogus'])
+
+        self.assertEqual(self.record.get('z'), 3)
+        self.assertIsNone(self.record.get('y'))
+        self.assertEqual(self.record.get('y', 0), 0)
+
+        self.assertIn('x', self.record)
+        self.assertNotIn('y', self.record)
+        self.assertNotIn('bogus', self.record)
+
+        self.assertEqual(list(self.record), ['response_type', 'x', 'z'])
+        self.assertEqual(len(self.record), 3)
+        self.assertEqual(self.record.values(), ['Point', 1, 3])
+        self.assertEqual(
+            self.record.items(),
+            [('response_type', 'Point'), ('x', 1), ('z', 3)]
+        )
+
+    def test_change(self):
+        """Values are set, popped and deleted."""
+
+        self.record['y'] = 2
+        self.assertEqual(list(self.record), ['response_type', 'x', 'y', 'z'])
+        self.assertRaises(KeyError, self.record.__setitem__, 'bogus', 0)
+
+        self.assertEqual(self.record.pop('y'), 2)
+        self.assertEqual(self.record.pop('y', None), None)
+        self.assertRaises(KeyError, self.record.pop, 'y')
+
+        del self.record['x']
+        self.assertNotIn('x', self.record)
+        self.assertRaises(KeyError, self.record.__delitem__, 'x')
+
+    def test_equal(self):
+        """Records equal mappings with the same items."""
+
+        other = OrderedDict([('response_type', 'Point'), ('x', 1), ('z', 3)])
+
+        self.assertEqual(self.record, other)
+        self.assertEqual(self.record, Point(**other))
+        self.assertEqual(dict(self.record), other)
+
+        other['z'] = 4
+        self.assertNotEqual(self.record, other)
+        self.assertNotEqual(self.record, None)
+
+    def test_parser(self):
+        """Compact records have the values of dictionary results."""
+
+        for cls in [InstantaneousDemand, MeterInfo]:
+            response = element(cls, random.Random(0))
+
+            result = cls(response, {'records': 'compact'})
+            expected = cls(response)
+
+            self.assertIsInstance(expected, OrderedDict)
+            self.assertNotIsInstance(result, OrderedDict)
+            self.assertEqual(result, expected)
+            self.assertEqual(list(result), list(expected))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+"""
+Replay tests: frames captured through a Loon are replayed from its journal
+and from raw bytes.
+"""
+
+import os
+import time
+import shutil
+import tempfile
+import unittest
+
+from loon.loon import Loon
+from loon.replay import Replay
+from loon.simulator import Simulator
+from loon.synthetic import FrameGenerator
+from loon.parser import (
+    InstantaneousDemand, DeviceInfo, PriceCluster, CurrentSummationDelivered
+)
+
+
+class ReplayTest(unittest.TestCase):
+
+    TYPES = [
+        InstantaneousDemand, DeviceInfo, PriceCluster,
+        CurrentSummationDelivered, InstantaneousDemand,
+    ]
+
+    # seconds between frames
+    INTERVAL = 0.5
+
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+        self.journal = os.path.join(self.directory, 'loon.journal')
+        self.capture = os.path.join(self.directory, 'loon.raw')
+
+        generator = FrameGenerator(seed=0)
+        self.frames = [generator.frame(cls) for cls in self.TYPES]
+
+        with open(self.capture, 'wb') as f:
+            f.write(''.join(self.frames))
+
+        # capture through a Loon, with a journal
+        simulator = Simulator(rate=0, seed=0)
+        loon = Loon(
+            device=simulator.device, start_capture=False,
+            options={'journal': {'path': self.journal}}
+        )
+
+        for i, frame in enumerate(self.frames):
+            loon._receive(frame, 1000.0 + i * self.INTERVAL)
+
+        self.responses = list(loon.responses)
+
+        loon.close()
+        simulator.close()
+
+    def tearDown(self):
+
+        shutil.rmtree(self.directory)
+
+    def replay(self, source, speed=None):
+        """Replay a source, returning the responses."""
+
+        replay = Replay(source, speed=speed)
+        replay.run()
+        responses = list(replay.responses)
+        replay.close()
+
+        return responses
+
+    def test_captured(self):
+        """All frames were captured."""
+
+        self.assertEqual(
+            [response['response_type'] for response in self.responses],
+            [cls.__name__ for cls in self.TYPES]
+        )
+
+    def test_journal(self):
+        """A journal replays to the captured responses."""
+
+        self.assertEqual(self.replay(self.journal), self.responses)
+
+    def test_journal_timed(self):
+        """Timed journal replay keeps the recorded spacing of frames."""
+
+        speed = 10.0
+
+        start = time.time()
+        responses = self.replay(self.journal, speed)
+        elapsed = time.time() - start
+
+        self.assertEqual(responses, self.responses)
+
+        expected = (len(self.frames) - 1) * self.INTERVAL / speed
+        self.assertGreaterEqual(elapsed, expected * 0.9)
+
+    def test_capture(self):
+        """A raw capture replays to the captured responses."""
+
+        self.assertEqual(self.replay(self.capture), self.responses)
+        self.assertEqual(self.replay(self.capture, 100.0), self.responses)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+"""
+Response store tests.
+"""
+
+import unittest
+
+from loon.store import ResponseStore
+from loon.exception import LoonError
+
+
+def response(response_type, meter=None, n=0):
+
+    result = {'response_type': response_type, 'n': n}
+    if meter is not None:
+        result['MeterMacId'] = meter
+
+    return result
+
+
+class StoreTest(unittest.TestCase):
+
+    def fill(self, store, count):
+
+        for i in range(count):
+            store.append(response('InstantaneousDemand', 1, i))
+
+        return [item['n'] for item in store]
+
+    def test_unbounded(self):
+
+        store = ResponseStore()
+
+        self.assertEqual(self.fill(store, 5), list(range(5)))
+        self.assertEqual((store.evicted, store.dropped), (0, 0))
+
+    def test_drop_oldest(self):
+        """The oldest responses are evicted."""
+
+        store = ResponseStore(3, 'drop_oldest')
+
+        self.assertEqual(self.fill(store, 5), [2, 3, 4])
+        self.assertEqual((store.evicted, store.dropped), (2, 0))
+
+    def test_drop_newest(self):
+        """New responses are dropped."""
+
+        store = ResponseStore(3, 'drop_newest')
+
+        self.assertEqual(self.fill(store, 5), [0, 1, 2])
+        self.assertEqual((store.evicted, store.dropped), (0, 2))
+
+    def test_latest(self):
+        """Only the latest response of each type and meter is kept."""
+
+        store = ResponseStore(3, 'latest')
+
+        store.append(response('InstantaneousDemand', 1, 0))
+        store.append(response('InstantaneousDemand', 2, 1))
+        store.append(response('PriceCluster', 1, 2))
+        store.append(response('InstantaneousDemand', 1, 3))
+
+        self.assertEqual([item['n'] for item in store], [1, 2, 3])
+        self.assertEqual(store.evicted, 1)
+
+        # a new key evicts the oldest
+        store.append(response('DeviceInfo', n=4))
+
+        self.assertEqual([item['n'] for item in store], [2, 3, 4])
+        self.assertEqual(store.evicted, 2)
+
+        self.assertEqual(store[0]['n'], 2)
+        self.assertEqual(store[-1]['n'], 4)
+        self.assertRaises(IndexError, lambda: store[3])
+
+        self.assertEqual(store.popleft()['n'], 2)
+        self.assertEqual(store.pop()['n'], 4)
+        self.assertEqual(len(store), 1)
+
+        store.clear()
+        self.assertRaises(IndexError, store.popleft)
+        self.assertRaises(IndexError, store.pop)
+
+    def test_latest_meter_list(self):
+        """Responses for several meters are kept by their meters."""
+
+        store = ResponseStore(policy='latest')
+
+        store.append(response('MeterList', [1, 2], 0))
+        store.append(response('MeterList', [1], 1))
+        store.append(response('MeterList', [1, 2], 2))
+
+        self.assertEqual([item['n'] for item in store], [1, 2])
+        self.assertEqual(store.evicted, 1)
+
+    def test_invalid(self):
+
+        self.assertRaises(LoonError, ResponseStore, 3, 'bogus')
+        self.assertRaises(LoonError, ResponseStore, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+"""
+Time series tests.
+"""
+
+import math
+import struct
+import calendar
+import datetime
+import unittest
+
+from loon.timeseries import TimeSeries
+from loon.formatter import Date
+from loon.exception import LoonError
+
+
+START = datetime.datetime(2020, 1, 1)
+
+
+def reading(minutes, demand, meter=0x10):
+    """Parsed InstantaneousDemand record."""
+
+    return {
+        'response_type': 'InstantaneousDemand',
+        'DeviceMacId': 0x1,
+        'MeterMacId': meter,
+        'TimeStamp': START + datetime.timedelta(minutes=minutes),
+        'Demand': demand,
+    }
+
+
+def epoch(minutes):
+
+    return calendar.timegm(START.utctimetuple()) + 60 * minutes
+
+
+class SeriesTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.timeseries = TimeSeries()
+        for i in range(10):
+            self.timeseries.append(reading(i, i * 0.5))
+
+        self.series = self.timeseries['InstantaneousDemand']
+
+    def test_records(self):
+        """Readings are rebuilt by position or slice."""
+
+        self.assertEqual(len(self.series), 10)
+        self.assertIn('InstantaneousDemand', self.timeseries)
+        self.assertNotIn('PriceCluster', self.timeseries)
+
+        record = self.series[-1]
+        self.assertEqual(record['response_type'], 'InstantaneousDemand')
+        self.assertEqual(record['MeterMacId'], 0x10)
+        self.assertEqual(record['TimeStamp'], epoch(9))
+        self.assertEqual(record['Demand'], 4.5)
+
+        self.assertEqual(
+            [x['Demand'] for x in self.series[2:8:2]], [1.0, 2.0, 3.0]
+        )
+        self.assertEqual(len(list(self.series)), 10)
+        self.assertRaises(IndexError, lambda: self.series[10])
+
+    def test_between(self):
+        """Time ranges are inclusive, as datetimes or epoch seconds."""
+
+        index = self.series.between(
+            START + datetime.timedelta(minutes=2),
+            START + datetime.timedelta(minutes=4)
+        )
+        self.assertEqual(index, slice(2, 5))
+        self.assertEqual(self.series.between(epoch(2), epoch(4)), index)
+
+        self.assertEqual(self.series.between(start=epoch(8)), slice(8, 10))
+        self.assertEqual(self.series.between(end=epoch(-1)), slice(0, 0))
+
+    def test_unordered(self):
+        """Readings out of time order are sorted for time ranges."""
+
+        # a meter with a clock a minute behind
+        self.timeseries.append(reading(3.5, 10.0, meter=0x20))
+        self.timeseries.append(reading(10, 5.0))
+
+        index = self.series.between(epoch(3), epoch(4))
+        self.assertEqual(
+            [(x['MeterMacId'], x['Demand']) for x in self.series[index]],
+            [(0x10, 1.5), (0x20, 10.0), (0x10, 2.0)]
+        )
+
+        self.assertEqual(
+            list(self.series.columns['TimeStamp']),
+            sorted(epoch(i) for i in [3.5] + list(range(11)))
+        )
+
+    def test_column(self):
+        """Columns are viewed without copying."""
+
+        index = self.series.between(epoch(2), epoch(4))
+        demand = self.series.column('Demand', index)
+
+        self.assertEqual(bytes(demand), struct.pack('3d', 1.0, 1.5, 2.0))
+        self.assertEqual(len(bytes(self.series.column('TimeStamp'))), 80)
+
+    def test_nbytes(self):
+        """Memory used is that of the columns."""
+
+        # two MAC ids, a timestamp and a value
+        size = 2 * 4 + 8 + 8
+
+        self.assertEqual(self.series.nbytes, 10 * size)
+        self.assertEqual(self.timeseries.nbytes, 10 * size)
+
+    def test_missing(self):
+        """Missing fields are stored as None and NaN, but times required."""
+
+        self.timeseries.append({
+            'response_type': 'InstantaneousDemand', 'TimeStamp': START,
+        })
+
+        record = self.series[-1]
+        self.assertIsNone(record['MeterMacId'])
+        self.assertTrue(math.isnan(record['Demand']))
+
+        self.assertRaises(LoonError, self.timeseries.append, {
+            'response_type': 'InstantaneousDemand', 'Demand': 1.0,
+        })
+
+    def test_raw(self):
+        """Raw timestamps are stored as epoch seconds."""
+
+        timeseries = TimeSeries('raw')
+
+        record = reading(0, 1.0)
+        record['TimeStamp'] = epoch(0) - Date.EPOCH
+        timeseries.append(record)
+
+        series = timeseries['InstantaneousDemand']
+        self.assertEqual(series[0]['TimeStamp'], epoch(0))
+        self.assertEqual(series.between(epoch(0), epoch(0)), slice(0, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
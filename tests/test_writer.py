@@ -0,0 +1,53 @@
+"""
+CommandWriter tests.
+"""
+
+import unittest
+
+from loon.writer import CommandWriter
+from loon.future import Future
+from loon.exception import LoonError
+
+
+class WriterTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.written = []
+        self.writer = CommandWriter(self.written.append, rate=1,
+                                    threaded=False)
+
+    def tearDown(self):
+
+        self.writer.close()
+
+    def test_priority(self):
+        """Higher priority (lower value) commands are written first."""
+
+        self.writer.put('low', 1)
+        self.writer.put('high', 0)
+
+        self.assertTrue(self.writer.write_next())
+        self.assertEqual(self.written, ['high'])
+
+        # paced to the rate
+        self.assertFalse(self.writer.write_next())
+        self.assertGreater(self.writer.delay(), 0)
+
+    def test_close(self):
+        """Closing fails the futures of commands not yet written."""
+
+        futures = [Future(), Future()]
+        for future in futures:
+            self.writer.put('data', 0, future)
+
+        self.writer.write_next()
+        self.writer.close()
+
+        self.assertIsNone(futures[0].result(0))
+        self.assertIsInstance(futures[1].exception(0), LoonError)
+        self.assertEqual(self.writer.depth, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()